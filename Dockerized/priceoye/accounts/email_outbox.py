@@ -0,0 +1,127 @@
+"""
+Asynchronous outgoing email.
+
+With EMAIL_BACKEND = 'accounts.email_outbox.OutboxEmailBackend', sending
+an email (djoser's activation, confirmation and password reset emails
+included) only inserts an OutgoingEmail row, in the transaction of the
+request if there is one, so the request never waits for the SMTP server
+and an email is not sent for a rolled back registration.
+
+send_pending() (the send_emails command, run from cron or as a worker
+with --interval) sends the due emails, `batch_size` at a time, over one
+SMTP connection kept open for the whole run. The connection settings
+are Django's EMAIL_HOST, EMAIL_PORT, etc. Sent emails are deleted. A
+failed email is retried after EMAIL_OUTBOX_RETRY_DELAY seconds, doubled
+after every failure, and given up (kept with a null next_attempt_at)
+after EMAIL_OUTBOX_MAX_ATTEMPTS attempts. A batch's rows are locked
+while it is sent (FOR UPDATE SKIP LOCKED on PostgreSQL), so concurrent
+workers send different emails. An email is sent at least once: one sent
+just before the worker dies is sent again.
+"""
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends.smtp import EmailBackend as SMTPEmailBackend
+from django.core.mail.message import sanitize_address
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import OutgoingEmail
+
+def get_retry_delay():
+    return getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 60)
+
+
+def get_max_attempts():
+    return getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 8)
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    """
+    Email backend queuing the messages in OutgoingEmail, in one INSERT.
+    """
+
+    def send_messages(self, email_messages):
+        now = timezone.now()
+        rows = []
+        for message in email_messages:
+            recipients = message.recipients()
+            if not recipients:
+                continue
+            encoding = message.encoding or settings.DEFAULT_CHARSET
+            rows.append(OutgoingEmail(
+                from_email=sanitize_address(message.from_email, encoding),
+                recipients='\n'.join(sanitize_address(address, encoding) for address in recipients),
+                message=message.message().as_bytes(linesep='\r\n'),
+                next_attempt_at=now,
+            ))
+        OutgoingEmail.objects.bulk_create(rows)
+        return len(rows)
+
+
+def _connection_lost(error):
+    # smtplib errors are OSErrors too, but only a disconnection or a
+    # socket error leave the connection unusable.
+    return isinstance(error, smtplib.SMTPServerDisconnected) or not isinstance(error, smtplib.SMTPException)
+
+
+def _failed(email, error, now):
+    email.attempts += 1
+    email.last_error = f'{type(error).__name__}: {error}'[:1000]
+    if email.attempts >= get_max_attempts():
+        email.next_attempt_at = None
+    else:
+        email.next_attempt_at = now + timedelta(seconds=get_retry_delay() * 2 ** (email.attempts - 1))
+
+
+def send_batch(backend, batch_size=50):
+    """
+    Send up to `batch_size` due emails over `backend`, an SMTP
+    EmailBackend opened as needed. Returns the number of emails sent and
+    failed. If the server cannot be reached, the emails not tried yet are
+    left due and the error is raised.
+    """
+    sent, failed, error = [], [], None
+    with transaction.atomic():
+        emails = list(OutgoingEmail.objects.select_for_update(skip_locked=True)
+                      .filter(next_attempt_at__lte=timezone.now())
+                      .order_by('next_attempt_at', 'id')[:batch_size])
+        for email in emails:
+            try:
+                backend.open()
+            except OSError as exc:
+                error = exc
+                break
+            try:
+                backend.connection.sendmail(email.from_email, email.recipients.split('\n'), bytes(email.message))
+            except OSError as exc:
+                _failed(email, exc, timezone.now())
+                failed.append(email)
+                if _connection_lost(exc):
+                    backend.close()
+            else:
+                sent.append(email.id)
+        OutgoingEmail.objects.filter(id__in=sent).delete()
+        OutgoingEmail.objects.bulk_update(failed, ['attempts', 'next_attempt_at', 'last_error'])
+    if error is not None:
+        raise error
+    return len(sent), len(failed)
+
+
+def send_pending(batch_size=50, backend=None):
+    """
+    Send the due emails, `batch_size` per transaction, over one SMTP
+    connection. Returns the number of emails sent and failed.
+    """
+    backend = backend or SMTPEmailBackend(fail_silently=False)
+    sent = failed = 0
+    try:
+        while True:
+            batch = send_batch(backend, batch_size)
+            sent, failed = sent + batch[0], failed + batch[1]
+            if sum(batch) < batch_size:
+                return sent, failed
+    finally:
+        backend.close()
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.blacklist import prune
+
+
+class Command(BaseCommand):
+    """
+    Delete the revoked refresh tokens that have expired.
+
+    An expired token is refused anyway, so its row is no longer needed.
+    Meant to run every hour or so from cron, see accounts.blacklist.
+
+    Example:
+        python manage.py prune_revoked_tokens --batch-size 5000
+    """
+    help = 'Delete expired revoked refresh tokens.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tokens deleted per statement.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        deleted = prune(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired revoked tokens'))
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.email_outbox import send_pending
+
+
+class Command(BaseCommand):
+    """
+    Send the emails queued by OutboxEmailBackend over one SMTP connection.
+
+    Without --interval the due emails are sent once, e.g. every minute
+    from cron. With --interval the command keeps running as a worker,
+    looking for due emails every `interval` seconds. Failed emails are
+    retried with exponential backoff, see accounts.email_outbox.
+
+    Example:
+        python manage.py send_emails --interval 5
+    """
+    help = 'Send the queued outgoing emails.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Emails sent per transaction.')
+        parser.add_argument('--interval', type=float, help='Keep running, sending due emails every N seconds.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        if options['interval'] is None:
+            self.send(options['batch_size'])
+            return
+        while True:
+            try:
+                self.send(options['batch_size'])
+            except CommandError as error:
+                self.stderr.write(str(error))
+            time.sleep(options['interval'])
+
+    def send(self, batch_size):
+        try:
+            sent, failed = send_pending(batch_size=batch_size)
+        except OSError as error:
+            raise CommandError(f'Cannot reach the SMTP server: {error}')
+        if sent or failed:
+            self.stdout.write(self.style.SUCCESS(f'Sent {sent} emails, {failed} failed'))
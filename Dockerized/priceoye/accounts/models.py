@@ -18,3 +18,46 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.email
 
+
+class RevokedToken(models.Model):
+    """
+    Model holding a revoked JWT refresh token until it expires, see
+    accounts.blacklist.
+
+    Attributes:
+        digest: The first 16 bytes of the SHA-256 of the token's jti.
+        revoked_at: The date and time the token was revoked.
+        expires_at: The token's expiry, after which the row can be deleted.
+    """
+    digest = models.BinaryField(max_length=16, primary_key=True)
+    revoked_at = models.DateTimeField(db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f'{bytes(self.digest).hex()} until {self.expires_at}'
+
+
+class OutgoingEmail(models.Model):
+    """
+    Model queuing an email until it is handed to the SMTP server, see
+    accounts.email_outbox.
+
+    Attributes:
+        from_email: The envelope sender.
+        recipients: The envelope recipients, one per line.
+        message: The MIME message, as sent to the server.
+        attempts: The number of failed attempts to send it.
+        next_attempt_at: When to try sending it next, or null once given up.
+        last_error: The error of the last failed attempt.
+        created_at: When the email was queued.
+    """
+    from_email = models.CharField(max_length=254)
+    recipients = models.TextField()
+    message = models.BinaryField()
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, db_index=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'To {", ".join(self.recipients.split())} at {self.created_at}'
@@ -1,7 +1,24 @@
+import base64
+import socketserver
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase
-from accounts.models import CustomUser
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from accounts import blacklist, email_outbox, last_login, user_cache
+from accounts.models import CustomUser, OutgoingEmail, RevokedToken
 
 class AccountTest(APITestCase):
     """
@@ -75,7 +92,7 @@ class AccountTest(APITestCase):
         response = self.client.post(url, data, format="json")
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data),1)
+        self.assertEqual(len(response.data['results']),1)
 
     # TESTING GET ACCOUNT by ID REQUEST
     def test_get_account(self):
@@ -139,4 +156,354 @@ class AccountTest(APITestCase):
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         with self.assertRaises(CustomUser.DoesNotExist): #Trying to retrieve the brand with specific ID will raise exception DoesNotExist.
-            CustomUser.objects.get(id=account_id)
\ No newline at end of file
+            CustomUser.objects.get(id=account_id)
+
+
+class CachedJWTAuthenticationTest(APITestCase):
+    """
+    Test case for accounts.authentication.CachedJWTAuthentication.
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'password')
+        # Users cached by earlier tests may share this id.
+        user_cache.clear_local()
+        user_cache.invalidate(self.user.pk)
+        self.addCleanup(user_cache.clear_local)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.url = reverse('cart-summary')
+
+    def user_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [query for query in queries if CustomUser._meta.db_table in query['sql']]
+
+    def test_user_is_cached(self):
+        self.assertEqual(len(self.user_queries()), 1)
+        self.assertEqual(self.user_queries(), [])
+        # Other processes fall back to the shared cache.
+        user_cache.clear_local()
+        self.assertEqual(self.user_queries(), [])
+
+    def test_invalidated_on_save(self):
+        self.user_queries()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.user.is_active = True
+        self.user.set_password('changed')
+        self.user.save()
+        self.assertEqual(len(self.user_queries()), 1)
+
+    def test_last_login_does_not_invalidate(self):
+        self.user_queries()
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(self.user_queries(), [])
+
+    def test_deleted_user(self):
+        self.user_queries()
+        self.user.delete()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_request_copies_are_independent(self):
+        first = user_cache.get_user(self.user.pk)
+        first.first_name = 'Changed'
+        self.assertEqual(user_cache.get_user(self.user.pk).first_name, '')
+
+    def test_local_cache_is_bounded(self):
+        users = [CustomUser.objects.create_user(f'other{i}', f'other{i}@example.com', 'password') for i in range(3)]
+        with mock.patch.object(user_cache, 'LOCAL_MAX_USERS', 2):
+            for user in users:
+                user_cache.get_user(user.pk)
+        self.assertEqual(list(user_cache._local), [users[1].pk, users[2].pk])
+
+        # Expired entries are dropped when a user is added.
+        later = time.monotonic() + 60
+        with mock.patch.object(user_cache.time, 'monotonic', return_value=later):
+            user_cache.get_user(self.user.pk)
+        self.assertEqual(list(user_cache._local), [self.user.pk])
+
+
+class DispatchingAuthenticationTest(APITestCase):
+    """
+    Test case for accounts.authentication.DispatchingAuthentication.
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'password')
+        user_cache.clear_local()
+        user_cache.invalidate(self.user.pk)
+        self.addCleanup(user_cache.clear_local)
+        self.url = reverse('cart-summary')
+
+    def get(self, authorization=None):
+        if authorization:
+            return self.client.get(self.url, HTTP_AUTHORIZATION=authorization)
+        return self.client.get(self.url)
+
+    def test_schemes(self):
+        self.assertEqual(self.get(f'Bearer {AccessToken.for_user(self.user)}').status_code, status.HTTP_200_OK)
+        basic = base64.b64encode(b'buyer@example.com:password').decode()
+        self.assertEqual(self.get(f'Basic {basic}').status_code, status.HTTP_200_OK)
+        token = Token.objects.create(user=self.user)
+        self.assertEqual(self.get(f'Token {token.key}').status_code, status.HTTP_200_OK)
+        self.assertTrue(self.client.login(email='buyer@example.com', password='password'))
+        self.assertEqual(self.get().status_code, status.HTTP_200_OK)
+
+    def test_unknown_or_missing_credentials(self):
+        for authorization in [None, 'Digest username="buyer"', 'Bearer']:
+            response = self.get(authorization)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertTrue(response['WWW-Authenticate'].startswith('Bearer'))
+
+    def test_header_wins_over_session(self):
+        self.assertTrue(self.client.login(email='buyer@example.com', password='password'))
+        self.assertEqual(self.get('Bearer not.a.token').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_lookup_is_cached(self):
+        token = Token.objects.create(user=self.user)
+        self.get(f'Token {token.key}')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get(f'Token {token.key}').status_code, status.HTTP_200_OK)
+        self.assertEqual([query for query in queries if 'authtoken' in query['sql'] or 'customuser' in query['sql']], [])
+
+        token.delete()
+        self.assertEqual(self.get(f'Token {token.key}').status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class LastLoginTest(APITestCase):
+    """
+    Test case for the write-behind last login times of accounts.last_login.
+    """
+
+    def setUp(self):
+        self.users = [CustomUser.objects.create_user(f'buyer{i}', f'buyer{i}@example.com', 'password')
+                      for i in range(3)]
+        self.addCleanup(last_login.flush)
+
+    def obtain(self, user):
+        response = self.client.post(reverse('jwt-create'), {'email': user.email, 'password': 'password'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('refresh', response.data)
+
+    def test_token_login_is_written_behind(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.obtain(self.users[0])
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE')])
+        self.users[0].refresh_from_db()
+        self.assertIsNone(self.users[0].last_login)
+
+        self.assertEqual(last_login.flush(), 1)
+        self.users[0].refresh_from_db()
+        self.assertIsNotNone(self.users[0].last_login)
+        self.assertEqual(last_login.flush(), 0)
+
+    def test_one_update_for_all_users(self):
+        for user in self.users * 2:
+            self.obtain(user)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(last_login.flush(), 3)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(CustomUser.objects.filter(last_login__isnull=True).count(), 0)
+
+    def test_older_time_does_not_overwrite(self):
+        now = timezone.now()
+        CustomUser.objects.filter(pk=self.users[0].pk).update(last_login=now)
+        last_login.record(self.users[0], now - timedelta(minutes=5))
+        last_login.record(self.users[1], now - timedelta(minutes=5))
+        self.assertEqual(last_login.flush(), 1)
+        self.users[0].refresh_from_db()
+        self.assertEqual(self.users[0].last_login, now)
+
+
+class RefreshTokenBlacklistTest(APITestCase):
+    """
+    Test case for the refresh token revocation of accounts.blacklist.
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'password')
+        blacklist.reset()
+        self.addCleanup(blacklist.reset)
+        self.refresh = RefreshToken.for_user(self.user)
+
+    def post(self, name, data):
+        return self.client.post(reverse(name), data)
+
+    def test_rotation_revokes_old_token(self):
+        response = self.post('jwt-refresh', {'refresh': str(self.refresh)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(RevokedToken.objects.count(), 1)
+
+        response = self.post('jwt-refresh', {'refresh': str(self.refresh)})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_rotated_token_is_usable(self):
+        rotated = self.post('jwt-refresh', {'refresh': str(self.refresh)}).data['refresh']
+        self.assertEqual(self.post('jwt-refresh', {'refresh': rotated}).status_code, status.HTTP_200_OK)
+
+    def test_valid_token_does_not_read_the_table(self):
+        blacklist.revoke(RefreshToken.for_user(self.user))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(blacklist.is_revoked(self.refresh))
+        self.assertEqual(queries.captured_queries, [])
+        self.assertTrue(blacklist.revoke(self.refresh))
+        self.assertTrue(blacklist.is_revoked(self.refresh))
+        self.assertFalse(blacklist.revoke(self.refresh))
+
+    def test_revocations_of_other_processes(self):
+        self.assertFalse(blacklist.is_revoked(self.refresh))
+        RevokedToken.objects.create(digest=blacklist.token_digest(self.refresh), revoked_at=timezone.now(),
+                                    expires_at=timezone.now() + timedelta(days=1))
+        # Not synced yet, but rotating it still fails on the insert.
+        self.assertFalse(blacklist.is_revoked(self.refresh))
+        self.assertEqual(self.post('jwt-refresh', {'refresh': str(self.refresh)}).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        with override_settings(REFRESH_BLACKLIST_SYNC_INTERVAL=0):
+            self.assertTrue(blacklist.is_revoked(self.refresh))
+
+    def test_logout_and_verify(self):
+        self.assertEqual(self.post('jwt-verify', {'token': str(self.refresh)}).status_code, status.HTTP_200_OK)
+        response = self.client.post(reverse('jwt-blacklist') + 'extra/', {'refresh': str(self.refresh)})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.post('jwt-blacklist', {'refresh': str(self.refresh)}).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.post('jwt-verify', {'token': str(self.refresh)}).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.post('jwt-refresh', {'refresh': str(self.refresh)}).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+    def test_prune(self):
+        now = timezone.now()
+        for i, expires_at in enumerate([now - timedelta(hours=1), now - timedelta(minutes=1), now + timedelta(hours=1)]):
+            RevokedToken.objects.create(digest=bytes([i]) * 16, revoked_at=now, expires_at=expires_at)
+        stdout = StringIO()
+        call_command('prune_revoked_tokens', '--batch-size', '1', stdout=stdout)
+        self.assertIn('Deleted 2', stdout.getvalue())
+        self.assertEqual(list(RevokedToken.objects.values_list('expires_at', flat=True)), [now + timedelta(hours=1)])
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """
+    Local SMTP server keeping the messages it receives, refusing the
+    recipients in `refused`.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPStandInHandler)
+        self.messages = []
+        self.connections = 0
+        self.refused = set()
+
+
+class SMTPStandInHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 localhost')
+        recipients = []
+        for line in self.rfile:
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb == 'RCPT':
+                address = command.split(':', 1)[1].strip(' <>')
+                if address in self.server.refused:
+                    self.reply('550 No such user')
+                    continue
+                recipients.append(address)
+            elif verb == 'DATA':
+                self.reply('354 Go ahead')
+                data = b''.join(iter(self.rfile.readline, b'.\r\n'))
+                self.server.messages.append((recipients, data))
+            elif verb in ('MAIL', 'RSET'):
+                recipients = []
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            self.reply('250 OK')
+
+
+class EmailOutboxTest(APITestCase):
+    """
+    Test case for the queued outgoing emails of accounts.email_outbox.
+    """
+
+    def setUp(self):
+        self.smtp = SMTPStandIn()
+        threading.Thread(target=self.smtp.serve_forever, daemon=True).start()
+        self.addCleanup(self.smtp.server_close)
+        self.addCleanup(self.smtp.shutdown)
+        settings = override_settings(
+            EMAIL_BACKEND='accounts.email_outbox.OutboxEmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.smtp.server_address[1],
+            EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def queue(self, *recipients):
+        for recipient in recipients:
+            mail.send_mail('Hello', 'Body', 'shop@example.com', [recipient])
+
+    def test_registration_does_not_wait_for_smtp(self):
+        response = self.client.post(reverse('customuser-list'), {
+            'email': 'new@example.com', 'username': 'new', 'first_name': 'New', 'last_name': 'User',
+            'password': 'a-Strong-passw0rd',
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.smtp.connections, 0)
+        self.assertEqual(OutgoingEmail.objects.count(), 1)
+
+        self.assertEqual(email_outbox.send_pending(), (1, 0))
+        [(recipients, data)] = self.smtp.messages
+        self.assertEqual(recipients, ['new@example.com'])
+        self.assertIn(b'activate/', data)
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+    def test_batches_reuse_one_connection(self):
+        self.queue(*(f'buyer{i}@example.com' for i in range(5)))
+        stdout = StringIO()
+        call_command('send_emails', '--batch-size', '2', stdout=stdout)
+        self.assertIn('Sent 5 emails, 0 failed', stdout.getvalue())
+        self.assertEqual(len(self.smtp.messages), 5)
+        self.assertEqual(self.smtp.connections, 1)
+
+    def test_retry_with_backoff(self):
+        self.smtp.refused.add('buyer@example.com')
+        self.queue('buyer@example.com', 'other@example.com')
+        self.assertEqual(email_outbox.send_pending(), (1, 1))
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.attempts, 1)
+        self.assertIn('SMTPRecipientsRefused', email.last_error)
+        self.assertAlmostEqual((email.next_attempt_at - timezone.now()).total_seconds(), 60, delta=5)
+        # Not due yet.
+        self.assertEqual(email_outbox.send_pending(), (0, 0))
+
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+        email_outbox.send_pending()
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 2)
+        self.assertAlmostEqual((email.next_attempt_at - timezone.now()).total_seconds(), 120, delta=5)
+
+        with override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=3):
+            OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+            email_outbox.send_pending()
+        email.refresh_from_db()
+        self.assertIsNone(email.next_attempt_at)
+
+        self.smtp.refused.clear()
+        self.assertEqual(email_outbox.send_pending(), (0, 0))
+
+    def test_unreachable_server(self):
+        self.queue('buyer@example.com')
+        self.smtp.shutdown()
+        self.smtp.server_close()
+        with self.assertRaises(OSError):
+            email_outbox.send_pending()
+        email = OutgoingEmail.objects.get()
+        self.assertEqual((email.attempts, email.last_error), (0, ''))
+        self.assertLessEqual(email.next_attempt_at, timezone.now())
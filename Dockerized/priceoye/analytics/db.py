@@ -0,0 +1,46 @@
+"""
+Counter upserts shared by the rollups and the leaderboards.
+"""
+from decimal import Decimal
+
+from django.db import connection
+
+# Rows per upsert statement, within SQLite's 999 parameters.
+UPSERT_BATCH_SIZE = 200
+
+
+def increment(model, key_columns, value_columns, rows, set_columns=()):
+    """
+    Add `rows` of (key tuple, values tuple) to the table of `model`,
+    creating the missing rows, with one
+    `INSERT ... ON CONFLICT (key columns) DO UPDATE` per UPSERT_BATCH_SIZE
+    rows. The values are added to `value_columns`, then overwrite
+    `set_columns`. The key columns must be unique together.
+    """
+    if not rows:
+        return
+    ops = connection.ops
+    quote = ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = [*key_columns, *value_columns, *set_columns]
+    updates = [f'{quote(column)} = {table}.{quote(column)} + excluded.{quote(column)}' for column in value_columns]
+    updates += [f'{quote(column)} = excluded.{quote(column)}' for column in set_columns]
+    placeholders = '(' + ', '.join(['%s'] * len(columns)) + ')'
+
+    def adapt(value):
+        if isinstance(value, Decimal):
+            return ops.adapt_decimalfield_value(value)
+        if hasattr(value, 'isoformat'):
+            return ops.adapt_datefield_value(value)
+        return value
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(quote(column) for column in columns)}) '
+                f'VALUES {", ".join([placeholders] * len(batch))} '
+                f'ON CONFLICT ({", ".join(quote(column) for column in key_columns)}) '
+                f'DO UPDATE SET {", ".join(updates)}',
+                [adapt(value) for key, values in batch for value in (*key, *values)],
+            )
@@ -0,0 +1,234 @@
+"""
+Time-decayed product leaderboards ("best sellers", "trending").
+
+Each leaderboard of the LEADERBOARDS setting weighs units sold and page
+views and halves every `half_life` seconds. Scores use forward decay:
+an event of weight w at time t adds w * 2 ** ((t - epoch) / half_life)
+to the product's stored score, where the epoch is fixed per leaderboard.
+Every stored score then shrinks by the same factor as time passes, so
+the ranking never needs recomputing and an update is a plain addition,
+done with one increment upsert per batch. The decayed score at `now` is
+the stored score times 2 ** ((epoch - now) / half_life). To keep the
+numbers in range, refresh() moves the epoch forward (rescaling every
+score in one UPDATE) once it is REBASE_HALF_LIVES half-lives old, and
+drops scores that decayed below MIN_SCORE.
+
+Sales come from the sales outbox, see analytics.rollups.apply_events().
+Product views are counted in memory per process and written every
+LEADERBOARD_VIEW_FLUSH_INTERVAL seconds as one ProductViewEvent per
+product, which refresh() folds in. A worker that stops loses the views
+counted since its last write, which a trend can afford.
+
+The top LEADERBOARD_SIZE products, overall and per category, are cached
+as lists of plain dicts by refresh() (the refresh_leaderboards command,
+run from cron), so serving them reads nothing from the database. The
+lists expire after LEADERBOARD_CACHE_TIMEOUT seconds and are then
+recomputed on the next read.
+"""
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from analytics.db import increment
+from analytics.models import Leaderboard, ProductScore, ProductViewEvent
+from shop.models import Product
+
+KEY_PREFIX = 'leaderboard'
+REBASE_HALF_LIVES = 256
+MIN_SCORE = 1e-3
+
+DEFAULT_LEADERBOARDS = {
+    'best-sellers': {'half_life': 7 * 24 * 3600, 'sale': 1.0, 'view': 0.0},
+    'trending': {'half_life': 6 * 3600, 'sale': 5.0, 'view': 1.0},
+}
+
+_views = Counter()
+_views_lock = threading.Lock()
+_views_flushed = time.monotonic()
+
+
+def get_leaderboards():
+    return getattr(settings, 'LEADERBOARDS', DEFAULT_LEADERBOARDS)
+
+
+def get_size():
+    return getattr(settings, 'LEADERBOARD_SIZE', 20)
+
+
+def get_cache():
+    return caches[getattr(settings, 'LEADERBOARD_CACHE_ALIAS', 'default')]
+
+
+def get_cache_timeout():
+    return getattr(settings, 'LEADERBOARD_CACHE_TIMEOUT', 3600)
+
+
+def get_epochs(for_update=False):
+    """
+    Return the epoch of every configured leaderboard, creating the
+    missing ones. With `for_update`, the rows stay locked until the end of
+    the transaction, so rebase() cannot move an epoch in the meantime.
+    """
+    leaderboards = Leaderboard.objects.filter(name__in=list(get_leaderboards()))
+    if for_update:
+        leaderboards = leaderboards.select_for_update().order_by('name')
+    epochs = dict(leaderboards.values_list('name', 'epoch'))
+    for name in get_leaderboards():
+        if name not in epochs:
+            epochs[name] = Leaderboard.objects.get_or_create(name=name, defaults={'epoch': timezone.now()})[0].epoch
+    return epochs
+
+
+def _growth(board, since, until):
+    return 2 ** ((until - since).total_seconds() / get_leaderboards()[board]['half_life'])
+
+
+def add_events(events):
+    """
+    Add `events`, tuples of (product id, category id, time, kind, amount)
+    where kind is 'sale' or 'view', to the scores of every leaderboard
+    weighing that kind.
+    """
+    events = list(events)
+    if not events:
+        return
+    with transaction.atomic():
+        # Scores added against an epoch that rebase() has since moved
+        # would be off by the rebase factor.
+        epochs = get_epochs(for_update=True)
+        for board, config in get_leaderboards().items():
+            scores = defaultdict(float)
+            categories = {}
+            for product_id, category_id, moment, kind, amount in events:
+                if config.get(kind):
+                    scores[product_id] += config[kind] * amount * _growth(board, epochs[board], moment)
+                    categories[product_id] = category_id
+            increment(ProductScore, ['board', 'product_id'], ['score'], [
+                ((board, product_id), (score, categories[product_id])) for product_id, score in scores.items()
+            ], set_columns=['category_id'])
+
+
+def record_view(sender, product_id, **kwargs):
+    """
+    Count a view of a product page. The counts are written every
+    LEADERBOARD_VIEW_FLUSH_INTERVAL seconds.
+    """
+    with _views_lock:
+        _views[product_id] += 1
+        due = time.monotonic() - _views_flushed >= getattr(settings, 'LEADERBOARD_VIEW_FLUSH_INTERVAL', 10)
+    if due:
+        flush_views()
+
+
+def flush_views():
+    """
+    Write the view counts of this process as ProductViewEvent rows, one
+    INSERT for all products.
+    """
+    global _views_flushed
+    with _views_lock:
+        counts = dict(_views)
+        _views.clear()
+        _views_flushed = time.monotonic()
+    if counts:
+        now = timezone.now()
+        ProductViewEvent.objects.bulk_create([
+            ProductViewEvent(product_id=product_id, count=count, viewed_at=now) for product_id, count in counts.items()
+        ])
+
+
+def process_views(batch_size=1000):
+    """
+    Add the written view events to the scores, `batch_size` events per
+    transaction. Returns the number of events processed.
+    """
+    processed = 0
+    while True:
+        with transaction.atomic():
+            rows = list(ProductViewEvent.objects.select_for_update(skip_locked=True).order_by('id')
+                        .values_list('id', 'product_id', 'count', 'viewed_at')[:batch_size])
+            if not rows:
+                return processed
+            categories = dict(Product.objects.filter(id__in={row[1] for row in rows}).values_list('id', 'category_id'))
+            add_events((product_id, categories[product_id], viewed_at, 'view', count)
+                       for _, product_id, count, viewed_at in rows if product_id in categories)
+            ProductViewEvent.objects.filter(id__in=[row[0] for row in rows]).delete()
+        processed += len(rows)
+
+
+def rebase(board, now=None):
+    """
+    Move a leaderboard's epoch to `now` if it is REBASE_HALF_LIVES
+    half-lives old, and drop the scores that decayed below MIN_SCORE.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        leaderboard = Leaderboard.objects.select_for_update().get(name=board)
+        growth = _growth(board, leaderboard.epoch, now)
+        if math.log2(growth) >= REBASE_HALF_LIVES:
+            ProductScore.objects.filter(board=board).update(score=F('score') / growth)
+            leaderboard.epoch = now
+            leaderboard.save(update_fields=['epoch'])
+            growth = 1
+        ProductScore.objects.filter(board=board, score__lt=MIN_SCORE * growth).delete()
+
+
+def _compute_top(board, epoch, category=None, now=None):
+    decay = 1 / _growth(board, epoch, now or timezone.now())
+    queryset = ProductScore.objects.filter(board=board)
+    if category is not None:
+        queryset = queryset.filter(category_id=category)
+    return [
+        {'id': product_id, 'sku': sku, 'name': name, 'price': str(price), 'score': round(score * decay, 4)}
+        for product_id, sku, name, price, score in queryset.order_by('-score', 'product_id')
+        .values_list('product_id', 'product__sku', 'product__name', 'product__price', 'score')[:get_size()]
+    ]
+
+
+def top_key(board, category=None):
+    return f'{KEY_PREFIX}:{board}:{"all" if category is None else category}'
+
+
+def refresh(now=None):
+    """
+    Fold in the written view events, rebase and prune the scores, sync
+    their categories with the products and cache the top products of
+    every leaderboard, overall and per category. Returns the number of
+    lists cached.
+    """
+    now = now or timezone.now()
+    flush_views()
+    process_views()
+    get_epochs()
+    tops = {}
+    for board in get_leaderboards():
+        rebase(board, now)
+        scores = ProductScore.objects.filter(board=board)
+        scores.update(category_id=Subquery(Product.objects.filter(id=OuterRef('product_id')).values('category_id')[:1]))
+        epoch = Leaderboard.objects.values_list('epoch', flat=True).get(name=board)
+        tops[top_key(board)] = _compute_top(board, epoch, now=now)
+        categories = scores.exclude(category_id=None).values_list('category_id', flat=True).distinct()
+        for category in categories.order_by():
+            tops[top_key(board, category)] = _compute_top(board, epoch, category, now)
+    get_cache().set_many(tops, timeout=get_cache_timeout())
+    return len(tops)
+
+
+def get_top(board, category=None):
+    """
+    Return the cached top products of a leaderboard, overall or for one
+    category. Computed and cached on a miss.
+    """
+    cache = get_cache()
+    top = cache.get(top_key(board, category))
+    if top is None:
+        top = _compute_top(board, get_epochs()[board], category)
+        cache.set(top_key(board, category), top, timeout=get_cache_timeout())
+    return top
@@ -0,0 +1,33 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.rollups import rebuild
+
+
+class Command(BaseCommand):
+    """
+    Recompute the daily sales rollups of a date range from the orders.
+
+    Use it to backfill the rollups, or after orders were changed or
+    deleted, which the incremental updates do not track. Both dates are
+    inclusive and in the current time zone.
+
+    Example:
+        python manage.py rebuild_sales_rollups 2024-01-01 2024-03-31
+    """
+    help = 'Recompute the daily sales rollups between two dates (inclusive).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('start', help='First day, YYYY-MM-DD.')
+        parser.add_argument('end', help='Last day, YYYY-MM-DD.')
+
+    def handle(self, *args, **options):
+        try:
+            start, end = date.fromisoformat(options['start']), date.fromisoformat(options['end'])
+        except ValueError:
+            raise CommandError('Dates must be in YYYY-MM-DD format.')
+        if start > end:
+            raise CommandError('The start date must not be after the end date.')
+        days = rebuild(start, end)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {start} to {end}: {days} days with sales'))
@@ -0,0 +1,169 @@
+"""
+Incremental daily sales rollups.
+
+Revenue and units are kept per day (DailySales) and per day and
+product, category or brand (DailyProductSales, DailyCategorySales,
+DailyBrandSales), so dashboards read a few rows per day instead of
+scanning orders_order.
+
+New orders and order details are queued in SalesOutbox in the same
+transaction that creates them (post_save, plus the order_placed signal
+for the bulk-created details of a checkout). process_outbox() (the
+process_sales_outbox command, run from cron) takes a batch of queued
+rows, adds them to the rollups with one
+`INSERT ... ON CONFLICT DO UPDATE SET units = units + excluded.units, ...`
+per table and deletes them, all in one transaction, so every row is
+counted exactly once. On PostgreSQL concurrent runs skip each other's
+rows (FOR UPDATE SKIP LOCKED).
+
+Days are in the current time zone. Details are attributed to the
+category and brand their product has when they are processed. Changes
+to or deletions of existing orders are not tracked: rebuild() recomputes
+a date range from scratch.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from analytics import leaderboards
+from analytics.db import increment
+from analytics.models import (
+    DailyBrandSales, DailyCategorySales, DailyProductSales, DailySales, SalesOutbox,
+)
+from orders.models import Order, OrderDetail
+
+# Rollup per dimension, with the column holding the key and its path
+# from OrderDetail.
+DIMENSIONS = {
+    'product': (DailyProductSales, 'product_id', 'product_id'),
+    'category': (DailyCategorySales, 'category_id', 'product__category_id'),
+    'brand': (DailyBrandSales, 'brand_id', 'product__brand_id'),
+}
+
+
+def process_outbox(batch_size=1000):
+    """
+    Add the queued orders and details to the rollups, `batch_size` queue
+    rows per transaction. Returns the number of queue rows processed.
+    """
+    processed = 0
+    while True:
+        with transaction.atomic():
+            rows = list(SalesOutbox.objects.select_for_update(skip_locked=True).order_by('id')
+                        .values_list('id', 'order_id', 'detail_id')[:batch_size])
+            if not rows:
+                return processed
+            apply_events([order_id for _, order_id, detail_id in rows if detail_id is None],
+                         [detail_id for _, _, detail_id in rows if detail_id is not None])
+            SalesOutbox.objects.filter(id__in=[row[0] for row in rows]).delete()
+        processed += len(rows)
+
+
+def apply_events(order_ids, detail_ids):
+    """
+    Add the given orders and order details to the rollups, and the units
+    sold to the leaderboards. Rows deleted since they were queued are
+    ignored. Must run inside a transaction.
+    """
+    days = defaultdict(lambda: [0, 0, Decimal(0)])
+    for order_date, total_amount in Order.objects.filter(id__in=order_ids).values_list('order_date', 'total_amount'):
+        day = days[timezone.localdate(order_date)]
+        day[0] += 1
+        day[2] += total_amount
+
+    dimensions = {name: defaultdict(lambda: [0, Decimal(0)]) for name in DIMENSIONS}
+    details = list(OrderDetail.objects.filter(id__in=detail_ids).values_list(
+        'order__order_date', 'quantity', 'subtotal', *(path for _, _, path in DIMENSIONS.values())
+    ))
+    for order_date, quantity, subtotal, *keys in details:
+        day = timezone.localdate(order_date)
+        days[day][1] += quantity
+        for name, key in zip(DIMENSIONS, keys):
+            if key is not None:
+                totals = dimensions[name][day, key]
+                totals[0] += quantity
+                totals[1] += subtotal
+
+    increment(DailySales, ['day'], ['orders', 'units', 'revenue'],
+              [((day,), values) for day, values in days.items()])
+    for name, (model, column, _) in DIMENSIONS.items():
+        increment(model, ['day', column], ['units', 'revenue'], list(dimensions[name].items()))
+    leaderboards.add_events((product_id, category_id, order_date, 'sale', quantity)
+                            for order_date, quantity, _, product_id, category_id, _ in details)
+
+
+def day_bounds(start, end):
+    """
+    Return the aware datetimes bounding the days `start` to `end`
+    (inclusive) in the current time zone.
+    """
+    return (timezone.make_aware(datetime.combine(start, time.min)),
+            timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)))
+
+
+def rebuild(start, end):
+    """
+    Recompute the rollups of the days `start` to `end` (inclusive) from
+    the orders, in one transaction. The queue is processed first, and the
+    rows still queued for orders of those days afterwards are dropped, as
+    the rebuild counts them. Returns the number of DailySales rows written.
+    """
+    process_outbox()
+    lower, upper = day_bounds(start, end)
+    orders = Order.objects.filter(order_date__gte=lower, order_date__lt=upper)
+    details = (OrderDetail.objects.filter(order__order_date__gte=lower, order__order_date__lt=upper)
+               .annotate(day=TruncDate('order__order_date')))
+
+    with transaction.atomic():
+        for model in (DailySales, *(model for model, _, _ in DIMENSIONS.values())):
+            model.objects.filter(day__gte=start, day__lte=end).delete()
+        SalesOutbox.objects.filter(order_id__in=orders.values('id')).delete()
+
+        days = {row['day']: DailySales(**row) for row in
+                orders.annotate(day=TruncDate('order_date')).values('day')
+                .annotate(orders=Count('id'), revenue=Sum('total_amount')).order_by()}
+        for row in details.values('day').annotate(units=Sum('quantity')).order_by():
+            days[row['day']].units = row['units']
+        DailySales.objects.bulk_create(days.values(), batch_size=500)
+
+        for model, column, path in DIMENSIONS.values():
+            rows = (details.filter(**{f'{path}__isnull': False}).values('day', path)
+                    .annotate(units=Sum('quantity'), revenue=Sum('subtotal')).order_by())
+            model.objects.bulk_create([
+                model(day=row['day'], units=row['units'], revenue=row['revenue'], **{column: row[path]})
+                for row in rows
+            ], batch_size=500)
+    return len(days)
+
+
+def get_sales(start, end, group_by='day', limit=50):
+    """
+    Return the totals of the days `start` to `end` (inclusive) and either
+    one row per day (`group_by='day'`, days without sales included) or the
+    top `limit` products, categories or brands by revenue.
+    """
+    totals = DailySales.objects.filter(day__gte=start, day__lte=end).aggregate(
+        orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue'),
+    )
+    totals = {key: value or 0 for key, value in totals.items()}
+    if group_by == 'day':
+        stored = {row['day']: row for row in DailySales.objects.filter(day__gte=start, day__lte=end)
+                  .values('day', 'orders', 'units', 'revenue')}
+        results = [stored.get(start + timedelta(days=offset),
+                              {'day': start + timedelta(days=offset), 'orders': 0, 'units': 0, 'revenue': 0})
+                   for offset in range((end - start).days + 1)]
+    else:
+        model, column, _ = DIMENSIONS[group_by]
+        results = [
+            {'id': row[column], 'name': row[f'{group_by}__name'], 'units': row['units'], 'revenue': row['revenue']}
+            for row in model.objects.filter(day__gte=start, day__lte=end)
+            .values(column, f'{group_by}__name')
+            .annotate(units=Sum('units'), revenue=Sum('revenue'))
+            .order_by('-revenue', column)[:limit]
+        ]
+    return totals, results
@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework import serializers
+
+MAX_RANGE_DAYS = 731
+DEFAULT_RANGE_DAYS = 30
+
+
+class SalesQuerySerializer(serializers.Serializer):
+    """
+    Serializer validating the query parameters of `/analytics/sales/`.
+
+    `start` and `end` are inclusive and default to the last 30 days.
+    """
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    group_by = serializers.ChoiceField(choices=['day', 'product', 'category', 'brand'], default='day')
+    limit = serializers.IntegerField(min_value=1, max_value=500, default=50)
+
+    def validate(self, attrs):
+        attrs.setdefault('end', timezone.localdate())
+        attrs.setdefault('start', attrs['end'] - timedelta(days=DEFAULT_RANGE_DAYS - 1))
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError({'start': ['Must not be after end.']})
+        if (attrs['end'] - attrs['start']).days >= MAX_RANGE_DAYS:
+            raise serializers.ValidationError({'start': [f'At most {MAX_RANGE_DAYS} days at a time.']})
+        return attrs
+
+
+class SalesTotalsSerializer(serializers.Serializer):
+    """
+    Serializer for the totals of a date range.
+    """
+    orders = serializers.IntegerField()
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class DailySalesSerializer(serializers.Serializer):
+    """
+    Serializer for the sales of one day.
+    """
+    day = serializers.DateField()
+    orders = serializers.IntegerField()
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class GroupSalesSerializer(serializers.Serializer):
+    """
+    Serializer for the sales of one product, category or brand.
+    """
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
@@ -0,0 +1,24 @@
+from analytics.models import SalesOutbox
+
+
+def record_order(sender, instance, created, raw=False, **kwargs):
+    """
+    Queue a new order for the sales rollups.
+    """
+    if created and not raw:
+        SalesOutbox.objects.create(order_id=instance.pk)
+
+
+def record_detail(sender, instance, created, raw=False, **kwargs):
+    """
+    Queue a new order detail for the sales rollups.
+    """
+    if created and not raw:
+        SalesOutbox.objects.create(order_id=instance.order_id, detail_id=instance.pk)
+
+
+def record_placed_order(sender, order, details, **kwargs):
+    """
+    Queue the bulk-created details of a checkout for the sales rollups.
+    """
+    SalesOutbox.objects.bulk_create([SalesOutbox(order_id=order.pk, detail_id=detail.pk) for detail in details])
@@ -0,0 +1,21 @@
+from django.urls import path
+from .views import LeaderboardView, SalesView
+
+"""
+URL configuration for the analytics app.
+
+Example:
+    To get the daily sales of January 2024, use the following URL:
+    - /analytics/sales/?start=2024-01-01&end=2024-01-31
+
+    To get the best selling categories of that month, use:
+    - /analytics/sales/?start=2024-01-01&end=2024-01-31&group_by=category
+
+    To get the products trending in category 3, use:
+    - /leaderboards/trending/?category=3
+"""
+
+urlpatterns = [
+    path('analytics/sales/', SalesView.as_view(), name='analytics-sales'),
+    path('leaderboards/<slug:board>/', LeaderboardView.as_view(), name='leaderboard'),
+]
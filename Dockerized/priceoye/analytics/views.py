@@ -0,0 +1,63 @@
+from rest_framework import exceptions
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from analytics.leaderboards import get_leaderboards, get_top
+from analytics.rollups import get_sales
+from analytics.serializers import (
+    DailySalesSerializer, GroupSalesSerializer, SalesQuerySerializer, SalesTotalsSerializer,
+)
+
+
+class SalesView(APIView):
+    """
+    Report sales over a date range from the daily rollups. Staff only.
+
+    `GET /analytics/sales/?start=2024-01-01&end=2024-01-31` returns the
+    totals of the range and one row per day; `&group_by=product`,
+    `category` or `brand` returns the top `limit` of those by revenue
+    instead. Nothing is read from the orders tables, see
+    analytics.rollups.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        query = SalesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        totals, results = get_sales(params['start'], params['end'], params['group_by'], params['limit'])
+        serializer_class = DailySalesSerializer if params['group_by'] == 'day' else GroupSalesSerializer
+        return Response({
+            'start': params['start'],
+            'end': params['end'],
+            'group_by': params['group_by'],
+            'totals': SalesTotalsSerializer(totals).data,
+            'results': serializer_class(results, many=True).data,
+        })
+
+
+class LeaderboardView(APIView):
+    """
+    List the top products of a leaderboard, e.g. `GET /leaderboards/trending/`.
+
+    `?category=` narrows it to one category. The lists are precomputed
+    and cached, see analytics.leaderboards; each product comes with its
+    decayed score at the last refresh.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, board):
+        if board not in get_leaderboards():
+            raise exceptions.NotFound()
+        category = request.query_params.get('category')
+        if category is not None:
+            # Every value gets its own cache entry: only accept ids a
+            # category can have.
+            try:
+                category = int(category)
+            except ValueError:
+                raise exceptions.ValidationError({'category': ['A valid integer is required.']})
+            if not 0 < category < 2 ** 63:
+                raise exceptions.ValidationError({'category': ['A valid integer is required.']})
+        return Response({'board': board, 'category': category, 'results': get_top(board, category)})
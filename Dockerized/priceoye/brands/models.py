@@ -6,9 +6,11 @@ class Brand(models.Model):
 
     Attributes:
         name (str): The name of the brand.
+        updated_at (datetime): When the brand was last changed.
     """
 
     name = models.CharField(max_length=100, unique=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self) -> str:
         return self.name
\ No newline at end of file
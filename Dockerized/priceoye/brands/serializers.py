@@ -1,8 +1,9 @@
 from rest_framework.serializers import ModelSerializer
+from core.serializers import SparseFieldsMixin
 from brands.models import Brand
 
 
-class BrandSerializer(ModelSerializer):
+class BrandSerializer(SparseFieldsMixin, ModelSerializer):
     """
     Serializer class for the Brand model.
     """
@@ -43,7 +43,7 @@ class BrandTests(APITestCase):
         url = reverse(f'{view_name}')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), Brand.objects.count())
+        self.assertEqual(len(response.data['results']), Brand.objects.count())
 
     #TESTING GET RESPONSE FOR SPECIFIC ID.
     def test_get_brand_detail(self):
@@ -95,4 +95,24 @@ class BrandTests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT) #after deleting, NO CONTENT SHOULD BE RECEIVED.
         with self.assertRaises(Brand.DoesNotExist): #Trying to retrieve the brand with specific ID will raise exception DoesNotExist.
-            Brand.objects.get(id=brand_id)
\ No newline at end of file
+            Brand.objects.get(id=brand_id)
+
+class BrandConditionalGetTest(APITestCase):
+    """
+    Test case for ETag validators on brands.
+    """
+    def setUp(self):
+        self.superuser = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'adminpassword')
+        self.assertTrue(self.client.login(email='admin@example.com', password='adminpassword'))
+        self.brand = Brand.objects.create(name='Apple')
+
+    def test_not_modified_until_changed(self):
+        """
+        The list is served as 304 until a brand changes.
+        """
+        url = reverse('brand-list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.brand.name = 'Samsung'
+        self.brand.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
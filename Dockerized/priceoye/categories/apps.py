@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CategoriesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "categories"
+
+    def ready(self):
+        from core.cache import track_model
+        from .models import Category
+
+        track_model(Category)
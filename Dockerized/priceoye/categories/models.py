@@ -6,9 +6,11 @@ class Category(models.Model):
 
     Attributes:
         name (str): The name of the category.
+        updated_at (datetime): When the category was last changed.
     """
 
     name = models.CharField(max_length=100, unique=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name
@@ -1,13 +1,17 @@
 from rest_framework import viewsets
+from core.views import CachedViewSetMixin, ConditionalGetViewSetMixin, SparseFieldsViewSetMixin
 from .models import Category
 from .serializers import CategorySerializer
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CachedViewSetMixin, ConditionalGetViewSetMixin, SparseFieldsViewSetMixin,
+                      viewsets.ModelViewSet):
     """
     A viewset for interacting with Category objects.
 
     Provides CRUD operations (Create, Retrieve, Update, Delete) for Category objects.
+    List and detail responses carry ETag and Last-Modified validators and are
+    served from the catalog cache.
     """
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
@@ -0,0 +1,202 @@
+"""
+Read-through response cache for the catalog endpoints.
+
+Cached responses are keyed by the request and by a generation number per
+model. Saving or deleting an instance of a tracked model bumps its
+generation, which makes every cached response that depends on that model
+unreachable at once; the stale entries then age out of the backend on
+their own. Writes that bypass model signals (queryset.update(),
+bulk_create()) must call invalidate() themselves.
+
+Hot keys are read through get_or_compute(), which protects the database
+from cache stampedes: only the worker holding a short lock recomputes an
+entry, everyone else keeps being served the previous value, and entries
+are refreshed probabilistically shortly before they expire (XFetch) so
+that most refreshes happen before any request sees a miss.
+
+The backend is whatever the `CATALOG_CACHE_ALIAS` entry of CACHES points
+to: locmem for a single process, a shared backend such as Redis when
+several workers must see each other's invalidations.
+"""
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+
+KEY_PREFIX = 'catalog'
+STATS_KEYS = {'hits': f'{KEY_PREFIX}:stats:hits', 'misses': f'{KEY_PREFIX}:stats:misses'}
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+
+def get_lock_timeout():
+    return getattr(settings, 'CATALOG_CACHE_LOCK_TIMEOUT', 10)
+
+
+def generation_key(model):
+    return f'{KEY_PREFIX}:gen:{model._meta.label_lower}'
+
+
+def get_generations(models):
+    """
+    Return the current generation of each model, as a list.
+
+    A missing generation (never set, or evicted) is initialised to the
+    current time in nanoseconds rather than 0, so that it can never
+    collide with a generation that entries were cached under before.
+    """
+    cache = get_cache()
+    keys = [generation_key(model) for model in models]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), timeout=None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def invalidate(*models):
+    """
+    Bump the generation of each model, dropping every cached response
+    that depends on it.
+    """
+    cache = get_cache()
+    for model in models:
+        key = generation_key(model)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def _invalidate_sender(sender, **kwargs):
+    invalidate(sender)
+
+
+def track_model(model):
+    """
+    Invalidate cached responses for `model` whenever an instance is
+    saved or deleted. Called from the owning app's AppConfig.ready().
+    """
+    uid = f'catalog-cache-{model._meta.label_lower}'
+    post_save.connect(_invalidate_sender, sender=model, dispatch_uid=f'{uid}-save')
+    post_delete.connect(_invalidate_sender, sender=model, dispatch_uid=f'{uid}-delete')
+
+
+def should_refresh(delta, expiry, beta=1.0, now=None):
+    """
+    XFetch early expiration test.
+
+    Returns True once the entry has expired, and with a probability that
+    grows as expiry approaches before that. `delta` is how long the value
+    took to compute: expensive entries start refreshing earlier. `beta`
+    above 1 favours earlier refreshes.
+    """
+    now = time.time() if now is None else now
+    return now - delta * beta * math.log(1.0 - random.random()) >= expiry
+
+
+def get_or_compute(key, compute, timeout=None, beta=1.0):
+    """
+    Read `key` from the cache, recomputing it with `compute()` when needed,
+    with at most one concurrent recomputation per key.
+
+    Entries are stored with their logical expiry and kept in the backend
+    for twice as long, so a stale value is still there while it is being
+    refreshed:
+
+    - fresh entry: returned as is;
+    - expired, or picked for early refresh by should_refresh(): the caller
+      that wins the `<key>:lock` key recomputes it, every other caller is
+      served the stale value meanwhile;
+    - no entry at all: the lock winner computes it while the others poll
+      until it appears, up to the lock timeout, and then compute it
+      themselves rather than fail.
+
+    If `compute()` returns None nothing is cached. Returns a
+    `(value, cached)` pair where `cached` tells whether the value came
+    from the cache.
+    """
+    cache = get_cache()
+    timeout = get_timeout() if timeout is None else timeout
+    lock_key = f'{key}:lock'
+    lock_timeout = get_lock_timeout()
+
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expiry = entry
+        if not should_refresh(delta, expiry, beta):
+            return value, True
+        if not cache.add(lock_key, 1, lock_timeout):
+            return value, True
+        return _recompute(cache, key, lock_key, compute, timeout), False
+
+    deadline = time.time() + lock_timeout
+    while not cache.add(lock_key, 1, lock_timeout):
+        time.sleep(0.01)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0], True
+        if time.time() >= deadline:
+            return _compute_and_store(cache, key, compute, timeout), False
+
+    # Another worker may have filled the entry just before releasing the lock.
+    entry = cache.get(key)
+    if entry is not None:
+        cache.delete(lock_key)
+        return entry[0], True
+    return _recompute(cache, key, lock_key, compute, timeout), False
+
+
+def _recompute(cache, key, lock_key, compute, timeout):
+    try:
+        return _compute_and_store(cache, key, compute, timeout)
+    finally:
+        cache.delete(lock_key)
+
+
+def _compute_and_store(cache, key, compute, timeout):
+    start = time.time()
+    value = compute()
+    if value is not None:
+        delta = time.time() - start
+        cache.set(key, (value, delta, start + delta + timeout), timeout * 2)
+    return value
+
+
+def record(hit):
+    """
+    Count a cache hit or miss. The counters live in the cache itself so
+    they are shared by every worker using the same backend.
+    """
+    cache = get_cache()
+    key = STATS_KEYS['hits' if hit else 'misses']
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_stats():
+    """
+    Return the hit and miss counters and the resulting hit ratio.
+    """
+    values = get_cache().get_many(STATS_KEYS.values())
+    stats = {name: values.get(key, 0) for name, key in STATS_KEYS.items()}
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / total if total else 0.0
+    return stats
+
+
+def reset_stats():
+    get_cache().delete_many(list(STATS_KEYS.values()))
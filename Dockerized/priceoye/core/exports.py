@@ -0,0 +1,127 @@
+"""
+Streaming CSV and NDJSON exports.
+
+Apps register the datasets they export from AppConfig.ready(), naming
+the columns to dump. Rows are read with values_list().iterator(), which
+on PostgreSQL goes through a named server-side cursor, so only one chunk
+of rows is held in memory at a time. They are encoded lazily into a
+generator of byte chunks, optionally gzip-compressed on the fly, that a
+StreamingHttpResponse or a file can consume. Worker memory stays flat
+whatever the row count.
+"""
+import csv
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# Encoded rows are joined into chunks of about this many bytes before
+# being handed to the response, rather than written one tiny line at a time.
+FLUSH_SIZE = 64 * 1024
+
+_datasets = {}
+
+
+def register(name, model, fields):
+    """
+    Make `model` exportable as `name`, dumping the given `fields`
+    (anything values_list() accepts, e.g. 'brand_id').
+    """
+    _datasets[name] = (model, tuple(fields))
+
+
+def get_dataset(name):
+    """
+    Return the `(model, fields)` pair registered as `name`.
+    """
+    try:
+        return _datasets[name]
+    except KeyError:
+        raise LookupError(f'Unknown export {name!r}, choose from {", ".join(get_dataset_names())}.')
+
+
+def get_dataset_names():
+    return sorted(_datasets)
+
+
+def iter_rows(queryset, fields, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield the `fields` of every row of `queryset` as tuples, in primary
+    key order, fetching `chunk_size` rows at a time.
+    """
+    return queryset.order_by('pk').values_list(*fields).iterator(chunk_size=chunk_size)
+
+
+class _Echo:
+    """
+    File-like object returning what is written, so csv.writer can be
+    used to format a single line.
+    """
+
+    def write(self, value):
+        return value
+
+
+def encode_csv(fields, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([value.isoformat() if hasattr(value, 'isoformat') else value for value in row])
+
+
+def encode_ndjson(fields, rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(fields, row))) + '\n'
+
+
+ENCODERS = {
+    'csv': encode_csv,
+    'ndjson': encode_ndjson,
+}
+
+
+def buffered(lines, size=FLUSH_SIZE):
+    """
+    Join encoded lines into UTF-8 byte chunks of about `size` bytes.
+    """
+    pending, length = [], 0
+    for line in lines:
+        pending.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(pending).encode('utf-8')
+            pending, length = [], 0
+    if pending:
+        yield ''.join(pending).encode('utf-8')
+
+
+def gzipped(chunks):
+    """
+    Compress a stream of byte chunks into a gzip stream.
+    """
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream(fields, rows, fmt, compress=False):
+    """
+    Return a generator of the encoded (and, if `compress`, gzipped)
+    bytes for `rows`.
+    """
+    chunks = buffered(ENCODERS[fmt](fields, rows))
+    return gzipped(chunks) if compress else chunks
+
+
+def get_filename(name, fmt, compress=False):
+    return f'{name}.{fmt}.gz' if compress else f'{name}.{fmt}'
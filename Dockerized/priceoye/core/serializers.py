@@ -0,0 +1,93 @@
+from rest_framework.permissions import SAFE_METHODS
+
+
+def is_root(serializer):
+    """
+    Return True if `serializer` renders the top level of the response,
+    either on its own or as the child of a top-level many=True list.
+    """
+    if getattr(serializer, '_inlined', False):
+        return False
+    parent = serializer.parent
+    if parent is not None and getattr(parent, 'child', None) is serializer:
+        parent = parent.parent
+    return parent is None
+
+
+def _param_set(request, name):
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    return {part.strip() for part in value.split(',') if part.strip()}
+
+
+class ExpandableFieldsMixin:
+    """
+    Serializer mixin that inlines related objects on request.
+
+    Subclasses list the relations that may be expanded in
+    `expandable_fields`, mapping the field name to the serializer used to
+    render it. A client asks for them with `?expand=brand,category`; the
+    raw foreign key id is then replaced with the nested representation.
+
+    Only the top-level serializer of a response is expanded, and only on
+    output, so writes keep accepting plain ids. Pair with
+    core.views.ExpandableViewSetMixin so the relations are fetched with
+    select_related() instead of one query per row.
+    """
+    expandable_fields = {}
+    expand_param = 'expand'
+
+    @classmethod
+    def get_expand(cls, request):
+        """
+        Return the names of the expandable fields requested by `request`.
+        """
+        if request is None:
+            return []
+        requested = _param_set(request, cls.expand_param) or set()
+        return [name for name in cls.expandable_fields if name in requested]
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if not is_root(self):
+            return data
+        for name in self.get_expand(self.context.get('request')):
+            if name not in data:
+                continue
+            related = getattr(instance, name)
+            if related is None:
+                data[name] = None
+                continue
+            serializer = self.expandable_fields[name](related, context=self.context)
+            # Inlined objects are not expanded again, their relations are not joined.
+            serializer._inlined = True
+            data[name] = serializer.data
+        return data
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin for sparse fieldsets on reads.
+
+    `?fields=id,name,price` keeps only the listed fields and
+    `?omit=description` drops the listed ones. Unknown names are ignored.
+    Only GET responses of the top-level serializer are trimmed; writes
+    always validate the full field set. Pair with
+    core.views.SparseFieldsViewSetMixin so the dropped columns are not
+    read from the database either.
+    """
+    fields_param = 'fields'
+    omit_param = 'omit'
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS or not is_root(self):
+            return fields
+        keep = _param_set(request, self.fields_param)
+        omit = _param_set(request, self.omit_param) or set()
+        for name in list(fields):
+            if (keep is not None and name not in keep) or name in omit:
+                del fields[name]
+        return fields
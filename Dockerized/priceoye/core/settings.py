@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'payments',
     'categories',
     'brands',
+    'analytics',
 ]
 
 MIDDLEWARE = [
@@ -128,6 +129,73 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 CSRF_TRUSTED_ORIGINS = ["http://127.0.0.1:1337"]
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# 'REDIS_URL' points every worker at a shared Redis, e.g. 'redis://redis:6379/0'.
+# Without it each process falls back to its own local-memory cache.
+
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ.get("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "priceoye",
+        }
+    }
+
+# Cache alias, entry lifetime and refresh lock lifetime (seconds) for catalog
+# responses, see core/cache.py.
+CATALOG_CACHE_ALIAS = "default"
+CATALOG_CACHE_TIMEOUT = int(os.environ.get("CATALOG_CACHE_TIMEOUT", 300))
+CATALOG_CACHE_LOCK_TIMEOUT = 10
+
+# How long (seconds) reserved stock is held before it is released, see
+# orders/reservations.py.
+STOCK_RESERVATION_TTL = int(os.environ.get("STOCK_RESERVATION_TTL", 600))
+
+# Cache alias for visitors' carts and lifetime (seconds) of anonymous
+# carts, see orders/cart_store.py.
+CART_CACHE_ALIAS = "default"
+CART_ANONYMOUS_TIMEOUT = int(os.environ.get("CART_ANONYMOUS_TIMEOUT", 30 * 24 * 3600))
+
+# How long (seconds) the response to a request sent with an Idempotency-Key
+# is kept for retries, see orders/idempotency.py.
+IDEMPOTENCY_KEY_TTL = int(os.environ.get("IDEMPOTENCY_KEY_TTL", 24 * 3600))
+
+# Product leaderboards: half-life (seconds) and weights of a unit sold and
+# of a page view, the number of products kept per list, and how often
+# (seconds) each worker writes its view counts. See
+# analytics/leaderboards.py.
+LEADERBOARDS = {
+    "best-sellers": {"half_life": 7 * 24 * 3600, "sale": 1.0, "view": 0.0},
+    "trending": {"half_life": 6 * 3600, "sale": 5.0, "view": 1.0},
+}
+LEADERBOARD_SIZE = int(os.environ.get("LEADERBOARD_SIZE", 20))
+LEADERBOARD_CACHE_ALIAS = "default"
+LEADERBOARD_VIEW_FLUSH_INTERVAL = int(os.environ.get("LEADERBOARD_VIEW_FLUSH_INTERVAL", 10))
+
+# Users behind authenticated requests are cached per process and in a shared
+# cache, for these many seconds, see accounts/user_cache.py.
+AUTH_USER_CACHE_ALIAS = "default"
+AUTH_USER_LOCAL_TTL = int(os.environ.get("AUTH_USER_LOCAL_TTL", 5))
+AUTH_USER_CACHE_TTL = int(os.environ.get("AUTH_USER_CACHE_TTL", 300))
+
+# Seconds the last login times of issued JWTs may wait in memory before
+# they are written, see accounts/last_login.py.
+LAST_LOGIN_FLUSH_INTERVAL = int(os.environ.get("LAST_LOGIN_FLUSH_INTERVAL", 30))
+
+# Revoked refresh tokens each process's Bloom filter is sized for, and
+# seconds between reads of the tokens revoked by other processes, see
+# accounts/blacklist.py.
+REFRESH_BLACKLIST_CAPACITY = int(os.environ.get("REFRESH_BLACKLIST_CAPACITY", 1000000))
+REFRESH_BLACKLIST_SYNC_INTERVAL = int(os.environ.get("REFRESH_BLACKLIST_SYNC_INTERVAL", 5))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -140,7 +208,11 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    'UPDATE_LAST_LOGIN': False,
+    'TOKEN_OBTAIN_SERIALIZER': 'accounts.serializers.TokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.TokenRefreshSerializer',
+    'TOKEN_VERIFY_SERIALIZER': 'accounts.serializers.TokenVerifySerializer',
+    'TOKEN_BLACKLIST_SERIALIZER': 'accounts.serializers.TokenBlacklistSerializer',
 
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
@@ -181,15 +253,16 @@ REST_FRAMEWORK = {
         "rest_framework.parsers.FormParser",
         "rest_framework.parsers.MultiPartParser",
     ],
+    # One authenticator per request, chosen from the Authorization scheme or
+    # the session cookie, see accounts/authentication.py.
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-        'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        "accounts.authentication.DispatchingAuthentication",
     ],
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
@@ -207,6 +280,14 @@ EMAIL_HOST_USER = '11ffa5b86660f3'
 EMAIL_HOST_PASSWORD = '9d3e6aa29c6fd5'
 EMAIL_PORT = '2525'
 
+# Emails are queued in the database and sent by the send_emails command, which
+# retries a failed email after EMAIL_OUTBOX_RETRY_DELAY seconds, doubled after
+# every failure, up to EMAIL_OUTBOX_MAX_ATTEMPTS times, see
+# accounts/email_outbox.py.
+EMAIL_BACKEND = 'accounts.email_outbox.OutboxEmailBackend'
+EMAIL_OUTBOX_RETRY_DELAY = int(os.environ.get("EMAIL_OUTBOX_RETRY_DELAY", 60))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("EMAIL_OUTBOX_MAX_ATTEMPTS", 8))
+
 DJOSER = {
     'PASSWORD_RESET_CONFIRM_URL': 'password/reset/confirm/{uid}/{token}/',
     'USERNAME_RESET_CONFIRM_URL': 'username/reset/confirm/{uid}/{token}/',
@@ -19,6 +19,7 @@ from django.urls import path, include
 from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework import permissions
+from core.views import CatalogCacheStatsView
 
 schema_view = get_schema_view(
    openapi.Info(
@@ -39,10 +40,12 @@ urlpatterns = [
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
     path("admin/", admin.site.urls),
+    path("cache/stats/", CatalogCacheStatsView.as_view(), name="catalog-cache-stats"),
     path("", include("brands.urls")),
     path("", include("categories.urls")),
     path("", include("accounts.urls")),
     path("", include("orders.urls")),
     path("", include("shop.urls")),
     path("", include("payments.urls")),
+    path("", include("analytics.urls")),
 ]
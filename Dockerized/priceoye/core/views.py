@@ -0,0 +1,329 @@
+import hashlib
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Count, Max
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework import exceptions
+from rest_framework.decorators import action
+from rest_framework.permissions import SAFE_METHODS, IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core import cache as catalog_cache
+from core import exports
+
+
+class OwnerScopedViewSetMixin:
+    """
+    ViewSet mixin restricting every action to the rows the user owns.
+
+    `owner_field` is the lookup from the model to its owning user, e.g.
+    'user' or 'order__user'. Staff users see and change every row; other
+    users only theirs, so other users' rows answer 404. Pair the filter
+    with an index leading on the owner column so that it is a range scan.
+
+    On writes by non-staff users a direct owner field is set to the
+    requesting user, and an owner reached through a relation (e.g. the
+    order of an order detail) must be the requesting user.
+    """
+    owner_field = 'user'
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_staff:
+            return queryset
+        if not user.is_authenticated:
+            return queryset.none()
+        return queryset.filter(**{self.owner_field: user})
+
+    def perform_create(self, serializer):
+        serializer.save(**self.get_owner_kwargs(serializer))
+
+    def perform_update(self, serializer):
+        serializer.save(**self.get_owner_kwargs(serializer))
+
+    def get_owner_kwargs(self, serializer):
+        """
+        Return the values to force on save, raising PermissionDenied if
+        the row would belong to someone else.
+        """
+        user = self.request.user
+        if user.is_staff:
+            return {}
+        relation, _, path = self.owner_field.partition('__')
+        if not path:
+            return {relation: user}
+        owner = serializer.validated_data.get(relation) or getattr(serializer.instance, relation, None)
+        for name in path.split('__'):
+            owner = getattr(owner, name, None)
+        if owner != user:
+            raise exceptions.PermissionDenied()
+        return {}
+
+
+class ExpandableViewSetMixin:
+    """
+    ViewSet mixin that joins the relations requested with `?expand=`.
+
+    Works with serializers using core.serializers.ExpandableFieldsMixin.
+    Every expandable field is a forward relation, so each requested one is
+    added to select_related() and a page of N rows costs a fixed number of
+    queries whatever N is.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        get_expand = getattr(serializer_class, 'get_expand', None)
+        if get_expand is None:
+            return queryset
+        expand = get_expand(self.request)
+        if expand:
+            # Relations trimmed away by ?fields= / ?omit= are not joined.
+            fields = self.get_serializer().fields
+            expand = [name for name in expand if name in fields]
+        if expand:
+            queryset = queryset.select_related(*expand)
+        return queryset
+
+
+class SparseFieldsViewSetMixin:
+    """
+    ViewSet mixin that restricts the SELECT list to the serialized fields.
+
+    Works with serializers using core.serializers.SparseFieldsMixin. On
+    reads with `?fields=` or `?omit=`, the queryset is narrowed with
+    only() to the columns the trimmed serializer still renders, so large
+    columns such as Product.description are never fetched.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        if 'fields' not in params and 'omit' not in params:
+            return queryset
+        columns = self.get_sparse_columns(queryset.model)
+        if columns is not None:
+            queryset = queryset.only(*columns)
+        return queryset
+
+    def get_sparse_columns(self, model):
+        """
+        Return the model fields the serializer needs, or None if a field
+        reads something that cannot be mapped to a column.
+        """
+        columns = [model._meta.pk.name]
+        for field in self.get_serializer().fields.values():
+            if field.source == '*' or '.' in field.source:
+                return None
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                if hasattr(model, field.source):
+                    # Properties and methods may touch any column.
+                    return None
+                # Annotations such as search_rank are not columns.
+                continue
+            if model_field.concrete and not model_field.many_to_many:
+                columns.append(model_field.name)
+        return columns
+
+
+class ConditionalGetViewSetMixin:
+    """
+    ViewSet mixin adding ETag and Last-Modified validators to list and
+    retrieve.
+
+    Validators are derived from a cheap probe rather than the rendered
+    body: MAX(updated_at) and COUNT(*) over the filtered queryset for
+    lists, and the row's updated_at for details. A request whose
+    If-None-Match or If-Modified-Since still matches gets a 304 without
+    the rows being fetched or serialized.
+
+    Relations inlined with `?expand=` are included in the probe, so a
+    changed brand invalidates the product lists that embed it.
+    """
+    conditional_field = 'updated_at'
+
+    def list(self, request, *args, **kwargs):
+        probe = self.get_conditional_probe(self.filter_queryset(self.get_queryset()))
+        return self.conditional_response(request, probe, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+            probe = self.get_conditional_probe(queryset)
+        except (TypeError, ValueError, ValidationError):
+            probe = {'count': 0}
+        if not probe['count']:
+            # Let the regular code path produce the 404.
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(request, probe, super().retrieve, *args, **kwargs)
+
+    def get_conditional_probe(self, queryset):
+        """
+        Return the last change time, the row count and the last change
+        time of every expanded relation, in one aggregate query.
+        """
+        field = self.conditional_field
+        aggregates = {'last': Max(field), 'count': Count('pk')}
+        get_expand = getattr(self.get_serializer_class(), 'get_expand', None)
+        for name in get_expand(self.request) if get_expand else []:
+            related = queryset.model._meta.get_field(name).related_model
+            if any(f.name == field for f in related._meta.get_fields()):
+                aggregates[f'{name}_last'] = Max(f'{name}__{field}')
+        return queryset.order_by().aggregate(**aggregates)
+
+    def conditional_response(self, request, probe, handler, *args, **kwargs):
+        etag = self.get_etag(request, probe)
+        last_modified = None
+        if probe['last'] is not None:
+            last_modified = max(value for key, value in probe.items()
+                                if key.endswith('last') and value is not None)
+            last_modified = int(last_modified.timestamp())
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def get_etag(self, request, probe):
+        """
+        Build a strong ETag from the probe and everything else the body
+        depends on: the full URL (filters, fields, expand, cursor) and
+        the negotiated media type.
+        """
+        parts = [request.get_full_path(), getattr(request, 'accepted_media_type', '')]
+        parts += [f'{key}={value.isoformat() if hasattr(value, "isoformat") else value}'
+                  for key, value in sorted(probe.items())]
+        return quote_etag(hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest())
+
+
+class CachedViewSetMixin:
+    """
+    ViewSet mixin serving list and retrieve from the catalog cache.
+
+    On a miss the regular handler runs and a 200 response is stored along
+    with its ETag and Last-Modified headers; on a hit the stored data is
+    returned without touching the database, and If-None-Match is checked
+    against the stored ETag. Reads go through core.cache.get_or_compute(),
+    so a hot entry is rebuilt by one worker at a time while the others keep
+    serving the previous response. Entries are keyed by the full URL, the
+    negotiated media type and the generation of every model in
+    `cache_models` (defaults to the queryset's model), see core.cache.
+
+    Responses carry an `X-Cache: HIT` or `X-Cache: MISS` header.
+    """
+    cache_models = None
+    cached_headers = ('ETag', 'Last-Modified')
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
+    def get_cache_models(self):
+        return self.cache_models or [self.get_queryset().model]
+
+    def get_cache_key(self, request):
+        generations = catalog_cache.get_generations(self.get_cache_models())
+        parts = [request.get_full_path(), getattr(request, 'accepted_media_type', '')]
+        parts += [str(generation) for generation in generations]
+        digest = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+        return f'{catalog_cache.KEY_PREFIX}:{self.basename}:{self.action}:{digest}'
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        computed = {}
+
+        def compute():
+            response = computed['response'] = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return None
+            headers = {name: response[name] for name in self.cached_headers if response.has_header(name)}
+            return response.data, headers
+
+        entry, cached = catalog_cache.get_or_compute(self.get_cache_key(request), compute)
+        catalog_cache.record(hit=cached)
+        if not cached:
+            response = computed['response']
+            response['X-Cache'] = 'MISS'
+            return response
+
+        data, headers = entry
+        last_modified = headers.get('Last-Modified')
+        not_modified = get_conditional_response(
+            request,
+            etag=headers.get('ETag'),
+            last_modified=parse_http_date_safe(last_modified) if last_modified else None,
+        )
+        response = not_modified if not_modified is not None else Response(data, headers=headers)
+        response['X-Cache'] = 'HIT'
+        return response
+
+
+class ExportViewSetMixin:
+    """
+    ViewSet mixin adding a streaming `GET <prefix>/export/` action. Staff only.
+
+    Dumps every row the list endpoint would return after filtering, with
+    no pagination, as the columns of the `export_dataset` registered in
+    core.exports. `?output=csv` (default) or `?output=ndjson` picks the
+    format and `?compress=gzip` compresses it on the fly. The response is
+    streamed from a server-side cursor, see core.exports.
+    """
+    export_dataset = None
+    export_chunk_size = exports.DEFAULT_CHUNK_SIZE
+
+    def perform_content_negotiation(self, request, force=False):
+        # The export writes its own body, whatever the client accepts.
+        return super().perform_content_negotiation(request, force=force or self.action == 'export')
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request, *args, **kwargs):
+        fmt = request.query_params.get('output', 'csv')
+        if fmt not in exports.FORMATS:
+            raise exceptions.ValidationError({'output': [f'Choose from {", ".join(exports.FORMATS)}.']})
+        compress = request.query_params.get('compress') or None
+        if compress not in (None, 'gzip'):
+            raise exceptions.ValidationError({'compress': ['Only gzip is supported.']})
+
+        _, fields = exports.get_dataset(self.export_dataset)
+        rows = exports.iter_rows(self.filter_queryset(self.get_queryset()), fields, self.export_chunk_size)
+        response = StreamingHttpResponse(
+            exports.stream(fields, rows, fmt, compress=bool(compress)),
+            content_type='application/gzip' if compress else exports.FORMATS[fmt],
+        )
+        filename = exports.get_filename(self.export_dataset, fmt, compress=bool(compress))
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class CatalogCacheStatsView(APIView):
+    """
+    Report the catalog cache hit and miss counters. Staff only.
+
+    `DELETE` resets the counters, e.g. before a load test.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(catalog_cache.get_stats())
+
+    def delete(self, request):
+        catalog_cache.reset_stats()
+        return Response(status=204)
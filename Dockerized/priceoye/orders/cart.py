@@ -0,0 +1,146 @@
+"""
+Batched cart edits and the priced cart summary.
+
+A batch is a list of operations on the user's cart, applied in order:
+
+- `{"op": "add", "product": 7, "quantity": 2}` adds units to a line,
+  creating it if needed;
+- `{"op": "set", "product": 7, "quantity": 5}` sets the quantity, and
+  a quantity of 0 removes the line;
+- `{"op": "remove", "product": 7}` removes the line.
+
+The operations are first folded into one net change per product, so
+the database sees a single
+`INSERT ... ON CONFLICT (user_id, product_id) DO UPDATE` for all the
+adds and sets (adds increment the stored quantity, up to MAX_QUANTITY,
+sets overwrite it),
+plus one DELETE if anything is removed. Both run in one transaction and
+rely on the unique (user, product) constraint of Cart.
+"""
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import Coalesce
+from rest_framework import serializers
+
+from orders.models import Cart
+from shop.models import Product
+
+MAX_BATCH_SIZE = 500
+# Largest quantity of a line (the PostgreSQL integer range). Adds past it
+# are capped.
+MAX_QUANTITY = 2147483647
+
+CENTS = Decimal('0.01')
+
+
+class CartOperationSerializer(serializers.Serializer):
+    """
+    One operation of a cart batch.
+    """
+    op = serializers.ChoiceField(choices=['add', 'set', 'remove'])
+    product = serializers.IntegerField(min_value=1, max_value=2 ** 63 - 1)
+    quantity = serializers.IntegerField(min_value=0, max_value=MAX_QUANTITY, required=False)
+
+    def validate(self, attrs):
+        if attrs['op'] != 'remove' and 'quantity' not in attrs:
+            raise serializers.ValidationError({'quantity': ['This field is required.']})
+        if attrs['op'] == 'add' and attrs['quantity'] < 1:
+            raise serializers.ValidationError({'quantity': ['Ensure this value is greater than or equal to 1.']})
+        return attrs
+
+
+def parse_batch(data):
+    """
+    Validate a batch payload and return its folded changes, see fold().
+    Raises ValidationError with one error dict per operation.
+    """
+    if not isinstance(data, list):
+        raise serializers.ValidationError({'non_field_errors': ['Expected a list of operations.']})
+    if len(data) > MAX_BATCH_SIZE:
+        raise serializers.ValidationError({'non_field_errors': [f'At most {MAX_BATCH_SIZE} operations per batch.']})
+    serializer = CartOperationSerializer(data=data, many=True)
+    serializer.is_valid(raise_exception=True)
+    operations = serializer.validated_data
+    existing = set(Product.objects.filter(id__in={operation['product'] for operation in operations})
+                   .values_list('id', flat=True))
+    errors = [{} if operation['product'] in existing else {'product': ['Product not found.']}
+              for operation in operations]
+    if any(errors):
+        raise serializers.ValidationError(errors)
+    return fold(operations)
+
+
+def fold(operations):
+    """
+    Reduce validated operations to one net change per product: a dict of
+    product id to `('add', n)`, `('set', n)` or `('remove', None)`.
+    """
+    changes = {}
+    for operation in operations:
+        product, op = operation['product'], operation['op']
+        quantity = operation.get('quantity')
+        if op == 'set' and quantity == 0:
+            op, quantity = 'remove', None
+        previous = changes.get(product)
+        if op == 'add' and previous is not None:
+            if previous[0] == 'remove':
+                op = 'set'
+            else:
+                op, quantity = previous[0], min(previous[1] + quantity, MAX_QUANTITY)
+        changes[product] = (op, quantity)
+    return changes
+
+
+def apply_changes(user_id, changes):
+    """
+    Write folded `changes` to the cart of the user with id `user_id` in
+    one transaction: one upsert for the adds and sets, one DELETE for the
+    removals.
+    """
+    upserts = [(product, op, quantity) for product, (op, quantity) in changes.items() if op != 'remove']
+    removals = [product for product, (op, _) in changes.items() if op == 'remove']
+    with transaction.atomic():
+        if removals:
+            Cart.objects.filter(user_id=user_id, product_id__in=removals).delete()
+        if upserts:
+            _upsert(user_id, upserts)
+
+
+def _upsert(user_id, rows):
+    quote = connection.ops.quote_name
+    table = quote(Cart._meta.db_table)
+    values = ', '.join(['(%s, %s, %s)'] * len(rows))
+    params = [value for product, _, quantity in rows for value in (user_id, product, quantity)]
+    adds = [product for product, op, _ in rows if op == 'add']
+    if adds:
+        increment = (f'CASE WHEN excluded.product_id NOT IN ({", ".join(["%s"] * len(adds))}) '
+                     f'THEN excluded.quantity '
+                     f'WHEN {table}.quantity > %s - excluded.quantity THEN %s '
+                     f'ELSE {table}.quantity + excluded.quantity END')
+        params += adds + [MAX_QUANTITY, MAX_QUANTITY]
+    else:
+        increment = 'excluded.quantity'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (user_id, product_id, quantity) VALUES {values} '
+            f'ON CONFLICT (user_id, product_id) DO UPDATE SET quantity = {increment}',
+            params,
+        )
+
+
+def summarize(user):
+    """
+    Return the number of lines, the number of units and the total price
+    of `user`'s cart, in one aggregate query.
+    """
+    money = DecimalField(max_digits=12, decimal_places=2)
+    summary = Cart.objects.filter(user=user).aggregate(
+        lines=Count('id'),
+        units=Coalesce(Sum('quantity'), 0),
+        total_amount=Coalesce(Sum(F('quantity') * F('product__price'), output_field=money), 0, output_field=money),
+    )
+    # Rendered as a string, like the DecimalFields of the serializers.
+    summary['total_amount'] = str(Decimal(str(summary['total_amount'])).quantize(CENTS))
+    return summary
@@ -0,0 +1,237 @@
+"""
+Cache-backed carts for every visitor.
+
+The current cart of a visitor lives in the cache, so showing it (e.g. on
+a product page) does not touch the database:
+
+- anonymous visitors are identified by a random token kept in the
+  `cart_token` cookie, and their cart only ever lives in the cache, for
+  CART_ANONYMOUS_TIMEOUT seconds;
+- logged-in users' carts are read through the cache, loaded from the
+  Cart table on a miss, and written behind it: a change updates the
+  cached items, bumps the cart's version and appends the user to a
+  queue of pending flushes. flush_pending() (the flush_carts command,
+  run from cron) writes the queued carts to the Cart table, so the
+  table lags the cache by at most the flush interval. Anything that
+  reads the Cart table for a user (checkout, the cart API) calls flush()
+  first, and anything that writes it calls invalidate() afterwards.
+
+A flush records the version it wrote once its transaction commits, and
+a cart is dirty while its version is ahead of the recorded one. The
+version is bumped with an atomic cache increment after the items are
+written, so a change landing during a flush keeps the cart dirty, and a
+flush rolled back with its transaction (e.g. a failed checkout) leaves
+it dirty too. Lines whose product was deleted meanwhile are dropped.
+
+Write-behind needs a cache shared by the web workers and the flush_carts
+command. With a process-local backend (locmem, as in the Simple tree)
+the command would see none of the workers' carts, so changes are then
+written through instead: update_items() flushes the cart right away.
+CART_WRITE_BEHIND forces either mode.
+
+On login the anonymous cart is merged into the user's persistent cart
+with one bulk upsert, see merge_anonymous().
+
+The queue is a counter plus one key per entry, so it works with any
+cache backend shared by the workers. With a backend that evicts keys, a
+dirty cart evicted before it is flushed loses its unflushed changes.
+"""
+import logging
+import secrets
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DatabaseError, transaction
+
+from orders.cart import MAX_QUANTITY, apply_changes
+from orders.models import Cart
+from shop.models import Product
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'cart'
+ANONYMOUS_COOKIE = 'cart_token'
+QUEUE_SEQUENCE = f'{KEY_PREFIX}:dirty:seq'
+QUEUE_POSITION = f'{KEY_PREFIX}:dirty:done'
+
+
+def get_cache():
+    return caches[getattr(settings, 'CART_CACHE_ALIAS', 'default')]
+
+
+def get_anonymous_timeout():
+    return getattr(settings, 'CART_ANONYMOUS_TIMEOUT', 30 * 24 * 3600)
+
+
+def is_write_behind():
+    write_behind = getattr(settings, 'CART_WRITE_BEHIND', None)
+    if write_behind is None:
+        return not isinstance(get_cache(), (LocMemCache, DummyCache))
+    return write_behind
+
+
+def new_token():
+    return secrets.token_urlsafe(24)
+
+
+def user_key(user_id):
+    return f'{KEY_PREFIX}:user:{user_id}'
+
+
+def version_keys(user_id):
+    """
+    Return the keys of the version of a user's cached cart and of the
+    version last written to the Cart table.
+    """
+    return f'{user_key(user_id)}:version', f'{user_key(user_id)}:flushed'
+
+
+def anonymous_key(token):
+    return f'{KEY_PREFIX}:anon:{token}'
+
+
+def apply_to_items(items, changes):
+    """
+    Return a copy of `items` (product id to quantity) with folded
+    `changes` applied, see orders.cart.fold().
+    """
+    items = dict(items)
+    for product, (op, quantity) in changes.items():
+        if op == 'remove':
+            items.pop(product, None)
+        elif op == 'add':
+            items[product] = min(items.get(product, 0) + quantity, MAX_QUANTITY)
+        else:
+            items[product] = quantity
+    return items
+
+
+def _load_from_db(user_id):
+    return dict(Cart.objects.filter(user_id=user_id).values_list('product_id', 'quantity'))
+
+
+def get_items(user=None, token=None):
+    """
+    Return the cart of a user or of an anonymous token as a dict of
+    product id to quantity.
+    """
+    cache = get_cache()
+    if user is None:
+        if not token:
+            return {}
+        return cache.get(anonymous_key(token), {})
+    items = cache.get(user_key(user.pk))
+    if items is None:
+        items = _load_from_db(user.pk)
+        # add(): never overwrite items written meanwhile.
+        cache.add(user_key(user.pk), items, timeout=None)
+    return items
+
+
+def update_items(changes, user=None, token=None):
+    """
+    Apply folded `changes` to a cart and return the new items. For a
+    user, the change is queued for the next flush, or written right away
+    without write-behind.
+    """
+    cache = get_cache()
+    items = apply_to_items(get_items(user, token), changes)
+    if user is None:
+        cache.set(anonymous_key(token), items, get_anonymous_timeout())
+        return items
+    cache.set(user_key(user.pk), items, timeout=None)
+    version, _ = version_keys(user.pk)
+    cache.add(version, 0, timeout=None)
+    cache.incr(version)
+    if is_write_behind():
+        _enqueue(cache, user.pk)
+    else:
+        flush(user.pk)
+    return items
+
+
+def _enqueue(cache, user_id):
+    cache.add(QUEUE_SEQUENCE, 0, timeout=None)
+    position = cache.incr(QUEUE_SEQUENCE)
+    cache.set(f'{KEY_PREFIX}:dirty:{position}', user_id, timeout=None)
+
+
+def flush(user_id):
+    """
+    Write a user's dirty cached cart to the Cart table, replacing its
+    lines. Returns True if anything was written.
+    """
+    cache = get_cache()
+    version, flushed = version_keys(user_id)
+    versions = cache.get_many([version, flushed])
+    current = versions.get(version, 0)
+    if current <= versions.get(flushed, 0):
+        return False
+    # Read after the version: a change landing in between is written now
+    # and flushed again later.
+    items = cache.get(user_key(user_id))
+    if items is None:
+        return False
+    existing = set(Product.objects.filter(id__in=list(items)).values_list('id', flat=True))
+    items = {product: quantity for product, quantity in items.items() if product in existing}
+    with transaction.atomic():
+        Cart.objects.filter(user_id=user_id).exclude(product_id__in=list(items)).delete()
+        if items:
+            apply_changes(user_id, {product: ('set', quantity) for product, quantity in items.items()})
+        # Only once committed: a rolled back flush leaves the cart dirty.
+        transaction.on_commit(lambda: cache.set(flushed, current, timeout=None))
+    return True
+
+
+def flush_pending(batch_size=500):
+    """
+    Flush the carts queued since the last run. Returns the number of
+    carts written. A cart that cannot be written is logged and skipped.
+    """
+    cache = get_cache()
+    end = cache.get(QUEUE_SEQUENCE, 0)
+    start = cache.get(QUEUE_POSITION, 0)
+    flushed = 0
+    for first in range(start + 1, end + 1, batch_size):
+        last = min(first + batch_size - 1, end)
+        keys = [f'{KEY_PREFIX}:dirty:{position}' for position in range(first, last + 1)]
+        for user_id in set(cache.get_many(keys).values()):
+            try:
+                flushed += flush(user_id)
+            except DatabaseError:
+                logger.exception('Cannot flush the cart of user %s', user_id)
+        cache.delete_many(keys)
+        cache.set(QUEUE_POSITION, last, timeout=None)
+    return flushed
+
+
+def invalidate(user_id):
+    """
+    Drop a user's cached cart after the Cart table was written directly,
+    so that the next read reloads it.
+    """
+    cache = get_cache()
+    version, flushed = version_keys(user_id)
+    cache.delete(user_key(user_id))
+    cache.set(flushed, cache.get(version, 0), timeout=None)
+
+
+def merge_anonymous(token, user):
+    """
+    Add the anonymous cart of `token` to `user`'s persistent cart in one
+    bulk upsert, then drop it and cache the merged cart. Returns True if
+    there was anything to merge.
+    """
+    cache = get_cache()
+    items = cache.get(anonymous_key(token)) if token else None
+    if not items:
+        return False
+    flush(user.pk)
+    existing = set(Product.objects.filter(id__in=list(items)).values_list('id', flat=True))
+    apply_changes(user.pk, {product: ('add', quantity) for product, quantity in items.items() if product in existing})
+    cache.delete(anonymous_key(token))
+    invalidate(user.pk)
+    cache.add(user_key(user.pk), _load_from_db(user.pk), timeout=None)
+    return True
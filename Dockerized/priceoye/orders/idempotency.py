@@ -0,0 +1,137 @@
+"""
+Idempotency-Key support for create endpoints.
+
+A client that may retry a create request (an order, a payment, a
+checkout) sends a unique `Idempotency-Key` header with it. The first
+request with a given key runs normally and, if it succeeds, its status
+and body are stored in an IdempotencyKey row; any later request with the
+same key for the same endpoint and user is answered from that row,
+marked with an `Idempotent-Replayed: true` header, without running the
+view again.
+
+The row is inserted before the view runs, in the same transaction as
+the view's own writes, and is only committed with them. A concurrent
+duplicate therefore blocks on the unique index of IdempotencyKey.key
+until the first request finishes, then replays its response if it
+succeeded or runs itself if it did not; no explicit lock is taken.
+Failed requests (exceptions, non-2xx responses) are rolled back with
+their key, so the client can retry them with the same key.
+
+Reusing a key for a different payload answers 422. Keys are kept for
+IDEMPOTENCY_KEY_TTL seconds; the purge_idempotency_keys command deletes
+the expired ones.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import exceptions, status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from orders.models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+class KeyReused(exceptions.APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was already used for a different request.'
+    default_code = 'idempotency_key_reused'
+
+
+def get_ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 3600))
+
+
+def _digest(*parts):
+    return hashlib.sha256('\x00'.join(str(part) for part in parts).encode('utf-8')).digest()
+
+
+def get_fingerprint(request):
+    """
+    Hash the method, path and payload of a request.
+    """
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    return _digest(request.method, request.path, json.dumps(data, sort_keys=True, default=str))
+
+
+def respond(request, scope, handler):
+    """
+    Return `handler()` (a Response) at most once per Idempotency-Key.
+
+    `scope` names the endpoint, so that one key sent to two endpoints is
+    two keys. Requests without the header just run the handler.
+    """
+    key = request.headers.get(HEADER)
+    if key is None:
+        return handler()
+    if not 0 < len(key) <= MAX_KEY_LENGTH:
+        raise exceptions.ValidationError({HEADER: [f'Must be 1 to {MAX_KEY_LENGTH} characters long.']})
+    digest = _digest(scope, request.user.pk, key)
+    fingerprint = get_fingerprint(request)
+
+    while True:
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        key=digest, fingerprint=fingerprint, status_code=0, response='',
+                        expires_at=timezone.now() + get_ttl(),
+                    )
+            except IntegrityError:
+                record = None
+            if record is not None:
+                response = handler()
+                if status.is_success(response.status_code):
+                    record.status_code = response.status_code
+                    record.response = json.dumps(response.data, cls=JSONEncoder)
+                    record.save(update_fields=['status_code', 'response'])
+                else:
+                    transaction.set_rollback(True)
+                return response
+
+        try:
+            stored = IdempotencyKey.objects.get(key=digest)
+        except IdempotencyKey.DoesNotExist:
+            # The request holding the key failed meanwhile: take it over.
+            continue
+        if stored.expires_at <= timezone.now():
+            IdempotencyKey.objects.filter(id=stored.id, expires_at__lte=timezone.now()).delete()
+            continue
+        if bytes(stored.fingerprint) != fingerprint:
+            raise KeyReused()
+        return Response(json.loads(stored.response), status=stored.status_code,
+                        headers={'Idempotent-Replayed': 'true'})
+
+
+def purge_expired(batch_size=1000, now=None):
+    """
+    Delete expired keys, `batch_size` rows per DELETE. Returns the number
+    of keys deleted.
+    """
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        ids = list(IdempotencyKey.objects.filter(expires_at__lte=now).order_by('expires_at')
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+
+
+class IdempotentCreateViewSetMixin:
+    """
+    ViewSet mixin honouring the Idempotency-Key header on create, see
+    orders.idempotency.
+    """
+
+    def create(self, request, *args, **kwargs):
+        return respond(request, self.basename, partial(super().create, request, *args, **kwargs))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.cart_store import flush_pending
+
+
+class Command(BaseCommand):
+    """
+    Write the cached carts changed since the last run to the Cart table.
+
+    Logged-in users' carts are written behind the cache, see
+    orders.cart_store; run this every minute or so from cron. The interval
+    bounds how far the Cart table lags behind.
+
+    Example:
+        python manage.py flush_carts
+    """
+    help = 'Flush pending write-behind cart changes to the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Queue entries read at a time.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        flushed = flush_pending(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Flushed {flushed} carts'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    """
+    Delete the Idempotency-Key records older than IDEMPOTENCY_KEY_TTL.
+
+    Meant to run every hour or so from cron, see orders.idempotency.
+
+    Example:
+        python manage.py purge_idempotency_keys --batch-size 5000
+    """
+    help = 'Delete expired Idempotency-Key records.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Keys deleted per statement.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        deleted = purge_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired idempotency keys'))
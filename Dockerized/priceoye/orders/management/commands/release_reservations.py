@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.reservations import release_expired
+
+
+class Command(BaseCommand):
+    """
+    Give the stock of expired reservations back to their products.
+
+    Meant to run every minute or so from cron. Several copies can run at
+    once: each claims a different set of reservations (SKIP LOCKED on
+    PostgreSQL), see orders.reservations.
+
+    Example:
+        python manage.py release_reservations --batch-size 1000
+    """
+    help = 'Release the stock held by expired reservations.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Reservations released per transaction.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        released = release_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Released {released} expired reservations'))
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_orderdetail_related_name'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['user', 'product'], name='orders_cart_user_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-order_date', '-id'], name='orders_order_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_cart_unique_user_product'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BinaryField(max_length=32, unique=True)),
+                ('fingerprint', models.BinaryField(max_length=32)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('response', models.TextField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
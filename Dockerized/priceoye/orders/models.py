@@ -16,6 +16,12 @@ class Order(models.Model):
     order_date = models.DateTimeField(auto_now_add=True)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            # "My orders", newest first, as an index range scan.
+            models.Index(fields=['user', '-order_date', '-id'], name='orders_order_user_date_idx'),
+        ]
+
     def __str__(self) -> str:
         """
         String representation of the Order instance.
@@ -36,7 +42,7 @@ class OrderDetail(models.Model):
         quantity: The quantity of the product that was ordered.
         subtotal: The subtotal for the product.
     """
-    order = models.ForeignKey(Order, on_delete=models.CASCADE)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='order_details')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField()
     subtotal = models.DecimalField(max_digits=10, decimal_places=2)
@@ -53,7 +59,8 @@ class OrderDetail(models.Model):
 
 class Cart(models.Model):
     """
-    Model representing a shopping cart.
+    Model representing a shopping cart line. A user has at most one line
+    per product.
 
     Attributes:
         user: The user who owns the cart.
@@ -62,4 +69,76 @@ class Cart(models.Model):
     """
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
-    quantity = models.PositiveIntegerField()
\ No newline at end of file
+    quantity = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            # One line per product; also serves the per-user lookups.
+            models.UniqueConstraint(fields=['user', 'product'], name='orders_cart_user_product_uniq'),
+        ]
+
+
+class StockReservation(models.Model):
+    """
+    Model representing units of a product held for a user.
+
+    The units are taken out of Product.stock_quantity when the reservation
+    is made, and either turned into an order at checkout or given back
+    once the reservation expires, see orders.reservations.
+
+    Attributes:
+        user: The user holding the units.
+        product: The reserved product.
+        quantity: The number of units held.
+        created_at: The date and time when the reservation was made.
+        expires_at: The date and time after which the units are released.
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'product'], name='orders_resv_user_product_idx'),
+        ]
+
+    def __str__(self) -> str:
+        """
+        String representation of the StockReservation instance.
+
+        Returns:
+            str: A string with the user, product, quantity and expiry.
+        """
+        return f'{self.user} | {self.quantity} x {self.product} until {self.expires_at}'
+
+
+class IdempotencyKey(models.Model):
+    """
+    Model storing the outcome of a create request sent with an
+    `Idempotency-Key` header, so that a retry gets the same response
+    instead of creating the row again, see orders.idempotency.
+
+    Attributes:
+        key: SHA-256 of the endpoint, the user and the client's key.
+        fingerprint: SHA-256 of the request payload, to reject a key
+                     reused for a different request.
+        status_code: The HTTP status of the stored response.
+        response: The stored response body, as JSON.
+        expires_at: The date and time after which the key may be reused.
+    """
+    key = models.BinaryField(max_length=32, unique=True)
+    fingerprint = models.BinaryField(max_length=32)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.TextField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self) -> str:
+        """
+        String representation of the IdempotencyKey instance.
+
+        Returns:
+            str: The key digest in hex and its expiry.
+        """
+        return f'{bytes(self.key).hex()} until {self.expires_at}'
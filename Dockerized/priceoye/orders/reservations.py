@@ -0,0 +1,196 @@
+"""
+Stock reservations.
+
+Reserving stock takes the units out of Product.stock_quantity right away
+and records them in a StockReservation row with an expiry. Checkout
+consumes the buyer's reservations instead of taking the stock again, and
+release_expired() gives the units of abandoned reservations back.
+
+Overselling is prevented the same way on every backend: stock only ever
+goes down through a guarded
+`UPDATE ... SET stock_quantity = stock_quantity - n WHERE stock_quantity >= n`,
+and the whole operation is rolled back if the UPDATE matched fewer
+products than requested. On PostgreSQL:
+
+- the product rows are first locked with SELECT ... ORDER BY id FOR
+  UPDATE, so two carts sharing products always lock them in the same
+  order and cannot deadlock;
+- release_expired() claims expired reservations with FOR UPDATE SKIP
+  LOCKED, so concurrent sweepers split the work between them and never
+  wait on a reservation that a checkout is consuming.
+
+SQLite has a single writer and no row locks, so the guarded UPDATE alone
+does the job there.
+"""
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+from core import cache as catalog_cache
+from orders.models import StockReservation
+from shop.models import Product
+
+
+class OutOfStock(Exception):
+    """
+    Raised when more units are asked for than are in stock.
+
+    Attributes:
+        shortages: The short products, as dicts with the product id and
+                   name and the requested and available quantities.
+    """
+
+    def __init__(self, shortages):
+        super().__init__('Not enough stock.')
+        self.shortages = shortages
+
+
+def get_ttl():
+    return timedelta(seconds=getattr(settings, 'STOCK_RESERVATION_TTL', 600))
+
+
+def lock_products(product_ids, fetch=False):
+    """
+    Lock the product rows in id order, where the backend has row locks.
+    With `fetch`, return the products, keyed by id, read under the lock.
+    """
+    products = Product.objects.filter(id__in=product_ids).order_by('id')
+    if connection.features.has_select_for_update:
+        products = products.select_for_update()
+        if not fetch:
+            list(products.values_list('id', flat=True))
+    if fetch:
+        return {product.id: product for product in products}
+
+
+def take_stock(quantities, lock=True):
+    """
+    Decrement the stock of each product (id to quantity) in one guarded
+    UPDATE, or raise OutOfStock if any of them does not have enough left.
+    Must run inside a transaction; pass `lock=False` if the caller already
+    locked the products.
+    """
+    if lock:
+        lock_products(list(quantities))
+    enough = reduce(or_, (Q(id=product_id, stock_quantity__gte=quantity)
+                          for product_id, quantity in quantities.items()))
+    updated = Product.objects.filter(enough).update(
+        stock_quantity=Case(*(When(id=product_id, then=F('stock_quantity') - quantity)
+                              for product_id, quantity in quantities.items())),
+        updated_at=timezone.now(),
+    )
+    if updated != len(quantities):
+        available = {product_id: (name, stock) for product_id, name, stock in
+                     Product.objects.filter(id__in=list(quantities)).values_list('id', 'name', 'stock_quantity')}
+        raise OutOfStock([
+            {
+                'product': product_id,
+                'name': available.get(product_id, (None, 0))[0],
+                'requested': quantity,
+                'available': available.get(product_id, (None, 0))[1],
+            }
+            for product_id, quantity in quantities.items()
+            if available.get(product_id, (None, 0))[1] < quantity
+        ])
+    transaction.on_commit(lambda: catalog_cache.invalidate(Product))
+
+
+def return_stock(quantities, lock=True):
+    """
+    Give units back to the products (id to quantity) in one UPDATE.
+    Must run inside a transaction; pass `lock=False` if the caller already
+    locked the products.
+    """
+    if lock:
+        lock_products(list(quantities))
+    Product.objects.filter(id__in=list(quantities)).update(
+        stock_quantity=Case(*(When(id=product_id, then=F('stock_quantity') + quantity)
+                              for product_id, quantity in quantities.items())),
+        updated_at=timezone.now(),
+    )
+    transaction.on_commit(lambda: catalog_cache.invalidate(Product))
+
+
+def _totals(rows):
+    totals = {}
+    for _, product_id, quantity in rows:
+        totals[product_id] = totals.get(product_id, 0) + quantity
+    return totals
+
+
+def reserve(user, quantities, ttl=None, lock=True):
+    """
+    Hold units of products (id to quantity) for `user` for `ttl` (defaults
+    to the STOCK_RESERVATION_TTL setting). Raises OutOfStock, in which
+    case nothing is held. Returns the created reservations.
+    """
+    expires_at = timezone.now() + (ttl or get_ttl())
+    with transaction.atomic():
+        take_stock(quantities, lock=lock)
+        return StockReservation.objects.bulk_create([
+            StockReservation(user=user, product_id=product_id, quantity=quantity, expires_at=expires_at)
+            for product_id, quantity in quantities.items()
+        ])
+
+
+def consume(user, quantities):
+    """
+    Take `user`'s reservations for the given products (id to quantity
+    needed) out of the table, expired or not, since their units have not
+    been given back yet. Units held beyond what is needed are returned to
+    stock. Returns the number of units covered per product.
+
+    Must run inside a transaction, with the products locked: the caller
+    turns the covered units into an order.
+    """
+    rows = list(StockReservation.objects.select_for_update()
+                .filter(user=user, product_id__in=list(quantities)).order_by('id')
+                .values_list('id', 'product_id', 'quantity'))
+    if not rows:
+        return {}
+    StockReservation.objects.filter(id__in=[row[0] for row in rows]).delete()
+    held = _totals(rows)
+    surplus = {product_id: count - quantities[product_id]
+               for product_id, count in held.items() if count > quantities[product_id]}
+    if surplus:
+        return_stock(surplus, lock=False)
+    return {product_id: min(count, quantities[product_id]) for product_id, count in held.items()}
+
+
+def release(user, lock=True):
+    """
+    Give back every unit `user` holds. Returns the number of reservations
+    released.
+    """
+    with transaction.atomic():
+        rows = list(StockReservation.objects.select_for_update().filter(user=user).order_by('id')
+                    .values_list('id', 'product_id', 'quantity'))
+        if rows:
+            StockReservation.objects.filter(id__in=[row[0] for row in rows]).delete()
+            return_stock(_totals(rows), lock=lock)
+    return len(rows)
+
+
+def release_expired(batch_size=500, now=None):
+    """
+    Give back the units of expired reservations, `batch_size` reservations
+    per transaction. Reservations locked by a running checkout or another
+    sweeper are skipped. Returns the number of reservations released.
+    """
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            rows = list(StockReservation.objects.select_for_update(skip_locked=True)
+                        .filter(expires_at__lte=now).order_by('id')
+                        .values_list('id', 'product_id', 'quantity')[:batch_size])
+            if not rows:
+                return released
+            StockReservation.objects.filter(id__in=[row[0] for row in rows]).delete()
+            return_stock(_totals(rows))
+        released += len(rows)
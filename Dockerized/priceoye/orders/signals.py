@@ -0,0 +1,18 @@
+from django.dispatch import Signal
+
+from orders import cart_store
+
+# Sent by orders.checkout.checkout() with `order` and `details` once an
+# order and its details are written. The details are bulk-created, so no
+# post_save is sent for them.
+order_placed = Signal()
+
+
+def merge_cart_on_login(sender, request, user, **kwargs):
+    """
+    Merge the visitor's anonymous cart into their persistent cart when they
+    log in with a session. Token-based clients are merged on their next
+    cart request instead, see CartViewSet.current.
+    """
+    if request is not None:
+        cart_store.merge_anonymous(request.COOKIES.get(cart_store.ANONYMOUS_COOKIE), user)
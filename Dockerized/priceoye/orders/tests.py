@@ -1,7 +1,25 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
-from orders.models import Order, OrderDetail
+from orders import cart_store, reservations
+from orders.cart import MAX_QUANTITY
+from orders.models import Cart, IdempotencyKey, Order, OrderDetail, StockReservation
+from shop.models import Product
 from accounts.models import CustomUser
 
 class OrderTest(APITestCase):
@@ -82,7 +100,7 @@ class OrderTest(APITestCase):
         response = self.client.post(url, data, format = 'json')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     # TEST GET REQUEST
     def test_get_order(self):
@@ -171,4 +189,688 @@ class OrderTest(APITestCase):
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         with self.assertRaises(Order.DoesNotExist):
-            Order.objects.get(id = order_id)
\ No newline at end of file
+            Order.objects.get(id = order_id)
+
+class OrderExpandTest(APITestCase):
+    """
+    Test case for `?expand=` on orders (user) and order details (product).
+    """
+
+    def setUp(self):
+        """
+        Create a superuser, log them in and add orders with one detail each.
+        """
+        self.superuser = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'adminpassword')
+        self.assertTrue(self.client.login(email='admin@example.com', password='adminpassword'))
+        for i in range(4):
+            product = Product.objects.create(name=f'Phone {i}', description='NEW', price=10, stock_quantity=1)
+            order = Order.objects.create(user=self.superuser, total_amount=10)
+            OrderDetail.objects.create(order=order, product=product, quantity=1, subtotal=10)
+
+    def test_expand_user(self):
+        """
+        The order owner is inlined without its password hash.
+        """
+        response = self.client.get(reverse("Orders-list"), {'expand': 'user'})
+        user = response.data['results'][0]['user']
+        self.assertEqual(user['email'], 'admin@example.com')
+        self.assertNotIn('password', user)
+
+    def test_expand_product(self):
+        """
+        Order details inline their product in a fixed number of queries.
+        """
+        url = reverse("Orders Details-list")
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'expand': 'product'})
+        self.assertEqual(response.data['results'][0]['product']['name'], 'Phone 0')
+
+
+class OrderExportTest(APITestCase):
+    """
+    Test case for the streaming `export/` action and the export_data command.
+    """
+
+    def setUp(self):
+        """
+        Create a superuser, log them in and add a few orders.
+        """
+        self.superuser = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'adminpassword')
+        self.assertTrue(self.client.login(email='admin@example.com', password='adminpassword'))
+        self.orders = [Order.objects.create(user=self.superuser, total_amount=Decimal(i) + Decimal('0.25'))
+                       for i in range(5)]
+        self.url = reverse('Orders-export')
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('filename="orders.csv"', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(self.content(response).decode('utf-8'))))
+        self.assertEqual([int(row['id']) for row in rows], [order.id for order in self.orders])
+        self.assertEqual(rows[1]['total_amount'], '1.25')
+        self.assertEqual(rows[1]['user_id'], str(self.superuser.id))
+
+    def test_ndjson_gzip(self):
+        response = self.client.get(self.url, {'output': 'ndjson', 'compress': 'gzip'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('filename="orders.ndjson.gz"', response['Content-Disposition'])
+        lines = gzip.decompress(self.content(response)).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(json.loads(lines[0])['total_amount'], '0.25')
+
+    def test_any_accept_header(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_invalid_format(self):
+        response = self.client.get(self.url, {'output': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_staff_only(self):
+        CustomUser.objects.create_user('someone', 'someone@example.com', 'password')
+        self.client.logout()
+        self.client.login(email='someone@example.com', password='password')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_order_details(self):
+        product = Product.objects.create(name='Phone', description='', price=10, stock_quantity=1)
+        OrderDetail.objects.create(order=self.orders[0], product=product, quantity=2, subtotal=20)
+        response = self.client.get(reverse('Orders Details-export'))
+        lines = self.content(response).decode('utf-8').splitlines()
+        self.assertEqual(lines[0], 'id,order_id,product_id,quantity,subtotal')
+        self.assertEqual(len(lines), 2)
+
+    def test_command(self):
+        """
+        The export_data command writes the same dump to a file.
+        """
+        handle, path = tempfile.mkstemp(suffix='.csv.gz')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        stderr = io.StringIO()
+        call_command('export_data', 'orders', '-o', path, '--gzip', '--chunk-size', '2', stderr=stderr)
+        self.assertIn('Exported 5 orders rows', stderr.getvalue())
+        with gzip.open(path, 'rt', encoding='utf-8') as dump:
+            self.assertEqual(len(dump.read().splitlines()), 6)
+
+
+class CheckoutTest(APITestCase):
+    """
+    Test case for `POST /checkout/`.
+    """
+
+    def setUp(self):
+        """
+        Create a user, log them in and add products.
+        """
+        self.user = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'password')
+        self.assertTrue(self.client.login(email='buyer@example.com', password='password'))
+        self.products = [Product.objects.create(name=f'Phone {i}', description='', price=Decimal('10.50') * (i + 1),
+                                                stock_quantity=5)
+                         for i in range(12)]
+        self.url = reverse('checkout')
+
+    def fill_cart(self, count, quantity=2):
+        Cart.objects.bulk_create([Cart(user=self.user, product=product, quantity=quantity)
+                                  for product in self.products[:count]])
+
+    def test_checkout(self):
+        self.fill_cart(2)
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get()
+        self.assertEqual(order.user, self.user)
+        self.assertEqual(order.total_amount, Decimal('63.00'))
+        self.assertEqual(response.data['id'], order.id)
+        self.assertEqual(sorted(d['subtotal'] for d in response.data['order_details']), ['21.00', '42.00'])
+        self.assertEqual(response.data['order_details'][0]['product']['name'], 'Phone 0')
+        self.assertEqual(OrderDetail.objects.filter(order=order).count(), 2)
+        self.assertEqual(list(Product.objects.filter(id__in=[p.id for p in self.products[:2]])
+                              .values_list('stock_quantity', flat=True)), [3, 3])
+        self.assertEqual(Product.objects.get(id=self.products[2].id).stock_quantity, 5)
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+
+    def test_constant_query_count(self):
+        """
+        A cart of 2 products and one of 12 cost the same number of queries.
+        """
+        self.fill_cart(2)
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(self.url)
+        self.fill_cart(12, quantity=1)
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(self.url)
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(OrderDetail.objects.count(), 14)
+
+    def test_products_locked_once(self):
+        """
+        The products are locked once, before their prices are read.
+        """
+        self.fill_cart(2)
+        with mock.patch.object(reservations, 'lock_products', wraps=reservations.lock_products) as lock:
+            self.client.post(self.url)
+        lock.assert_called_once_with([self.products[0].id, self.products[1].id], fetch=True)
+
+    def test_out_of_stock_rolls_back(self):
+        self.fill_cart(2)
+        Cart.objects.filter(product=self.products[1]).update(quantity=6)
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['products'], [{'product': self.products[1].id, 'name': 'Phone 1',
+                                                      'requested': 6, 'available': 5}])
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Product.objects.get(id=self.products[0].id).stock_quantity, 5)
+
+    def test_empty_cart(self):
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_requires_login(self):
+        self.client.logout()
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class StockReservationTest(APITestCase):
+    """
+    Test case for stock reservations and `/reservations/`.
+    """
+
+    def setUp(self):
+        """
+        Create a user, log them in and put two products in their cart.
+        """
+        self.user = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'password')
+        self.assertTrue(self.client.login(email='buyer@example.com', password='password'))
+        self.phone = Product.objects.create(name='Phone', description='', price=100, stock_quantity=5)
+        self.case = Product.objects.create(name='Case', description='', price=10, stock_quantity=5)
+        Cart.objects.create(user=self.user, product=self.phone, quantity=2)
+        Cart.objects.create(user=self.user, product=self.case, quantity=1)
+        self.url = reverse('reservations')
+
+    def stock(self, product):
+        return Product.objects.get(id=product.id).stock_quantity
+
+    def test_reserve_cart(self):
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(sorted((r['product'], r['quantity']) for r in response.data),
+                         [(self.phone.id, 2), (self.case.id, 1)])
+        self.assertEqual((self.stock(self.phone), self.stock(self.case)), (3, 4))
+        self.assertEqual(len(self.client.get(self.url).data), 2)
+
+        # Reserving again replaces the previous reservations.
+        Cart.objects.filter(product=self.case).delete()
+        self.client.post(self.url)
+        self.assertEqual((self.stock(self.phone), self.stock(self.case)), (3, 5))
+        self.assertEqual(StockReservation.objects.count(), 1)
+
+    def test_checkout_consumes_reservations(self):
+        """
+        Reserved units are not taken from stock a second time at checkout,
+        and units held beyond the cart are given back.
+        """
+        reservations.reserve(self.user, {self.phone.id: 3, self.case.id: 1})
+        self.assertEqual(self.stock(self.phone), 2)
+        Product.objects.filter(id=self.case.id).update(stock_quantity=0)
+        response = self.client.post(reverse('checkout'))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((self.stock(self.phone), self.stock(self.case)), (3, 0))
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_out_of_stock_keeps_previous_reservations(self):
+        self.client.post(self.url)
+        Cart.objects.filter(product=self.phone).update(quantity=9)
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['products'][0]['product'], self.phone.id)
+        self.assertEqual(StockReservation.objects.count(), 2)
+        self.assertEqual(self.stock(self.phone), 3)
+
+    def test_release(self):
+        self.client.post(self.url)
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual((self.stock(self.phone), self.stock(self.case)), (5, 5))
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_release_expired(self):
+        """
+        Expired reservations give their units back, live ones are kept.
+        """
+        other = CustomUser.objects.create_user('other', 'other@example.com', 'password')
+        reservations.reserve(self.user, {self.phone.id: 2}, ttl=timedelta(seconds=-1))
+        reservations.reserve(other, {self.phone.id: 1, self.case.id: 1}, ttl=timedelta(seconds=-1))
+        reservations.reserve(other, {self.case.id: 1})
+        self.assertEqual((self.stock(self.phone), self.stock(self.case)), (2, 3))
+        stdout = io.StringIO()
+        call_command('release_reservations', '--batch-size', '2', stdout=stdout)
+        self.assertIn('Released 3 expired reservations', stdout.getvalue())
+        self.assertEqual((self.stock(self.phone), self.stock(self.case)), (5, 4))
+        self.assertGreater(StockReservation.objects.get().expires_at, timezone.now())
+
+    def test_reservations_are_private(self):
+        reservations.reserve(self.user, {self.phone.id: 1})
+        CustomUser.objects.create_user('other', 'other@example.com', 'password')
+        self.client.login(email='other@example.com', password='password')
+        self.assertEqual(self.client.get(self.url).data, [])
+
+
+class OrderDetailsNestingTest(APITestCase):
+    """
+    Test case for the order lines nested in orders.
+    """
+
+    def setUp(self):
+        """
+        Create a superuser and 100 orders of two lines each.
+        """
+        self.superuser = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'adminpassword')
+        self.client.force_authenticate(self.superuser)
+        phone = Product.objects.create(sku='P1', name='Phone', description='Long text', price=100, stock_quantity=1)
+        case = Product.objects.create(sku='C1', name='Case', description='', price=10, stock_quantity=1)
+        orders = Order.objects.bulk_create([Order(user=self.superuser, total_amount=120) for _ in range(100)])
+        OrderDetail.objects.bulk_create([
+            OrderDetail(order=order, product=product, quantity=quantity, subtotal=product.price * quantity)
+            for order in orders for product, quantity in ((phone, 1), (case, 2))
+        ])
+
+    def test_list_nests_lines_in_two_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('Orders-list'), {'page_size': 100})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        orders = response.data['results']
+        self.assertEqual(len(orders), 100)
+        lines = orders[0]['order_details']
+        self.assertEqual([line['quantity'] for line in lines], [1, 2])
+        self.assertEqual(lines[0]['product'], {'id': lines[0]['product']['id'], 'sku': 'P1',
+                                               'name': 'Phone', 'price': '100.00'})
+
+    def test_retrieve(self):
+        order = Order.objects.first()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('Orders-detail', args=[order.id]))
+        self.assertEqual(len(response.data['order_details']), 2)
+
+    def test_sparse_fields_skip_prefetch(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('Orders-list'), {'fields': 'id,total_amount'})
+        self.assertNotIn('order_details', response.data['results'][0])
+
+    def test_related_name(self):
+        self.assertEqual(Order.objects.first().order_details.count(), 2)
+
+
+class OwnerScopeTest(APITestCase):
+    """
+    Test case for per-user scoping of orders, order details and carts.
+    """
+
+    def setUp(self):
+        """
+        Create two users with an order each, and a staff user.
+        """
+        self.alice = CustomUser.objects.create_user('alice', 'alice@example.com', 'password')
+        self.bob = CustomUser.objects.create_user('bob', 'bob@example.com', 'password')
+        self.staff = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'adminpassword')
+        self.product = Product.objects.create(name='Phone', description='', price=10, stock_quantity=5)
+        self.alice_order = Order.objects.create(user=self.alice, total_amount=10)
+        self.bob_order = Order.objects.create(user=self.bob, total_amount=20)
+        self.alice_detail = OrderDetail.objects.create(order=self.alice_order, product=self.product,
+                                                       quantity=1, subtotal=10)
+        OrderDetail.objects.create(order=self.bob_order, product=self.product, quantity=2, subtotal=20)
+
+    def ids(self, url_name):
+        return [row['id'] for row in self.client.get(reverse(url_name)).data['results']]
+
+    def test_users_see_their_own_rows(self):
+        self.client.force_authenticate(self.alice)
+        self.assertEqual(self.ids('Orders-list'), [self.alice_order.id])
+        self.assertEqual(self.ids('Orders Details-list'), [self.alice_detail.id])
+        response = self.client.get(reverse('Orders-detail', args=[self.bob_order.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_staff_see_everything(self):
+        self.client.force_authenticate(self.staff)
+        self.assertEqual(self.ids('Orders-list'), [self.bob_order.id, self.alice_order.id])
+
+    def test_anonymous(self):
+        response = self.client.get(reverse('Orders-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_create_is_owned_by_the_user(self):
+        """
+        A user cannot create an order for someone else, nor add a line to
+        someone else's order.
+        """
+        self.client.force_authenticate(self.alice)
+        response = self.client.post(reverse('Orders-list'), {'user': self.bob.id, 'total_amount': '5.00'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.get(id=response.data['id']).user, self.alice)
+
+        response = self.client.post(reverse('Orders Details-list'), {
+            'order': self.bob_order.id, 'product': self.product.id, 'quantity': 1, 'subtotal': '10.00',
+        })
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN output is backend specific')
+    def test_my_orders_use_the_index(self):
+        plan = Order.objects.filter(user=self.alice).order_by('-order_date', '-id').explain()
+        self.assertIn('orders_order_user_date_idx', plan)
+        self.assertNotIn('USE TEMP B-TREE', plan)
+
+
+class CartBatchTest(APITestCase):
+    """
+    Test case for the cart endpoints and `POST /cart/batch/`.
+    """
+
+    def setUp(self):
+        """
+        Create a user, log them in and add products.
+        """
+        self.user = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'password')
+        self.client.force_authenticate(self.user)
+        self.phone = Product.objects.create(name='Phone', description='', price=Decimal('100.50'), stock_quantity=5)
+        self.case = Product.objects.create(name='Case', description='', price=10, stock_quantity=5)
+        self.cable = Product.objects.create(name='Cable', description='', price=2, stock_quantity=5)
+        self.url = reverse('cart-batch')
+
+    def cart(self):
+        return dict(Cart.objects.filter(user=self.user).values_list('product_id', 'quantity'))
+
+    def test_batch(self):
+        Cart.objects.create(user=self.user, product=self.phone, quantity=1)
+        Cart.objects.create(user=self.user, product=self.cable, quantity=4)
+        response = self.client.post(self.url, [
+            {'op': 'add', 'product': self.phone.id, 'quantity': 2},
+            {'op': 'add', 'product': self.case.id, 'quantity': 1},
+            {'op': 'add', 'product': self.case.id, 'quantity': 2},
+            {'op': 'remove', 'product': self.cable.id},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.cart(), {self.phone.id: 3, self.case.id: 3})
+        self.assertEqual(response.data, {'lines': 2, 'units': 6, 'total_amount': '331.50'})
+
+        self.client.post(self.url, [
+            {'op': 'set', 'product': self.phone.id, 'quantity': 1},
+            {'op': 'add', 'product': self.phone.id, 'quantity': 1},
+            {'op': 'set', 'product': self.case.id, 'quantity': 0},
+            {'op': 'remove', 'product': self.cable.id},
+            {'op': 'add', 'product': self.cable.id, 'quantity': 5},
+        ], format='json')
+        self.assertEqual(self.cart(), {self.phone.id: 2, self.cable.id: 5})
+
+    def test_constant_query_count(self):
+        """
+        Validation, the DELETE, the upsert and the summary cost the same
+        number of queries for 2 operations or 200.
+        """
+        products = Product.objects.bulk_create(
+            [Product(name=f'Item {i}', description='', price=1, stock_quantity=1) for i in range(100)]
+        )
+
+        def batch(items):
+            ops = [{'op': 'add', 'product': p.id, 'quantity': 1} for p in items]
+            ops += [{'op': 'remove', 'product': p.id} for p in items[:1]]
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(self.url, ops, format='json')
+            return len(queries)
+
+        self.assertEqual(batch(products[:2]), batch(products))
+        self.assertEqual(len(self.cart()), 99)
+
+    def test_invalid_operations(self):
+        response = self.client.post(self.url, [
+            {'op': 'add', 'product': self.phone.id, 'quantity': 1},
+            {'op': 'add', 'product': 999999, 'quantity': 1},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[1], {'product': ['Product not found.']})
+        response = self.client.post(self.url, [
+            {'op': 'add', 'product': self.phone.id, 'quantity': 0},
+            {'op': 'set', 'product': self.phone.id},
+            {'op': 'swap', 'product': self.phone.id},
+            {'op': 'add', 'product': 2 ** 63, 'quantity': 1},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([sorted(error) for error in response.data],
+                         [['quantity'], ['quantity'], ['op'], ['product']])
+        self.assertEqual(self.cart(), {})
+
+    def test_summary_is_one_query(self):
+        Cart.objects.create(user=self.user, product=self.phone, quantity=2)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('cart-summary'))
+        self.assertEqual(response.data, {'lines': 1, 'units': 2, 'total_amount': '201.00'})
+
+    def test_empty_summary(self):
+        response = self.client.get(reverse('cart-summary'))
+        self.assertEqual(response.data, {'lines': 0, 'units': 0, 'total_amount': '0.00'})
+
+    def test_duplicate_line_is_rejected(self):
+        data = {'user': self.user.id, 'product': self.phone.id, 'quantity': 1}
+        self.assertEqual(self.client.post(reverse('cart-list'), data).status_code, status.HTTP_201_CREATED)
+        response = self.client.post(reverse('cart-list'), data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.cart(), {self.phone.id: 1})
+
+    def test_update_to_duplicate_line_is_rejected(self):
+        Cart.objects.create(user=self.user, product=self.phone, quantity=1)
+        line = Cart.objects.create(user=self.user, product=self.case, quantity=1)
+        response = self.client.patch(reverse('cart-detail', args=[line.id]), {'product': self.phone.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.cart(), {self.phone.id: 1, self.case.id: 1})
+
+    def test_add_is_capped(self):
+        Cart.objects.create(user=self.user, product=self.phone, quantity=5)
+        response = self.client.post(self.url, [
+            {'op': 'add', 'product': self.phone.id, 'quantity': MAX_QUANTITY},
+            {'op': 'add', 'product': self.case.id, 'quantity': MAX_QUANTITY},
+            {'op': 'add', 'product': self.case.id, 'quantity': 1},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.cart(), {self.phone.id: MAX_QUANTITY, self.case.id: MAX_QUANTITY})
+
+
+class CartStoreTest(APITestCase):
+    """
+    Test case for the cache-backed cart at `/cart/current/`.
+    """
+
+    def setUp(self):
+        """
+        Start from an empty cart cache and add a user and products.
+        """
+        cart_store.get_cache().clear()
+        self.addCleanup(cart_store.get_cache().clear)
+        self.user = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'password')
+        self.phone = Product.objects.create(name='Phone', description='', price=100, stock_quantity=5)
+        self.case = Product.objects.create(name='Case', description='', price=10, stock_quantity=5)
+        self.url = reverse('cart-current')
+
+    def cart(self):
+        return dict(Cart.objects.filter(user=self.user).values_list('product_id', 'quantity'))
+
+    def test_anonymous_cart(self):
+        response = self.client.post(self.url, [{'op': 'add', 'product': self.phone.id, 'quantity': 2}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(cart_store.ANONYMOUS_COOKIE, response.cookies)
+        self.client.post(self.url, [{'op': 'add', 'product': self.phone.id, 'quantity': 1}], format='json')
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data, {'items': [{'product': self.phone.id, 'quantity': 3}], 'lines': 1, 'units': 3})
+        self.assertFalse(Cart.objects.exists())
+
+    @override_settings(CART_WRITE_BEHIND=True)
+    def test_write_behind(self):
+        self.client.force_authenticate(self.user)
+        Cart.objects.create(user=self.user, product=self.case, quantity=1)
+        self.client.post(self.url, [
+            {'op': 'add', 'product': self.phone.id, 'quantity': 2},
+            {'op': 'remove', 'product': self.case.id},
+        ], format='json')
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['items'], [{'product': self.phone.id, 'quantity': 2}])
+        self.assertEqual(self.cart(), {self.case.id: 1})
+
+        out = io.StringIO()
+        call_command('flush_carts', stdout=out)
+        self.assertIn('Flushed 1 carts', out.getvalue())
+        self.assertEqual(self.cart(), {self.phone.id: 2})
+        call_command('flush_carts', stdout=out)
+        self.assertIn('Flushed 0 carts', out.getvalue())
+
+    def test_write_through_with_local_cache(self):
+        self.client.force_authenticate(self.user)
+        self.client.post(self.url, [{'op': 'add', 'product': self.phone.id, 'quantity': 2}], format='json')
+        self.assertEqual(self.cart(), {self.phone.id: 2})
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+    @override_settings(CART_WRITE_BEHIND=True)
+    def test_deleted_product_is_dropped(self):
+        self.client.force_authenticate(self.user)
+        self.client.post(self.url, [
+            {'op': 'add', 'product': self.phone.id, 'quantity': 1},
+            {'op': 'add', 'product': self.case.id, 'quantity': 1},
+        ], format='json')
+        self.case.delete()
+        call_command('flush_carts', stdout=io.StringIO())
+        self.assertEqual(self.cart(), {self.phone.id: 1})
+        self.assertEqual(self.client.get(reverse('cart-summary')).data['lines'], 1)
+
+    @override_settings(CART_WRITE_BEHIND=True)
+    def test_failed_keyed_checkout_keeps_cart(self):
+        self.client.force_authenticate(self.user)
+        self.client.post(self.url, [{'op': 'add', 'product': self.phone.id, 'quantity': 6}], format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('checkout'), HTTP_IDEMPOTENCY_KEY='checkout-1')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.cart(), {})
+        self.assertEqual(self.client.get(reverse('cart-summary')).data['units'], 6)
+        self.assertEqual(self.cart(), {self.phone.id: 6})
+
+    def test_cart_api_flushes_first(self):
+        self.client.force_authenticate(self.user)
+        self.client.post(self.url, [{'op': 'add', 'product': self.phone.id, 'quantity': 2}], format='json')
+        response = self.client.get(reverse('cart-summary'))
+        self.assertEqual(response.data['units'], 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('checkout'))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.get(self.url).data['items'], [])
+
+    def test_batch_invalidates_cache(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(self.url).data['items'], [])
+        self.client.post(reverse('cart-batch'), [{'op': 'add', 'product': self.case.id, 'quantity': 4}],
+                         format='json')
+        self.assertEqual(self.client.get(self.url).data['items'], [{'product': self.case.id, 'quantity': 4}])
+
+    def test_merge_on_login(self):
+        # The admin login is a plain session login, available to staff.
+        CustomUser.objects.filter(id=self.user.id).update(is_staff=True)
+        Cart.objects.create(user=self.user, product=self.phone, quantity=1)
+        self.client.post(self.url, [
+            {'op': 'add', 'product': self.phone.id, 'quantity': 2},
+            {'op': 'add', 'product': self.case.id, 'quantity': 1},
+        ], format='json')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('admin:login'), {'username': 'buyer@example.com', 'password': 'password'})
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(sum('ON CONFLICT' in query['sql'] for query in queries), 1)
+        self.assertEqual(self.cart(), {self.phone.id: 3, self.case.id: 1})
+        with self.assertNumQueries(2):  # session and user
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['units'], 4)
+
+    def test_merge_on_next_request(self):
+        self.client.post(self.url, [{'op': 'add', 'product': self.case.id, 'quantity': 1}], format='json')
+        self.client.force_authenticate(self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['items'], [{'product': self.case.id, 'quantity': 1}])
+        self.assertEqual(response.cookies[cart_store.ANONYMOUS_COOKIE].value, '')
+        self.assertEqual(self.cart(), {self.case.id: 1})
+
+
+class IdempotencyTest(APITestCase):
+    """
+    Test case for the Idempotency-Key header on order creation and checkout.
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'password')
+        self.client.force_authenticate(self.user)
+        self.url = reverse('Orders-list')
+
+    def create(self, key, amount='10.00', **headers):
+        return self.client.post(self.url, {'user': self.user.id, 'total_amount': amount}, format='json',
+                                HTTP_IDEMPOTENCY_KEY=key, **headers)
+
+    def test_retry_is_replayed(self):
+        first = self.create('order-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.create('order-1')
+        self.assertEqual([query['sql'].split()[0] for query in queries if 'SAVEPOINT' not in query['sql']],
+                         ['INSERT', 'SELECT'])  # the failed claim and the stored response
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self.create('order-2').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_key_reused_for_another_payload(self):
+        self.create('order-1')
+        response = self.create('order-1', amount='99.00')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_keys_are_per_user(self):
+        self.create('order-1')
+        other = CustomUser.objects.create_user('other', 'other@example.com', 'password')
+        self.client.force_authenticate(other)
+        response = self.client.post(self.url, {'user': other.id, 'total_amount': '10.00'}, format='json',
+                                    HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_failed_requests_are_not_stored(self):
+        response = self.create('order-1', amount='not a number')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.create('order-1', amount='not a number').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_checkout_retry(self):
+        product = Product.objects.create(name='Phone', description='', price=10, stock_quantity=5)
+        Cart.objects.create(user=self.user, product=product, quantity=2)
+        first = self.client.post(reverse('checkout'), HTTP_IDEMPOTENCY_KEY='checkout-1')
+        retry = self.client.post(reverse('checkout'), HTTP_IDEMPOTENCY_KEY='checkout-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(Order.objects.count(), 1)
+        product.refresh_from_db()
+        self.assertEqual(product.stock_quantity, 3)
+
+    def test_expired_keys(self):
+        self.create('order-1')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertNotIn('Idempotent-Replayed', self.create('order-1'))
+        self.assertEqual(Order.objects.count(), 2)
+
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        out = io.StringIO()
+        call_command('purge_idempotency_keys', stdout=out)
+        self.assertIn('Deleted 1 expired', out.getvalue())
+        self.assertFalse(IdempotencyKey.objects.exists())
@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import OrderViewSet, OrderDetailViewSet
+from .views import CartViewSet, CheckoutView, OrderViewSet, OrderDetailViewSet, ReservationView
 
 router = DefaultRouter()
 router.register(r'Orders', OrderViewSet, basename='Orders')
 router.register(r'Order Details', OrderDetailViewSet, basename='Orders Details')
+router.register(r'cart', CartViewSet, basename='cart')
 
 """
 URL Configuration for the orders app.
@@ -13,12 +14,16 @@ This module defines the URL patterns for the orders app in the PriceOye project.
 It includes the following views:
 - OrderViewSet: Handles the CRUD operations for orders.
 - OrderDetailViewSet: Handles the CRUD operations for order details.
-- CategoryViewSet: Handles the CRUD operations for categories.
+- CartViewSet: Handles the CRUD and batch operations for the cart.
+- CheckoutView: Turns the user's cart into an order.
+- ReservationView: Holds the stock of the user's cart until checkout.
 
 The urlpatterns list includes the registered routes for the above views.
 """
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('checkout/', CheckoutView.as_view(), name='checkout'),
+    path('reservations/', ReservationView.as_view(), name='reservations'),
     # Add other app URLs here
 ]
\ No newline at end of file
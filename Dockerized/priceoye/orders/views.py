@@ -1,45 +1,102 @@
-from rest_framework import viewsets
-from orders.models import Order, OrderDetail, Cart
-from orders.serializers import OrderSerializer, OrderDetailSerializer, CartSerializer
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from rest_framework import exceptions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from core.views import (
+    ExpandableViewSetMixin, ExportViewSetMixin, OwnerScopedViewSetMixin, SparseFieldsViewSetMixin,
+)
+from orders import cart_store
+from orders.cart import apply_changes, parse_batch, summarize
+from orders.checkout import checkout, reserve_cart
+from orders.idempotency import IdempotentCreateViewSetMixin, respond
+from orders.models import Order, OrderDetail, Cart, StockReservation
+from orders.pagination import OrderPagination
+from orders.reservations import OutOfStock, release
+from orders.serializers import (
+    OrderSerializer, OrderDetailSerializer, CartSerializer, StockReservationSerializer,
+)
 
-class OrderViewSet(viewsets.ModelViewSet):
+
+def prefetch_order_details():
+    """
+    Prefetch for the nested `order_details` of OrderSerializer: one query
+    for the lines of all the orders, joined with their products.
+    """
+    return Prefetch('order_details', queryset=OrderDetail.objects.select_related('product').order_by('id'))
+
+
+class OrderViewSet(IdempotentCreateViewSetMixin, OwnerScopedViewSetMixin, ExportViewSetMixin, ExpandableViewSetMixin,
+                   SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     """
     ViewSet for the Order model.
 
     This class inherits from ModelViewSet and provides actions for 
     creating, retrieving, updating, and deleting Order instances.
 
+    Users only see their own orders, newest first; staff see everyone's.
+    Each order embeds its lines with a product summary. They are
+    prefetched, so a page of orders costs two queries whatever its size.
+    Creation honours the Idempotency-Key header, see orders.idempotency.
+
     Attributes:
         queryset: The queryset of Order instances that this view should display.
         serializer_class: The serializer class this view should use to serialize 
                           and deserialize data.
+        export_dataset: Name of the core.exports dataset served by `export/`.
     """
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = OrderPagination
+    export_dataset = 'orders'
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'export' and 'order_details' in self.get_serializer().fields:
+            queryset = queryset.prefetch_related(prefetch_order_details())
+        return queryset
 
 
-class OrderDetailViewSet(viewsets.ModelViewSet):
+class OrderDetailViewSet(IdempotentCreateViewSetMixin, OwnerScopedViewSetMixin, ExportViewSetMixin,
+                         ExpandableViewSetMixin, SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     """
     ViewSet for the OrderDetail model.
 
     This class inherits from ModelViewSet and provides actions for 
     creating, retrieving, updating, and deleting OrderDetail instances.
+    Users only see the details of their own orders; staff see all of them.
+    Creation honours the Idempotency-Key header, see orders.idempotency.
 
     Attributes:
         queryset: The queryset of OrderDetail instances that this view should display.
         serializer_class: The serializer class this view should use to serialize 
                           and deserialize data.
+        export_dataset: Name of the core.exports dataset served by `export/`.
     """
     queryset = OrderDetail.objects.all()
     serializer_class = OrderDetailSerializer
+    permission_classes = [IsAuthenticated]
+    owner_field = 'order__user'
+    export_dataset = 'order-details'
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CartViewSet(OwnerScopedViewSetMixin, SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     """
     ViewSet for the Cart model.
 
     This class inherits from ModelViewSet and provides actions for 
     creating, retrieving, updating, and deleting Cart instances.
+    Users only see their own cart; staff see all of them. A cart holds
+    one line per product.
+
+    `POST batch/` applies many add / set / remove operations to the
+    user's cart at once and `GET summary/` prices it, see orders.cart.
+    `current/` serves the cache-backed cart of any visitor, logged in or
+    not, see orders.cart_store. The other actions work on the Cart table,
+    so they flush the user's cached cart first.
 
     Attributes:
         queryset: The queryset of Cart instances that this view should display.
@@ -47,4 +104,150 @@ class CategoryViewSet(viewsets.ModelViewSet):
                           and deserialize data.
     """
     queryset = Cart.objects.all()
-    serializer_class = CartSerializer
\ No newline at end of file
+    serializer_class = CartSerializer
+    permission_classes = [IsAuthenticated]
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action != 'current' and request.user.is_authenticated:
+            cart_store.flush(request.user.pk)
+
+    def perform_create(self, serializer):
+        try:
+            with transaction.atomic():
+                super().perform_create(serializer)
+        except IntegrityError:
+            raise exceptions.ValidationError(
+                {'product': ['This product is already in the cart, use cart/batch/ to change its quantity.']}
+            )
+        cart_store.invalidate(serializer.instance.user_id)
+
+    def perform_update(self, serializer):
+        previous_owner = serializer.instance.user_id
+        try:
+            with transaction.atomic():
+                super().perform_update(serializer)
+        except IntegrityError:
+            raise exceptions.ValidationError(
+                {'product': ['This product is already in the cart, use cart/batch/ to change its quantity.']}
+            )
+        cart_store.invalidate(previous_owner)
+        cart_store.invalidate(serializer.instance.user_id)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        cart_store.invalidate(instance.user_id)
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Apply a list of `{op, product, quantity}` operations to the user's
+        cart in one transaction and return the cart summary.
+        """
+        apply_changes(request.user.pk, parse_batch(request.data))
+        cart_store.invalidate(request.user.pk)
+        return Response(summarize(request.user))
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """
+        Return the number of lines, units and the total price of the
+        user's cart.
+        """
+        return Response(summarize(request.user))
+
+    @action(detail=False, methods=['get', 'post'], permission_classes=[AllowAny])
+    def current(self, request):
+        """
+        Read (GET) or change (POST, same operations as `batch/`) the
+        visitor's cart without touching the Cart table.
+
+        Anonymous visitors get a `cart_token` cookie identifying their
+        cart. Once they are logged in, the first request still carrying
+        the cookie merges that cart into theirs.
+        """
+        user = request.user if request.user.is_authenticated else None
+        token = request.COOKIES.get(cart_store.ANONYMOUS_COOKIE)
+        if user is not None and token:
+            cart_store.merge_anonymous(token, user)
+        issue_token = user is None and request.method == 'POST' and not token
+        if issue_token:
+            token = cart_store.new_token()
+
+        if request.method == 'POST':
+            items = cart_store.update_items(parse_batch(request.data), user=user, token=token)
+        else:
+            items = cart_store.get_items(user=user, token=token)
+        response = Response({
+            'items': [{'product': product, 'quantity': quantity} for product, quantity in sorted(items.items())],
+            'lines': len(items),
+            'units': sum(items.values()),
+        })
+        if issue_token:
+            response.set_cookie(cart_store.ANONYMOUS_COOKIE, token, max_age=cart_store.get_anonymous_timeout(),
+                                httponly=True, samesite='Lax')
+        elif user is not None and token:
+            response.delete_cookie(cart_store.ANONYMOUS_COOKIE, samesite='Lax')
+        return response
+
+
+def out_of_stock_response(exc):
+    return Response({'detail': str(exc), 'products': exc.shortages}, status=status.HTTP_409_CONFLICT)
+
+
+class CheckoutView(APIView):
+    """
+    Turn the authenticated user's cart into an order.
+
+    `POST /checkout/` creates the order and its details, decrements the
+    stock (or consumes the user's reservations) and empties the cart in
+    one transaction, see orders.checkout.
+    Responds 201 with the order and its lines, 400 if the cart is empty
+    and 409 if a product does not have enough stock left. A retry sent
+    with the same Idempotency-Key gets the first order back, see
+    orders.idempotency.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        return respond(request, 'checkout', self.place_order)
+
+    def place_order(self):
+        request = self.request
+        try:
+            order, _ = checkout(request.user)
+        except OutOfStock as exc:
+            return out_of_stock_response(exc)
+        prefetch_related_objects([order], prefetch_order_details())
+        return Response(OrderSerializer(order, context=self.get_serializer_context()).data,
+                        status=status.HTTP_201_CREATED)
+
+    def get_serializer_context(self):
+        return {'request': self.request, 'view': self}
+
+
+class ReservationView(APIView):
+    """
+    Hold the authenticated user's cart while they pay.
+
+    `GET /reservations/` lists what the user holds, `POST` reserves the
+    current cart for STOCK_RESERVATION_TTL seconds (replacing any previous
+    reservation) and `DELETE` gives everything back. Checkout consumes the
+    reservations. See orders.reservations.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        queryset = StockReservation.objects.filter(user=request.user).order_by('id')
+        return Response(StockReservationSerializer(queryset, many=True).data)
+
+    def post(self, request):
+        try:
+            held = reserve_cart(request.user)
+        except OutOfStock as exc:
+            return out_of_stock_response(exc)
+        return Response(StockReservationSerializer(held, many=True).data, status=status.HTTP_201_CREATED)
+
+    def delete(self, request):
+        release(request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
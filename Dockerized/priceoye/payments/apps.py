@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class PaymentsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "payments"
+
+    def ready(self):
+        from core import exports
+        from .models import Payment
+
+        exports.register('payments', Payment, ['id', 'user_id', 'amount', 'timestamp', 'success'])
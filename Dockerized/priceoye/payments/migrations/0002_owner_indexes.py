@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['user', '-timestamp', '-id'], name='payments_pay_user_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,13 @@
+from rest_framework import serializers
+from core.serializers import SparseFieldsMixin
+from payments.models import Payment, Invoice
+
+class PaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Payment
+        fields = '__all__'
+
+class InvoiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Invoice
+        fields = '__all__'
\ No newline at end of file
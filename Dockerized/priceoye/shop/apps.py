@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class ShopConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "shop"
+
+    def ready(self):
+        from core import exports
+        from core.cache import track_model
+        from .models import Product
+
+        track_model(Product)
+        exports.register('products', Product, [
+            'id', 'sku', 'name', 'description', 'price', 'stock_quantity',
+            'brand_id', 'category_id', 'updated_at',
+        ])
@@ -0,0 +1,144 @@
+"""
+Bulk price and stock updates.
+
+A repricing payload is a list of `{id, price?, stock_quantity?}` items.
+Validation is a single pass over the list using the fields of
+BulkProductUpdateSerializer, plus one query to check which ids exist;
+there is no serializer or model instance per row. The accepted rows are then written
+in one transaction:
+
+- PostgreSQL: UPDATE ... FROM (VALUES ...) joining the new values on id,
+  one statement per `batch_size` rows.
+- Other backends: bulk_update(), grouping the rows by the fields they
+  change so an item without `price` does not overwrite it.
+
+Bulk writes do not send model signals, so updated_at is set explicitly
+and the catalog cache is invalidated here.
+"""
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from core import cache as catalog_cache
+from shop.models import Product
+
+MAX_BULK_SIZE = 10000
+
+
+class BulkProductUpdateSerializer(serializers.Serializer):
+    """
+    Fields accepted by a bulk update item, besides `id`. Only the field
+    definitions are used, one value at a time.
+    """
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'))
+    stock_quantity = serializers.IntegerField(min_value=0, max_value=2147483647)
+
+
+BULK_FIELDS = tuple(BulkProductUpdateSerializer().fields)
+
+
+def validate_updates(items):
+    """
+    Validate a bulk update payload.
+
+    Returns `(rows, errors)`: `rows` maps each accepted product id to the
+    dict of new values, `errors` lists `{'index', 'id', 'errors'}` for the
+    rejected items, in payload order.
+    """
+    fields = BulkProductUpdateSerializer().fields
+    rows, errors, indexes = {}, [], {}
+
+    def reject(index, item_id, detail):
+        errors.append({'index': index, 'id': item_id, 'errors': detail})
+
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            reject(index, None, {'non_field_errors': ['Expected an object.']})
+            continue
+        item_id = item.get('id')
+        # Ids beyond the primary key range would overflow the query.
+        if isinstance(item_id, bool) or not isinstance(item_id, int) or not 0 < item_id < 2 ** 63:
+            reject(index, item_id, {'id': ['A valid integer is required.']})
+            continue
+        detail, values = {}, {}
+        for name, field in fields.items():
+            if name not in item:
+                continue
+            try:
+                values[name] = field.run_validation(item[name])
+            except serializers.ValidationError as exc:
+                detail[name] = exc.detail
+        unknown = set(item) - {'id', *BULK_FIELDS}
+        if unknown:
+            detail['non_field_errors'] = [
+                f'Only id, price and stock_quantity can be set, got {", ".join(sorted(unknown))}.'
+            ]
+        elif not values and not detail:
+            detail['non_field_errors'] = ['Nothing to update.']
+        if item_id in indexes:
+            detail.setdefault('id', []).append(f'Duplicate of item {indexes[item_id]}.')
+        if detail:
+            reject(index, item_id, detail)
+            continue
+        indexes[item_id] = index
+        rows[item_id] = values
+
+    if rows:
+        existing = set(Product.objects.filter(id__in=list(rows)).values_list('id', flat=True))
+        for item_id in [item_id for item_id in rows if item_id not in existing]:
+            del rows[item_id]
+            reject(indexes[item_id], item_id, {'id': ['Product not found.']})
+        errors.sort(key=lambda error: error['index'])
+    return rows, errors
+
+
+def apply_updates(rows, batch_size=1000):
+    """
+    Write validated `rows` (product id to new values) in one transaction.
+    Returns the number of products updated.
+    """
+    if not rows:
+        return 0
+    now = timezone.now()
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            _update_from_values(rows, now, batch_size)
+        else:
+            _bulk_update(rows, now, batch_size)
+    catalog_cache.invalidate(Product)
+    return len(rows)
+
+
+def _bulk_update(rows, now, batch_size):
+    groups = {}
+    for item_id, values in rows.items():
+        groups.setdefault(tuple(sorted(values)), []).append(Product(id=item_id, updated_at=now, **values))
+    for fields, products in groups.items():
+        Product.objects.bulk_update(products, [*fields, 'updated_at'], batch_size=batch_size)
+
+
+def _update_from_values(rows, now, batch_size):
+    """
+    Apply the rows with UPDATE ... FROM (VALUES ...). A NULL in the values
+    list means "unchanged" for that column.
+    """
+    table = connection.ops.quote_name(Product._meta.db_table)
+    items = list(rows.items())
+    with connection.cursor() as cursor:
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            placeholders = ', '.join(['(%s::bigint, %s::numeric, %s::integer)'] * len(batch))
+            params = [now]
+            for item_id, values in batch:
+                params += [item_id, values.get('price'), values.get('stock_quantity')]
+            cursor.execute(
+                f'UPDATE {table} AS p SET '
+                'price = COALESCE(v.price, p.price), '
+                'stock_quantity = COALESCE(v.stock_quantity, p.stock_quantity), '
+                'updated_at = %s '
+                f'FROM (VALUES {placeholders}) AS v (id, price, stock_quantity) '
+                'WHERE p.id = v.id',
+                params,
+            )
@@ -0,0 +1,128 @@
+"""
+Faceted filtering for the product catalog.
+
+facet_counts() returns the number of products per brand, per category and
+per price bucket for a filtered catalog in a single database round trip.
+Each facet is counted with every filter applied except its own, so a
+client that has picked one brand still sees how many products the other
+brands would add.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Case, CharField, Count, F, IntegerField, Value, When
+from rest_framework.exceptions import ValidationError
+
+# Lower bounds of the price buckets; the last bucket is open ended.
+PRICE_BUCKETS = (0, 10000, 25000, 50000, 100000, 200000)
+
+FACETS = ('brand', 'category', 'price')
+
+
+def _parse_ids(value, name):
+    try:
+        ids = [int(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise ValidationError({name: 'Expected a comma-separated list of ids.'})
+    # Larger ids would overflow the query parameter instead of matching nothing.
+    if not all(0 < pk < 2 ** 63 for pk in ids):
+        raise ValidationError({name: 'Expected a comma-separated list of ids.'})
+    return ids
+
+
+def _parse_price(value, name):
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        raise ValidationError({name: 'Expected a number.'})
+    if not price.is_finite():
+        raise ValidationError({name: 'Expected a number.'})
+    return price
+
+
+def parse_filters(params):
+    """
+    Read the facet filters from request query parameters.
+
+    Supported parameters are `brand` and `category` (comma-separated ids)
+    and `price_min` / `price_max`. Returns a dict with only the filters
+    that were given.
+    """
+    filters = {}
+    for name in ('brand', 'category'):
+        if params.get(name):
+            filters[name] = _parse_ids(params[name], name)
+    for name in ('price_min', 'price_max'):
+        if params.get(name):
+            filters[name] = _parse_price(params[name], name)
+    return filters
+
+
+def apply_filters(queryset, filters, skip=None):
+    """
+    Apply parsed facet filters to a Product queryset.
+
+    `skip` names a facet whose own filter is left out, which is how the
+    counts for that facet are computed.
+    """
+    if 'brand' in filters and skip != 'brand':
+        queryset = queryset.filter(brand_id__in=filters['brand'])
+    if 'category' in filters and skip != 'category':
+        queryset = queryset.filter(category_id__in=filters['category'])
+    if skip != 'price':
+        if 'price_min' in filters:
+            queryset = queryset.filter(price__gte=filters['price_min'])
+        if 'price_max' in filters:
+            queryset = queryset.filter(price__lte=filters['price_max'])
+    return queryset
+
+
+def price_bucket():
+    """
+    Expression mapping Product.price to the lower bound of its bucket.
+    """
+    whens = [
+        When(price__lt=upper, then=Value(lower))
+        for lower, upper in zip(PRICE_BUCKETS, PRICE_BUCKETS[1:])
+    ]
+    return Case(*whens, default=Value(PRICE_BUCKETS[-1]), output_field=IntegerField())
+
+
+def _facet_query(queryset, facet, key, label):
+    return queryset.annotate(
+        facet=Value(facet, output_field=CharField()),
+        key=key,
+        label=label,
+    ).values('facet', 'key', 'label').annotate(count=Count('id')).order_by()
+
+
+def facet_counts(queryset, filters):
+    """
+    Count products per brand, category and price bucket in one query.
+
+    The three GROUP BY queries are combined with UNION ALL, so the database
+    answers all of them in a single round trip. With the (brand_id, price)
+    and (category_id, price) indexes each branch is an index-only scan.
+
+    Returns a dict of facet name to a list of buckets.
+    """
+    no_label = Value(None, output_field=CharField())
+    brands = _facet_query(apply_filters(queryset, filters, skip='brand'),
+                          'brand', F('brand_id'), F('brand__name'))
+    categories = _facet_query(apply_filters(queryset, filters, skip='category'),
+                              'category', F('category_id'), F('category__name'))
+    prices = _facet_query(apply_filters(queryset, filters, skip='price'),
+                          'price', price_bucket(), no_label)
+
+    result = {facet: [] for facet in FACETS}
+    for row in brands.union(categories, prices, all=True):
+        if row['facet'] == 'price':
+            lower = row['key']
+            upper = next((bound for bound in PRICE_BUCKETS if bound > lower), None)
+            result['price'].append({'min': lower, 'max': upper, 'count': row['count']})
+        else:
+            result[row['facet']].append({'id': row['key'], 'name': row['label'], 'count': row['count']})
+
+    result['brand'].sort(key=lambda bucket: -bucket['count'])
+    result['category'].sort(key=lambda bucket: -bucket['count'])
+    result['price'].sort(key=lambda bucket: bucket['min'])
+    return result
@@ -0,0 +1,62 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.imports import ProductImporter, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    """
+    Import a supplier product catalog from a CSV or NDJSON file.
+
+    Each row needs `sku`, `name`, `price` and `stock_quantity`, and may
+    have `description`, `brand` and `category` (names). Products are
+    matched on `sku`: existing ones are updated, new ones created. The
+    file is streamed in batches, see shop.imports.
+
+    Example:
+        python manage.py import_products catalog.csv --batch-size 5000
+        zcat catalog.ndjson.gz | python manage.py import_products - --format ndjson
+    """
+    help = 'Stream a CSV or NDJSON product catalog into the database, upserting on sku.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for standard input.")
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per transaction.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format']
+        if fmt is None:
+            if path == '-':
+                raise CommandError('--format is required when reading standard input.')
+            try:
+                fmt = detect_format(path)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        importer = ProductImporter(batch_size=options['batch_size'])
+
+        def progress(stats):
+            if options['verbosity'] >= 2:
+                self.stdout.write(
+                    f"{stats['read']} rows read, {stats['upserted']} upserted, "
+                    f"{stats['errors']} rejected, {importer.rows_per_second:.0f} rows/s"
+                )
+
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as exc:
+            raise CommandError(str(exc))
+        with stream:
+            stats = importer.run(read_rows(stream, fmt), on_batch=progress)
+
+        for line_number, message in stats['error_lines']:
+            self.stderr.write(f'line {line_number}: {message}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['upserted']} products ({stats['errors']} rejected) "
+            f"in {importer.elapsed:.2f}s, {importer.rows_per_second:.0f} rows/s"
+        ))
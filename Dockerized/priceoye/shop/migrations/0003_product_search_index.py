@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from shop.search import create_search_index, drop_search_index
+
+
+def forwards(apps, schema_editor):
+    create_search_index(schema_editor)
+
+
+def backwards(apps, schema_editor):
+    drop_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0002_product_price_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
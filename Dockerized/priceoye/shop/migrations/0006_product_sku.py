@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:29
+
+from django.db import migrations, models
+
+from shop.search import create_search_index
+
+
+def reinstall_search_index(apps, schema_editor):
+    # SQLite rebuilds shop_product to add a unique column, dropping the FTS triggers.
+    create_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0005_product_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+    ]
@@ -7,6 +7,8 @@ class Product(models.Model):
     Model representing a product.
 
     Attributes:
+        sku: The supplier's stock keeping unit. Optional, but unique when
+             set; bulk imports use it to match existing products.
         name: The name of the product.
         description: A description of the product.
         price: The price of the product.
@@ -15,7 +17,10 @@ class Product(models.Model):
                 does not have a brand.
         category: The category of the product. This can be null if the product 
                    does not have a category.
+        updated_at: When the product was last changed. Used for ETag and
+                    Last-Modified validators.
     """
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(max_length=100)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -32,6 +37,16 @@ class Product(models.Model):
         null=True,
         blank=True
     )
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Supports keyset pagination on (price, id).
+            models.Index(fields=['price', 'id'], name='shop_product_price_id_idx'),
+            # Support faceted filtering and counting by brand/category and price.
+            models.Index(fields=['category', 'price'], name='shop_product_cat_price_idx'),
+            models.Index(fields=['brand', 'price'], name='shop_product_brand_price_idx'),
+        ]
 
     def __str__(self) -> str:
         """
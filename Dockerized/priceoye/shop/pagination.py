@@ -0,0 +1,27 @@
+from core.pagination import KeysetPagination
+from .search import ProductSearchFilter
+
+
+class ProductPagination(KeysetPagination):
+    """
+    Keyset pagination for products.
+
+    Defaults to ordering by id. Clients can ask for price ordering with
+    `?ordering=price` or `?ordering=-price`; id is appended as a
+    tie-breaker so the ordering stays unique. Search results (`?q=`) are
+    ordered by relevance unless an ordering is given explicitly.
+    """
+    ordering = ('id',)
+    ordering_choices = {
+        'id': ('id',),
+        '-id': ('-id',),
+        'price': ('price', 'id'),
+        '-price': ('-price', '-id'),
+    }
+    search_ordering = ('-search_rank', 'id')
+
+    def get_ordering(self, request, queryset, view):
+        searching = request.query_params.get(ProductSearchFilter.search_param, '').strip()
+        if searching and request.query_params.get(self.ordering_param) not in self.ordering_choices:
+            return self.search_ordering
+        return super().get_ordering(request, queryset, view)
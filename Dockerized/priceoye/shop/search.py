@@ -0,0 +1,194 @@
+"""
+Full-text search over Product.name and Product.description.
+
+On PostgreSQL the search runs against `shop_product.search_vector`, a
+stored generated tsvector column (name weighted A, description weighted B)
+with a GIN index. On SQLite it runs against the `shop_product_fts` FTS5
+table, an external-content index over shop_product kept in sync by
+triggers. Both are created by create_search_index(), which the shop
+migrations call. Other backends fall back to a plain icontains filter.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import BaseFilterBackend
+
+SEARCH_CONFIG = 'english'
+
+# Column weights for the SQLite bm25() ranking function: name, description.
+FTS5_WEIGHTS = (10.0, 4.0)
+
+POSTGRES_CREATE = [
+    f"""
+    ALTER TABLE shop_product ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS shop_product_search_idx ON shop_product USING GIN (search_vector)",
+]
+
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS shop_product_search_idx",
+    "ALTER TABLE shop_product DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_CREATE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS shop_product_fts USING fts5(
+        name, description, content='shop_product', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS shop_product_fts_ai AFTER INSERT ON shop_product BEGIN
+        INSERT INTO shop_product_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS shop_product_fts_ad AFTER DELETE ON shop_product BEGIN
+        INSERT INTO shop_product_fts(shop_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS shop_product_fts_au AFTER UPDATE OF name, description ON shop_product BEGIN
+        INSERT INTO shop_product_fts(shop_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO shop_product_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    "INSERT INTO shop_product_fts(shop_product_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS shop_product_fts_ai",
+    "DROP TRIGGER IF EXISTS shop_product_fts_ad",
+    "DROP TRIGGER IF EXISTS shop_product_fts_au",
+    "DROP TABLE IF EXISTS shop_product_fts",
+]
+
+
+def create_search_index(schema_editor):
+    """
+    Create the full-text index for the current database backend.
+
+    Safe to call more than once. On SQLite it must be called again after
+    a migration rebuilds shop_product, which drops the triggers along
+    with the old table.
+    """
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRES_CREATE, 'sqlite': SQLITE_CREATE}.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(schema_editor):
+    """
+    Drop the full-text index created by create_search_index().
+    """
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRES_DROP, 'sqlite': SQLITE_DROP}.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def search_terms(text):
+    """
+    Split free text into words, dropping anything that is not a word
+    character so user input can never be parsed as query syntax.
+    """
+    return re.findall(r'\w+', text)
+
+
+def fts5_query(words):
+    """
+    Build an FTS5 MATCH expression that requires every word.
+
+    Every word is quoted and the last one is a prefix match to support
+    search-as-you-type.
+    """
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def tsquery(words):
+    """
+    Build a PostgreSQL to_tsquery() expression equivalent to fts5_query().
+    """
+    terms = list(words)
+    terms[-1] += ':*'
+    return ' & '.join(terms)
+
+
+def search_products(queryset, text):
+    """
+    Filter a Product queryset down to rows matching `text`.
+
+    The returned queryset is annotated with `search_rank`, where a higher
+    value means a better match. It is not ordered; callers order by
+    ('-search_rank', 'id') to get relevance order.
+    """
+    vendor = connection.vendor
+    table = queryset.model._meta.db_table
+    words = search_terms(text)
+    if not words:
+        return queryset.annotate(search_rank=RawSQL('0.0', [], output_field=FloatField())).none()
+
+    if vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+
+        vector = RawSQL(f'"{table}"."search_vector"', [], output_field=SearchVectorField())
+        query = SearchQuery(tsquery(words), config=SEARCH_CONFIG, search_type='raw')
+        return queryset.alias(search_vector=vector).filter(search_vector=query).annotate(
+            search_rank=SearchRank(vector, query)
+        )
+
+    if vendor == 'sqlite':
+        match = fts5_query(words)
+        # bm25() returns lower-is-better scores, negate so both backends agree.
+        weights = ', '.join(str(weight) for weight in FTS5_WEIGHTS)
+        rank = RawSQL(
+            f'SELECT -bm25(shop_product_fts, {weights}) FROM shop_product_fts '
+            f'WHERE shop_product_fts MATCH %s AND rowid = "{table}"."id"',
+            (match,),
+            output_field=FloatField(),
+        )
+        matches = RawSQL('SELECT rowid FROM shop_product_fts WHERE shop_product_fts MATCH %s', (match,))
+        return queryset.filter(id__in=matches).annotate(search_rank=rank)
+
+    return queryset.filter(Q(name__icontains=text) | Q(description__icontains=text)).annotate(
+        search_rank=RawSQL('1.0', [], output_field=FloatField())
+    )
+
+
+class ProductSearchFilter(BaseFilterBackend):
+    """
+    Filter backend that applies search_products() for the `?q=` parameter.
+    """
+    search_param = 'q'
+
+    def get_search_text(self, request):
+        return request.query_params.get(self.search_param, '').strip()
+
+    def filter_queryset(self, request, queryset, view):
+        text = self.get_search_text(request)
+        if not text:
+            return queryset
+        return search_products(queryset, text)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.search_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Full-text search over product name and description.',
+                'schema': {'type': 'string'},
+            },
+        ]
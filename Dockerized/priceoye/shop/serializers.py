@@ -1,11 +1,33 @@
 from rest_framework import serializers
+from brands.serializers import BrandSerializer
+from categories.serializers import CategorySerializer
+from core.serializers import ExpandableFieldsMixin, SparseFieldsMixin
 from shop.models import Product
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(ExpandableFieldsMixin, SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer class for the Product model.
+
+    `?expand=brand,category` inlines the related brand and category, and
+    `?fields=` / `?omit=` trim the output.
     """
+    expandable_fields = {
+        'brand': BrandSerializer,
+        'category': CategorySerializer,
+    }
+
     class Meta:
         model = Product
         fields = '__all__'
+
+
+class ProductSummarySerializer(serializers.ModelSerializer):
+    """
+    Read-only short view of a product, used when another resource inlines
+    it (e.g. the lines of an order). Leaves out the description.
+    """
+    class Meta:
+        model = Product
+        fields = ['id', 'sku', 'name', 'price']
+        read_only_fields = fields
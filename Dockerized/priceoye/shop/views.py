@@ -1,10 +1,94 @@
-from rest_framework import viewsets
+import time
+
+from rest_framework import exceptions, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from brands.models import Brand
+from categories.models import Category
+from core.views import (
+    CachedViewSetMixin, ConditionalGetViewSetMixin, ExpandableViewSetMixin, ExportViewSetMixin,
+    SparseFieldsViewSetMixin,
+)
+from .bulk import MAX_BULK_SIZE, apply_updates, validate_updates
+from .facets import apply_filters, facet_counts, parse_filters
 from .models import Product
+from .pagination import ProductPagination
+from .search import ProductSearchFilter
 from .serializers import ProductSerializer
+from .signals import product_viewed
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(CachedViewSetMixin, ConditionalGetViewSetMixin, ExpandableViewSetMixin,
+                     ExportViewSetMixin, SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     """
     A viewset for handling CRUD operations on products.
+
+    Lists are keyset paginated, see ProductPagination for the supported
+    orderings. `?q=` runs a ranked full-text search, see shop.search.
+    `?expand=brand,category` inlines the related objects and `?fields=`
+    / `?omit=` limit both the output and the columns read. List and detail
+    responses carry ETag and Last-Modified validators and are served from
+    the catalog cache. Staff can stream the whole (searched) catalog from
+    `export/`, and `PATCH bulk/` reprices many products at once.
+    Every product page served sends product_viewed, see shop.signals.
+
+    Brands and categories are cache dependencies: they can be expanded
+    into products, and deleting one nulls product foreign keys without
+    sending product signals.
     """
     queryset = Product.objects.all()
-    serializer_class = ProductSerializer
\ No newline at end of file
+    serializer_class = ProductSerializer
+    pagination_class = ProductPagination
+    filter_backends = [ProductSearchFilter]
+    cache_models = [Product, Brand, Category]
+    export_dataset = 'products'
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            product_viewed.send(sender=Product, product_id=int(self.kwargs[self.lookup_url_kwarg or self.lookup_field]))
+        return response
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        List products filtered by brand, category and price range, along
+        with the product counts per brand, category and price bucket.
+
+        Accepts `brand` and `category` (comma-separated ids), `price_min`,
+        `price_max` and the usual search and pagination parameters.
+        """
+        filters = parse_filters(request.query_params)
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = self.paginate_queryset(apply_filters(queryset, filters))
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        response.data['facets'] = facet_counts(queryset, filters)
+        return response
+
+    @action(detail=False, methods=['patch'])
+    def bulk(self, request):
+        """
+        Update the price and/or stock of many products at once.
+
+        The body is a list of `{id, price?, stock_quantity?}` objects, at
+        most MAX_BULK_SIZE of them. Valid items are applied in one
+        transaction and invalid ones are reported by position; see
+        shop.bulk. The response also reports the throughput.
+        """
+        if not isinstance(request.data, list):
+            raise exceptions.ValidationError({'non_field_errors': ['Expected a list of updates.']})
+        if len(request.data) > MAX_BULK_SIZE:
+            raise exceptions.ValidationError(
+                {'non_field_errors': [f'At most {MAX_BULK_SIZE} updates per request.']}
+            )
+        started = time.monotonic()
+        rows, errors = validate_updates(request.data)
+        updated = apply_updates(rows)
+        elapsed = time.monotonic() - started
+        return Response({
+            'updated': updated,
+            'errors': errors,
+            'elapsed': round(elapsed, 4),
+            'rows_per_second': round(updated / elapsed) if elapsed else None,
+        })
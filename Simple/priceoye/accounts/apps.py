@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "accounts"
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from rest_framework.authtoken.models import Token
+        from .authentication import invalidate_token
+        from .models import CustomUser
+        from .user_cache import invalidate_user
+
+        post_save.connect(invalidate_user, sender=CustomUser, dispatch_uid='accounts-invalidate-user-save')
+        post_delete.connect(invalidate_user, sender=CustomUser, dispatch_uid='accounts-invalidate-user-delete')
+        post_delete.connect(invalidate_token, sender=Token, dispatch_uid='accounts-invalidate-token')
@@ -0,0 +1,140 @@
+"""
+Authentication classes.
+
+DispatchingAuthentication is the only class in
+DEFAULT_AUTHENTICATION_CLASSES. It picks one authenticator per request
+from the `Authorization` scheme (or the session cookie when there is no
+header) instead of trying JWT, session, Basic and token authentication
+in turn, so a missing or malformed header costs nothing and the PBKDF2
+hash of Basic authentication only runs for requests that ask for it.
+The JWT and token authenticators resolve users through
+accounts.user_cache.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    BaseAuthentication, BasicAuthentication, SessionAuthentication, TokenAuthentication,
+    get_authorization_header,
+)
+from rest_framework.authtoken.models import Token
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from accounts import user_cache
+
+TOKEN_KEY_PREFIX = 'auth:token'
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication resolving the token's user through
+    accounts.user_cache instead of a query per request.
+
+    The checks are those of JWTAuthentication: the user must exist and be
+    active and, with CHECK_REVOKE_TOKEN, still have the password the
+    token was issued for.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        try:
+            user = user_cache.get_user(user_id)
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+
+        return user
+
+
+def token_cache_key(key):
+    return f'{TOKEN_KEY_PREFIX}:{hashlib.sha256(key.encode("utf-8")).hexdigest()}'
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    DRF token authentication caching the token to user id mapping (under
+    a hash of the token) for AUTH_USER_CACHE_TTL seconds and resolving
+    the user through accounts.user_cache. Deleting a token drops its
+    entry, see invalidate_token().
+    """
+
+    def authenticate_credentials(self, key):
+        cache = user_cache.get_cache()
+        cache_key = token_cache_key(key)
+        user_id = cache.get(cache_key)
+        if user_id is None:
+            user_id = Token.objects.filter(key=key).values_list('user_id', flat=True).first()
+            if user_id is None:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            cache.set(cache_key, user_id, user_cache.get_shared_ttl())
+        try:
+            user = user_cache.get_user(user_id)
+        except get_user_model().DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return user, key
+
+
+def invalidate_token(sender, instance, **kwargs):
+    """
+    post_delete receiver for Token.
+    """
+    user_cache.get_cache().delete(token_cache_key(instance.key))
+
+
+class DispatchingAuthentication(BaseAuthentication):
+    """
+    Authenticate a request with the one authenticator its credentials
+    call for:
+
+    - `Authorization: Bearer <jwt>`: CachedJWTAuthentication;
+    - `Authorization: Token <key>`: CachedTokenAuthentication;
+    - `Authorization: Basic <credentials>`: BasicAuthentication;
+    - no `Authorization` header but a session cookie: SessionAuthentication
+      (with its CSRF check);
+    - anything else: anonymous.
+
+    Unauthenticated requests to protected views get a 401 with the
+    Bearer challenge.
+    """
+
+    def __init__(self):
+        self.jwt = CachedJWTAuthentication()
+        self.schemes = {scheme.lower().encode(): self.jwt for scheme in api_settings.AUTH_HEADER_TYPES}
+        self.schemes[CachedTokenAuthentication.keyword.lower().encode()] = CachedTokenAuthentication()
+        self.schemes[b'basic'] = BasicAuthentication()
+        self.session = SessionAuthentication()
+
+    def get_authenticator(self, request):
+        header = get_authorization_header(request).split()
+        if header:
+            return self.schemes.get(header[0].lower())
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return self.session
+        return None
+
+    def authenticate(self, request):
+        authenticator = self.get_authenticator(request)
+        if authenticator is None:
+            return None
+        return authenticator.authenticate(request)
+
+    def authenticate_header(self, request):
+        return self.jwt.authenticate_header(request)
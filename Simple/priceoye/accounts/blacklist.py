@@ -0,0 +1,163 @@
+"""
+Revocation of JWT refresh tokens.
+
+Revoked refresh tokens are stored in RevokedToken, keyed by 16 bytes of
+the SHA-256 of their jti, until they expire. Rotating a refresh token
+(ROTATE_REFRESH_TOKENS with BLACKLIST_AFTER_ROTATION) revokes the old
+one, and so does logging out through the blacklist endpoint. Revoking
+is an INSERT, which fails on the primary key if the token already was
+revoked, so two concurrent refreshes with the same token cannot both
+succeed.
+
+Refreshing and verifying a token first check that it is not revoked.
+With rotation every refresh presents a token never seen before, so
+caching the answer would not help. Instead, each process keeps a Bloom
+filter of the revoked digests and only looks up the tokens it reports:
+the revoked ones and about BLACKLIST_ERROR_RATE of the others, so valid
+tokens practically never hit the table. The filter is sized for
+REFRESH_BLACKLIST_CAPACITY tokens and rebuilt from the table every
+REBUILD_INTERVAL seconds, which forgets the expired ones. Tokens revoked
+by other processes are read every REFRESH_BLACKLIST_SYNC_INTERVAL
+seconds; until then, only the INSERT of a rotation catches them.
+prune() (the prune_revoked_tokens command) deletes the expired rows.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from accounts.models import RevokedToken
+
+BLACKLIST_ERROR_RATE = 0.01
+REBUILD_INTERVAL = 3600
+# Rows are read again this long after their revoked_at, for transactions
+# that committed late.
+SYNC_MARGIN = timedelta(seconds=60)
+
+
+class BloomFilter:
+    """
+    Bloom filter of 16-byte digests, sized for `capacity` items at
+    `error_rate` false positives.
+    """
+
+    def __init__(self, capacity, error_rate=BLACKLIST_ERROR_RATE):
+        capacity = max(capacity, 1)
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, digest):
+        # The digest is already uniformly distributed: derive the positions
+        # from its two halves (double hashing).
+        first = int.from_bytes(digest[:8], 'big')
+        step = int.from_bytes(digest[8:16], 'big') | 1
+        return ((first + i * step) % self.size for i in range(self.hashes))
+
+    def add(self, digest):
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, digest):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+
+_filter = None
+_built = 0.0
+_synced = 0.0
+_synced_since = None
+_lock = threading.Lock()
+
+
+def get_capacity():
+    return getattr(settings, 'REFRESH_BLACKLIST_CAPACITY', 1_000_000)
+
+
+def get_sync_interval():
+    return getattr(settings, 'REFRESH_BLACKLIST_SYNC_INTERVAL', 5)
+
+
+def token_digest(token):
+    return hashlib.sha256(str(token[api_settings.JTI_CLAIM]).encode('utf-8')).digest()[:16]
+
+
+def _load():
+    """
+    Return the Bloom filter of this process, rebuilt or brought up to date
+    with the table when due.
+    """
+    global _filter, _built, _synced, _synced_since
+    with _lock:
+        now = time.monotonic()
+        if _filter is None or now - _built >= REBUILD_INTERVAL:
+            started = timezone.now()
+            bloom = BloomFilter(get_capacity())
+            for digest in RevokedToken.objects.filter(expires_at__gt=started).values_list('digest', flat=True).iterator():
+                bloom.add(bytes(digest))
+            _filter, _built, _synced, _synced_since = bloom, now, now, started
+        elif now - _synced >= get_sync_interval():
+            started = timezone.now()
+            for digest in RevokedToken.objects.filter(revoked_at__gte=_synced_since - SYNC_MARGIN).values_list('digest', flat=True):
+                _filter.add(bytes(digest))
+            _synced, _synced_since = now, started
+        return _filter
+
+
+def is_revoked(token):
+    """
+    Return whether a refresh token was revoked. Reads the table only for
+    the tokens the Bloom filter reports.
+    """
+    digest = token_digest(token)
+    if digest not in _load():
+        return False
+    return RevokedToken.objects.filter(digest=digest).exists()
+
+
+def revoke(token):
+    """
+    Revoke a refresh token until it expires. Returns False if it already
+    was revoked.
+    """
+    digest = token_digest(token)
+    bloom = _load()
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(digest=digest, revoked_at=timezone.now(),
+                                        expires_at=datetime_from_epoch(token['exp']))
+    except IntegrityError:
+        return False
+    with _lock:
+        bloom.add(digest)
+    return True
+
+
+def reset():
+    """
+    Drop this process's Bloom filter, rebuilt on the next check.
+    """
+    global _filter
+    with _lock:
+        _filter = None
+
+
+def prune(batch_size=1000, now=None):
+    """
+    Delete the revoked tokens that expired, `batch_size` rows per DELETE.
+    Returns the number of rows deleted.
+    """
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        digests = list(RevokedToken.objects.filter(expires_at__lte=now).order_by('expires_at')
+                       .values_list('digest', flat=True)[:batch_size])
+        if not digests:
+            return deleted
+        deleted += RevokedToken.objects.filter(digest__in=[bytes(digest) for digest in digests]).delete()[0]
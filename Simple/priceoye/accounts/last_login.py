@@ -0,0 +1,110 @@
+"""
+Write-behind last login times for issued JWTs.
+
+With UPDATE_LAST_LOGIN, simplejwt updates CustomUser.last_login every
+time it issues a token pair, one UPDATE per login, all on the hot rows
+of active users. Instead, TokenObtainPairSerializer calls record(),
+which keeps the latest login time per user in memory, and flush()
+writes all of them in one UPDATE per FLUSH_BATCH_SIZE users:
+
+    UPDATE accounts_customuser
+       SET last_login = CASE WHEN id = 1 THEN ... WHEN id = 2 THEN ... END
+     WHERE (id = 1 AND (last_login IS NULL OR last_login < ...)) OR ...
+
+so a time never replaces a later one written by another worker.
+
+The first login recorded after a flush starts a timer, so the table lags
+behind by at most LAST_LOGIN_FLUSH_INTERVAL seconds. Pending times are
+also flushed when the worker exits. A worker killed outright loses the
+times recorded since its last flush.
+
+Session and auth token logins are rare and still update last_login
+directly. The UPDATE sends no post_save, so it does not invalidate the
+cached users of accounts.user_cache, which do not depend on last_login.
+"""
+import atexit
+import threading
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Case, Q, Value, When
+from django.utils import timezone
+
+FLUSH_BATCH_SIZE = 500
+
+_pending = {}
+_lock = threading.Lock()
+_timer = None
+
+
+def get_interval():
+    return getattr(settings, 'LAST_LOGIN_FLUSH_INTERVAL', 30)
+
+
+def record(user, when=None):
+    """
+    Record that `user` logged in at `when` (defaults to now).
+    """
+    global _timer
+    when = when or timezone.now()
+    user.last_login = when
+    with _lock:
+        previous = _pending.get(user.pk)
+        if previous is None or previous < when:
+            _pending[user.pk] = when
+        if _timer is None:
+            _timer = threading.Timer(get_interval(), _flush_in_background)
+            _timer.daemon = True
+            _timer.start()
+
+
+def flush():
+    """
+    Write the pending login times. Returns the number of users updated.
+    """
+    global _timer
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+    if not pending:
+        return 0
+    try:
+        return _write(pending)
+    except Exception:
+        # Keep the times for the next flush, unless newer ones came in.
+        with _lock:
+            for user_id, when in pending.items():
+                if user_id not in _pending or _pending[user_id] < when:
+                    _pending[user_id] = when
+        raise
+
+
+def _write(pending):
+    updated = 0
+    items = list(pending.items())
+    for start in range(0, len(items), FLUSH_BATCH_SIZE):
+        batch = items[start:start + FLUSH_BATCH_SIZE]
+        newer = reduce(or_, (Q(pk=user_id) & (Q(last_login__isnull=True) | Q(last_login__lt=when))
+                             for user_id, when in batch))
+        updated += get_user_model().objects.filter(newer).update(
+            last_login=Case(*(When(pk=user_id, then=Value(when)) for user_id, when in batch)),
+        )
+    return updated
+
+
+def _flush_in_background():
+    try:
+        flush()
+    finally:
+        # The timer thread's connection is not reused.
+        connection.close()
+
+
+# Times recorded since the last flush are written when the worker exits.
+atexit.register(flush)
@@ -1,4 +1,10 @@
+from django.utils.translation import gettext_lazy as _
 from rest_framework.serializers import ModelSerializer
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
+from accounts import blacklist, last_login
 from accounts.models import CustomUser
 
 class AccountSerializer(ModelSerializer):
@@ -12,4 +18,71 @@ class AccountSerializer(ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ['username','email','first_name','last_name','password']
-        # fields = '__all__'
\ No newline at end of file
+        # fields = '__all__'
+
+class UserSummarySerializer(ModelSerializer):
+    """
+    Read-only public view of a user, used when another resource inlines
+    its owner. Never exposes the password hash or permission flags.
+    """
+    class Meta:
+        model = CustomUser
+        fields = ['id', 'username', 'email', 'first_name', 'last_name']
+        read_only_fields = fields
+
+
+class TokenObtainPairSerializer(jwt_serializers.TokenObtainPairSerializer):
+    """
+    simplejwt's token pair serializer, recording the login time with
+    accounts.last_login instead of updating it right away. Set as
+    SIMPLE_JWT['TOKEN_OBTAIN_SERIALIZER'], with UPDATE_LAST_LOGIN off.
+    """
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        last_login.record(self.user)
+        return data
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    """
+    simplejwt's refresh serializer, refusing the tokens revoked in
+    accounts.blacklist and revoking the old token on rotation. Set as
+    SIMPLE_JWT['TOKEN_REFRESH_SERIALIZER'].
+    """
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if blacklist.is_revoked(refresh):
+            raise TokenError(_('Token is blacklisted'))
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            # Losing the race against a concurrent refresh with the same
+            # token also refuses it.
+            if api_settings.BLACKLIST_AFTER_ROTATION and not blacklist.revoke(refresh):
+                raise TokenError(_('Token is blacklisted'))
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
+
+
+class TokenVerifySerializer(jwt_serializers.TokenVerifySerializer):
+    """
+    simplejwt's verify serializer, also refusing the tokens revoked in
+    accounts.blacklist. Set as SIMPLE_JWT['TOKEN_VERIFY_SERIALIZER'].
+    """
+    def validate(self, attrs):
+        if blacklist.is_revoked(UntypedToken(attrs['token'])):
+            raise TokenError(_('Token is blacklisted'))
+        return {}
+
+
+class TokenBlacklistSerializer(jwt_serializers.TokenBlacklistSerializer):
+    """
+    simplejwt's blacklist (logout) serializer, revoking the refresh token
+    in accounts.blacklist. Set as SIMPLE_JWT['TOKEN_BLACKLIST_SERIALIZER'].
+    """
+    def validate(self, attrs):
+        blacklist.revoke(self.token_class(attrs['refresh']))
+        return {}
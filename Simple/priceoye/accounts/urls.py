@@ -1,5 +1,6 @@
 from django.urls import re_path, include, path
 from rest_framework.routers import DefaultRouter
+from rest_framework_simplejwt.views import TokenBlacklistView
 from .views import AccountViewSet
 from accounts.views import activation
 
@@ -9,6 +10,7 @@ URL patterns for the accounts app.
 This module defines the URL patterns for the accounts app in the PriceOye project.
 It includes the following patterns:
 - Authentication URLs provided by Djoser package.
+- JWT refresh token blacklist (logout) URL.
 - Activation URL for account activation.
 - API authentication URL for the Django Rest Framework.
 - URLs for custom user views provided by the AccountViewSet.
@@ -21,6 +23,7 @@ router.register(r'customusers',AccountViewSet, basename='customusers')
 urlpatterns = [
     re_path(r'^auth/', include('djoser.urls')),
     re_path(r'^auth/', include('djoser.urls.jwt')),
+    re_path(r'^auth/jwt/blacklist/?$', TokenBlacklistView.as_view(), name='jwt-blacklist'),
     re_path(r'^auth/', include('djoser.urls.authtoken')),
     re_path(r'^auth/', include('djoser.social.urls')),
     path('activate/<str:uid>/<str:token>/', activation, name='activation'),
@@ -0,0 +1,107 @@
+"""
+Two-level cache of the users behind authenticated requests.
+
+Token authentication only needs the user row to check that the account
+still exists and is active, yet loading it costs a query per request.
+get_user() resolves a user id through:
+
+1. a per-process dict, whose entries live AUTH_USER_LOCAL_TTL seconds,
+   of at most LOCAL_MAX_USERS users;
+2. the shared cache (AUTH_USER_CACHE_ALIAS), for AUTH_USER_CACHE_TTL
+   seconds;
+3. the database, filling both levels.
+
+Saving or deleting a CustomUser (which covers deactivation and password
+changes) drops it from the shared cache and from the dict of the current
+process once the transaction commits. Other processes may keep serving
+their copy for up to AUTH_USER_LOCAL_TTL seconds, which bounds how long
+a deactivated account keeps working. Queryset update() calls bypass the
+signals and therefore the invalidation.
+
+Callers get a copy of the cached user, so changes made while handling
+one request do not leak into the next.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+
+KEY_PREFIX = 'auth:user'
+LOCAL_MAX_USERS = 10000
+
+# Ordered by insertion, hence by expiry: expired entries are at the front.
+_local = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[getattr(settings, 'AUTH_USER_CACHE_ALIAS', 'default')]
+
+
+def get_local_ttl():
+    return getattr(settings, 'AUTH_USER_LOCAL_TTL', 5)
+
+
+def get_shared_ttl():
+    return getattr(settings, 'AUTH_USER_CACHE_TTL', 300)
+
+
+def user_key(user_id):
+    return f'{KEY_PREFIX}:{user_id}'
+
+
+def get_user(user_id):
+    """
+    Return a copy of the user with primary key `user_id`. Raises
+    DoesNotExist if there is none.
+    """
+    now = time.monotonic()
+    entry = _local.get(user_id)
+    if entry is not None and entry[0] > now:
+        return copy.copy(entry[1])
+
+    cache = get_cache()
+    user = cache.get(user_key(user_id))
+    if user is None:
+        user = get_user_model().objects.get(pk=user_id)
+        cache.set(user_key(user_id), user, get_shared_ttl())
+    with _local_lock:
+        _local.pop(user_id, None)
+        _local[user_id] = (now + get_local_ttl(), user)
+        while _local and (len(_local) > LOCAL_MAX_USERS or next(iter(_local.values()))[0] <= now):
+            _local.popitem(last=False)
+    return copy.copy(user)
+
+
+def invalidate(user_id):
+    """
+    Drop a user from the shared cache and from this process.
+    """
+    get_cache().delete(user_key(user_id))
+    with _local_lock:
+        _local.pop(user_id, None)
+
+
+def clear_local():
+    """
+    Empty the cache of this process.
+    """
+    with _local_lock:
+        _local.clear()
+
+
+def invalidate_user(sender, instance, update_fields=None, **kwargs):
+    """
+    post_save / post_delete receiver for the user model. Saves of the
+    last login time alone do not change what authentication checks.
+    """
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    user_id = instance.pk
+    invalidate(user_id)
+    transaction.on_commit(lambda: invalidate(user_id))
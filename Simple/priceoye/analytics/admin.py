@@ -0,0 +1,7 @@
+from django.contrib import admin
+from .models import DailySales, DailyProductSales, DailyCategorySales, DailyBrandSales
+
+admin.site.register(DailySales)
+admin.site.register(DailyProductSales)
+admin.site.register(DailyCategorySales)
+admin.site.register(DailyBrandSales)
@@ -0,0 +1,19 @@
+from django.apps import AppConfig
+
+
+class AnalyticsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "analytics"
+
+    def ready(self):
+        from django.db.models.signals import post_save
+        from orders.models import Order, OrderDetail
+        from orders.signals import order_placed
+        from shop.signals import product_viewed
+        from .leaderboards import record_view
+        from .signals import record_detail, record_order, record_placed_order
+
+        post_save.connect(record_order, sender=Order, dispatch_uid='analytics-record-order')
+        post_save.connect(record_detail, sender=OrderDetail, dispatch_uid='analytics-record-detail')
+        order_placed.connect(record_placed_order, dispatch_uid='analytics-record-placed-order')
+        product_viewed.connect(record_view, dispatch_uid='analytics-record-view')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.rollups import process_outbox
+
+
+class Command(BaseCommand):
+    """
+    Add the orders and order details created since the last run to the
+    daily sales rollups.
+
+    Meant to run every minute or so from cron; the interval bounds how
+    far the rollups lag behind. See analytics.rollups.
+
+    Example:
+        python manage.py process_sales_outbox --batch-size 5000
+    """
+    help = 'Fold queued orders and order details into the daily sales rollups.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Queued rows processed per transaction.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        processed = process_outbox(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} queued sales events'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from analytics.leaderboards import refresh
+
+
+class Command(BaseCommand):
+    """
+    Fold the recorded product views into the leaderboard scores and
+    cache the top products of every leaderboard.
+
+    Meant to run every few minutes from cron, after process_sales_outbox
+    which feeds the sales. See analytics.leaderboards.
+
+    Example:
+        python manage.py refresh_leaderboards
+    """
+    help = 'Update the leaderboard scores and cache their top products.'
+
+    def handle(self, *args, **options):
+        cached = refresh()
+        self.stdout.write(self.style.SUCCESS(f'Cached {cached} leaderboard lists'))
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0006_product_sku'),
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Leaderboard',
+            fields=[
+                ('name', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('epoch', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductViewEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.BigIntegerField()),
+                ('count', models.PositiveIntegerField()),
+                ('viewed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(max_length=32)),
+                ('category_id', models.BigIntegerField(null=True)),
+                ('score', models.FloatField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['board', '-score'], name='analytics_score_board_idx'), models.Index(fields=['board', 'category_id', '-score'], name='analytics_score_cat_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='productscore',
+            constraint=models.UniqueConstraint(fields=('board', 'product'), name='analytics_score_prod_uniq'),
+        ),
+    ]
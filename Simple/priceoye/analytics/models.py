@@ -0,0 +1,172 @@
+from django.db import models
+from brands.models import Brand
+from categories.models import Category
+from shop.models import Product
+
+
+class SalesOutbox(models.Model):
+    """
+    Model queuing newly created orders and order details for the sales
+    rollups, see analytics.rollups.
+
+    A row is written in the same transaction as the order or detail it
+    points to, and deleted once it has been added to the rollups.
+
+    Attributes:
+        order_id: The id of the new order, or of the order of the new detail.
+        detail_id: The id of the new order detail, or null for an order.
+    """
+    order_id = models.BigIntegerField()
+    detail_id = models.BigIntegerField(null=True)
+
+    def __str__(self) -> str:
+        """
+        String representation of the SalesOutbox instance.
+
+        Returns:
+            str: The queued order or order detail.
+        """
+        return f'Order {self.order_id}' + (f' detail {self.detail_id}' if self.detail_id else '')
+
+
+class SalesRollup(models.Model):
+    """
+    Abstract base for the daily sales rollups.
+
+    Attributes:
+        day: The day the orders were placed on.
+        units: The number of units sold.
+        revenue: The sum of the order detail subtotals (order totals for
+                 DailySales).
+    """
+    day = models.DateField()
+    units = models.PositiveBigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        abstract = True
+
+
+class DailySales(SalesRollup):
+    """
+    Model holding the orders placed, units sold and revenue of one day.
+
+    Attributes:
+        orders: The number of orders placed.
+    """
+    day = models.DateField(unique=True)
+    orders = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f'{self.day}: {self.orders} orders, RS. {self.revenue}'
+
+
+class DailyProductSales(SalesRollup):
+    """
+    Model holding the units sold and revenue of one product on one day.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='analytics_prod_day_uniq'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.day} | {self.product}: {self.units} units, RS. {self.revenue}'
+
+
+class DailyCategorySales(SalesRollup):
+    """
+    Model holding the units sold and revenue of one category on one day.
+    Products without a category are only counted in DailySales.
+    """
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'category'], name='analytics_cat_day_uniq'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.day} | {self.category}: {self.units} units, RS. {self.revenue}'
+
+
+class DailyBrandSales(SalesRollup):
+    """
+    Model holding the units sold and revenue of one brand on one day.
+    Products without a brand are only counted in DailySales.
+    """
+    brand = models.ForeignKey(Brand, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'brand'], name='analytics_brand_day_uniq'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.day} | {self.brand}: {self.units} units, RS. {self.revenue}'
+
+
+class Leaderboard(models.Model):
+    """
+    Model holding the reference time of a leaderboard's scores, see
+    analytics.leaderboards.
+
+    Attributes:
+        name: The name of the leaderboard, a key of the LEADERBOARDS setting.
+        epoch: The time at which stored scores equal their decayed value.
+    """
+    name = models.CharField(max_length=32, primary_key=True)
+    epoch = models.DateTimeField()
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class ProductScore(models.Model):
+    """
+    Model holding the time-decayed score of a product on a leaderboard.
+
+    Attributes:
+        board: The name of the leaderboard.
+        product: The scored product.
+        category_id: The product's category, copied for per-category tops.
+        score: The score, scaled to the leaderboard's epoch.
+    """
+    board = models.CharField(max_length=32)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    category_id = models.BigIntegerField(null=True)
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'product'], name='analytics_score_prod_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['board', '-score'], name='analytics_score_board_idx'),
+            models.Index(fields=['board', 'category_id', '-score'], name='analytics_score_cat_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.board} | {self.product}: {self.score}'
+
+
+class ProductViewEvent(models.Model):
+    """
+    Model queuing product page views for the leaderboards.
+
+    Views are counted in memory and written in batches, one row per
+    product and batch, see analytics.leaderboards.
+
+    Attributes:
+        product_id: The id of the viewed product.
+        count: The number of views in the batch.
+        viewed_at: When the batch was written.
+    """
+    product_id = models.BigIntegerField()
+    count = models.PositiveIntegerField()
+    viewed_at = models.DateTimeField()
+
+    def __str__(self) -> str:
+        return f'Product {self.product_id}: {self.count} views at {self.viewed_at}'
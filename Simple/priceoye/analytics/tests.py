@@ -0,0 +1,200 @@
+import io
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.db.models import F, Sum
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from accounts.models import CustomUser
+from analytics import leaderboards
+from analytics.models import (
+    DailyBrandSales, DailyCategorySales, DailyProductSales, DailySales, Leaderboard, ProductScore,
+    ProductViewEvent, SalesOutbox,
+)
+from analytics.rollups import process_outbox, rebuild
+from brands.models import Brand
+from categories.models import Category
+from orders.checkout import checkout
+from orders.models import Cart, Order, OrderDetail
+from shop.models import Product
+
+
+class SalesRollupTest(APITestCase):
+    """
+    Test case for the daily sales rollups and `/analytics/sales/`.
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'password')
+        self.phones = Category.objects.create(name='Phones')
+        self.acme = Brand.objects.create(name='Acme')
+        self.phone = Product.objects.create(name='Phone', description='', price=Decimal('100.50'), stock_quantity=50,
+                                            category=self.phones, brand=self.acme)
+        self.cable = Product.objects.create(name='Cable', description='', price=2, stock_quantity=50)
+        self.today = timezone.localdate()
+
+    def buy(self, **quantities):
+        for name, quantity in quantities.items():
+            Cart.objects.create(user=self.user, product=getattr(self, name), quantity=quantity)
+        return checkout(self.user)[0]
+
+    def day(self):
+        return DailySales.objects.values('orders', 'units', 'revenue').get(day=self.today)
+
+    def test_incremental(self):
+        self.buy(phone=2, cable=3)
+        self.assertEqual(SalesOutbox.objects.count(), 3)
+        self.assertFalse(DailySales.objects.exists())
+
+        self.assertEqual(process_outbox(), 3)
+        self.assertEqual(self.day(), {'orders': 1, 'units': 5, 'revenue': Decimal('207.00')})
+
+        self.buy(phone=1)
+        order = Order.objects.create(user=self.user, total_amount=4)
+        OrderDetail.objects.create(order=order, product=self.cable, quantity=2, subtotal=4)
+        out = io.StringIO()
+        call_command('process_sales_outbox', stdout=out)
+        self.assertIn('Processed 4 queued', out.getvalue())
+        self.assertFalse(SalesOutbox.objects.exists())
+        self.assertEqual(self.day(), {'orders': 3, 'units': 8, 'revenue': Decimal('311.50')})
+        self.assertEqual(DailyProductSales.objects.get(product=self.phone).units, 3)
+        self.assertEqual(DailyProductSales.objects.get(product=self.cable).revenue, Decimal('10.00'))
+        self.assertEqual(DailyCategorySales.objects.get(category=self.phones).revenue, Decimal('301.50'))
+        self.assertEqual(DailyBrandSales.objects.get(brand=self.acme).units, 3)
+        self.assertEqual(DailyCategorySales.objects.count(), 1)
+
+    def test_rebuild(self):
+        self.buy(phone=2, cable=3)
+        process_outbox()
+        self.buy(phone=1)
+        yesterday = Order.objects.create(user=self.user, total_amount=1)
+        Order.objects.filter(id=yesterday.id).update(order_date=timezone.now() - timedelta(days=1))
+        DailySales.objects.update(revenue=0)
+
+        out = io.StringIO()
+        call_command('rebuild_sales_rollups', str(self.today - timedelta(days=1)), str(self.today), stdout=out)
+        self.assertIn('2 days with sales', out.getvalue())
+        self.assertFalse(SalesOutbox.objects.exists())
+        self.assertEqual(self.day(), {'orders': 2, 'units': 6, 'revenue': Decimal('307.50')})
+        self.assertEqual(DailySales.objects.get(day=self.today - timedelta(days=1)).orders, 1)
+        self.assertEqual(DailyProductSales.objects.get(day=self.today, product=self.phone).units, 3)
+        self.assertEqual(DailyBrandSales.objects.get(day=self.today, brand=self.acme).revenue, Decimal('301.50'))
+
+        # Idempotent, and incremental updates keep adding on top.
+        rebuild(self.today, self.today)
+        self.buy(cable=1)
+        process_outbox()
+        self.assertEqual(self.day(), {'orders': 3, 'units': 7, 'revenue': Decimal('309.50')})
+
+    def test_endpoint(self):
+        self.buy(phone=2, cable=3)
+        process_outbox()
+        url = reverse('analytics-sales')
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(CustomUser.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'start': self.today - timedelta(days=2), 'end': self.today})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['totals'], {'orders': 1, 'units': 5, 'revenue': '207.00'})
+        self.assertEqual([row['units'] for row in response.data['results']], [0, 0, 5])
+        self.assertEqual(response.data['results'][2]['day'], str(self.today))
+
+        response = self.client.get(url, {'group_by': 'product'})
+        self.assertEqual(response.data['results'], [
+            {'id': self.phone.id, 'name': 'Phone', 'units': 2, 'revenue': '201.00'},
+            {'id': self.cable.id, 'name': 'Cable', 'units': 3, 'revenue': '6.00'},
+        ])
+        self.assertEqual(len(self.client.get(url, {'group_by': 'category'}).data['results']), 1)
+        response = self.client.get(url, {'start': self.today, 'end': self.today - timedelta(days=1)})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(LEADERBOARDS={
+    'best-sellers': {'half_life': 3600, 'sale': 1.0, 'view': 0.0},
+    'trending': {'half_life': 600, 'sale': 5.0, 'view': 1.0},
+}, LEADERBOARD_SIZE=2)
+class LeaderboardTest(APITestCase):
+    """
+    Test case for the time-decayed leaderboards and `/leaderboards/<board>/`.
+    """
+
+    def setUp(self):
+        leaderboards.get_cache().clear()
+        self.addCleanup(leaderboards.get_cache().clear)
+        # Views counted by earlier tests.
+        leaderboards._views.clear()
+        self.user = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'password')
+        self.phones = Category.objects.create(name='Phones')
+        self.phone = Product.objects.create(name='Phone', description='', price=100, stock_quantity=50,
+                                            category=self.phones)
+        self.tablet = Product.objects.create(name='Tablet', description='', price=200, stock_quantity=50,
+                                             category=self.phones)
+        self.cable = Product.objects.create(name='Cable', description='', price=2, stock_quantity=50)
+
+    def buy(self, product, quantity):
+        Cart.objects.create(user=self.user, product=product, quantity=quantity)
+        checkout(self.user)
+
+    def ranking(self, board, category=None):
+        return [(row['id'], row['score']) for row in leaderboards.get_top(board, category)]
+
+    def test_decay(self):
+        now = timezone.now()
+        leaderboards.add_events([
+            (self.phone.id, self.phones.id, now - timedelta(hours=2), 'sale', 8),
+            (self.cable.id, None, now, 'sale', 3),
+        ])
+        leaderboards.refresh(now)
+        # 8 units two half-lives ago are worth 2 now.
+        self.assertEqual(self.ranking('best-sellers'), [(self.cable.id, 3.0), (self.phone.id, 2.0)])
+        self.assertEqual(self.ranking('best-sellers', self.phones.id), [(self.phone.id, 2.0)])
+
+    def test_sales_and_views(self):
+        self.buy(self.phone, 2)
+        self.buy(self.cable, 3)
+        process_outbox()
+        self.client.force_authenticate(self.user)
+        for _ in range(12):
+            self.client.get(reverse('products-detail', args=[self.tablet.id]))
+        self.client.force_authenticate(None)
+        leaderboards.flush_views()
+        self.assertEqual(ProductViewEvent.objects.aggregate(views=Sum('count'))['views'], 12)
+
+        out = io.StringIO()
+        call_command('refresh_leaderboards', stdout=out)
+        self.assertFalse(ProductViewEvent.objects.exists())
+        self.assertEqual([product for product, _ in self.ranking('best-sellers')], [self.cable.id, self.phone.id])
+        self.assertEqual([product for product, _ in self.ranking('trending')], [self.cable.id, self.tablet.id])
+        self.assertEqual([product for product, _ in self.ranking('trending', self.phones.id)],
+                         [self.tablet.id, self.phone.id])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('leaderboard', args=['trending']), {'category': self.phones.id})
+        self.assertEqual(response.data['results'][0]['name'], 'Tablet')
+        self.assertEqual(response.data['results'][0]['price'], '200.00')
+        self.assertEqual(self.client.get(reverse('leaderboard', args=['nope'])).status_code, status.HTTP_404_NOT_FOUND)
+        for category in ('phones', '0', '-1', '99999999999999999999999'):
+            response = self.client.get(reverse('leaderboard', args=['trending']), {'category': category})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rebase_and_prune(self):
+        now = timezone.now()
+        leaderboards.add_events([
+            (self.phone.id, self.phones.id, now, 'sale', 4),
+            (self.cable.id, None, now - timedelta(hours=20), 'sale', 1),
+        ])
+        Leaderboard.objects.filter(name='best-sellers').update(epoch=now - timedelta(hours=300))
+        ProductScore.objects.filter(board='best-sellers').update(score=F('score') * 2.0 ** 300)
+
+        leaderboards.refresh(now)
+        self.assertEqual(Leaderboard.objects.get(name='best-sellers').epoch, now)
+        self.assertAlmostEqual(ProductScore.objects.get(board='best-sellers', product=self.phone).score, 4.0, places=4)
+        # 2 ** -20 is below MIN_SCORE.
+        self.assertFalse(ProductScore.objects.filter(board='best-sellers', product=self.cable).exists())
+        self.assertEqual(self.ranking('best-sellers'), [(self.phone.id, 4.0)])
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class BrandsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "brands"
+
+    def ready(self):
+        from core.cache import track_model
+        from .models import Brand
+
+        track_model(Brand)
@@ -1,15 +1,18 @@
 from rest_framework import viewsets
+from core.views import CachedViewSetMixin, ConditionalGetViewSetMixin, SparseFieldsViewSetMixin
 from .models import Brand
 from .serializers import BrandSerializer
 
 
-class BrandViewSet(viewsets.ModelViewSet):
+class BrandViewSet(CachedViewSetMixin, ConditionalGetViewSetMixin, SparseFieldsViewSetMixin,
+                   viewsets.ModelViewSet):
     """
     A viewset for handling CRUD operations on Brand objects.
 
     Inherits from viewsets.ModelViewSet which provides default
     implementations for the standard list, create, retrieve,
-    update, and destroy actions.
+    update, and destroy actions. List and detail responses carry ETag
+    and Last-Modified validators and are served from the catalog cache.
 
     Attributes:
         queryset (QuerySet): The queryset of Brand objects.
@@ -1,8 +1,9 @@
 from rest_framework.serializers import ModelSerializer
+from core.serializers import SparseFieldsMixin
 from categories.models import Category
 
 
-class CategorySerializer(ModelSerializer):
+class CategorySerializer(SparseFieldsMixin, ModelSerializer):
     """
     Serializer class for Category model.
     """
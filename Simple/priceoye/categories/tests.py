@@ -65,7 +65,7 @@ class CategoryTest(APITestCase):
             response = self.client.post(url, data, format='json')#POST IT
         response = self.client.get(url)# GET the list
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
 
     # TESTING GET by ID REQUEST.
     def test_get_category_detail(self):
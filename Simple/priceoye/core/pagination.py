@@ -0,0 +1,174 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset (seek) pagination over a stable, unique ordering.
+
+    Unlike DRF's CursorPagination, which only encodes the first ordering
+    field and falls back to an OFFSET for ties, the cursor here holds the
+    full ordering tuple of the boundary row. Every page is served with a
+    `WHERE (f1, f2, ...) > (v1, v2, ...) ORDER BY f1, f2, ... LIMIT n`
+    style query, so page 1000 costs the same as page 1.
+
+    Attributes:
+        ordering: The default ordering. The last field must be unique
+                  (usually 'id') and no field may be nullable.
+        ordering_choices: Extra orderings the client may pick with the
+                          `ordering` query parameter, keyed by the value
+                          of that parameter.
+        page_size: Default number of rows per page, taken from the
+                   `PAGE_SIZE` REST framework setting.
+        max_page_size: Upper bound for the `page_size` query parameter.
+    """
+    ordering = ('id',)
+    ordering_choices = {}
+    ordering_param = 'ordering'
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        token = request.query_params.get(self.cursor_query_param)
+        if token:
+            self.reverse, position = self.decode_token(token)
+        else:
+            self.reverse, position = False, None
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = tuple(self._flip(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        loaded, deferred = queryset.query.deferred_loading
+        if loaded and not deferred:
+            # The cursor is built from the ordering fields: keep them in an
+            # only() list, except annotations (e.g. search_rank), which are
+            # always selected and are not model fields.
+            names = (field.lstrip('-') for field in ordering)
+            queryset = queryset.only(*loaded, *(name for name in names if name not in queryset.query.annotations))
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.seek_filter(ordering, position))
+            except (ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        # One extra row tells us whether there is another page after this one.
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+
+        if self.reverse:
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = position is not None, has_more
+
+        if (self.has_next or self.has_previous) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        choice = request.query_params.get(self.ordering_param)
+        if choice in self.ordering_choices:
+            return tuple(self.ordering_choices[choice])
+        return tuple(self.ordering)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.build_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.build_link(self.page[0], reverse=True)
+
+    def build_link(self, instance, reverse):
+        position = [self._serialize(self._value(instance, field)) for field in self.ordering]
+        url = replace_query_param(self.base_url, self.cursor_query_param,
+                                  self.encode_token(reverse, position))
+        if self.page_size_query_param not in self.request.query_params:
+            url = remove_query_param(url, self.page_size_query_param)
+        return url
+
+    def seek_filter(self, ordering, position):
+        """
+        Build the keyset predicate for `ordering` starting after `position`.
+
+        Expands the row comparison into
+        `f1 > v1 OR (f1 = v1 AND f2 > v2) OR ...`, and ANDs a redundant
+        `f1 >= v1` in front of it so the planner can turn the whole thing
+        into a single index range scan.
+        """
+        names = [field.lstrip('-') for field in ordering]
+        seek = Q()
+        for i, field in enumerate(ordering):
+            lookup = '__lt' if field.startswith('-') else '__gt'
+            clause = Q(**{names[i] + lookup: position[i]})
+            for j in range(i):
+                clause &= Q(**{names[j]: position[j]})
+            seek |= clause
+        lead = '__lte' if ordering[0].startswith('-') else '__gte'
+        return Q(**{names[0] + lead: position[0]}) & seek
+
+    def encode_token(self, reverse, position):
+        payload = json.dumps({'r': int(reverse), 'v': position}, separators=(',', ':'))
+        return urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_token(self, token):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+            reverse, position = bool(payload['r']), payload['v']
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # Only what _serialize() produces: nested values would reach the query,
+        # and so would integers no database column can hold.
+        if not all(value is None or isinstance(value, (str, float, bool))
+                   or (isinstance(value, int) and -2 ** 63 <= value < 2 ** 63) for value in position):
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, position
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+    @staticmethod
+    def _value(instance, field):
+        attr = field.lstrip('-')
+        for part in attr.split('__'):
+            instance = getattr(instance, part)
+        return instance
+
+    @staticmethod
+    def _serialize(value):
+        if isinstance(value, Decimal):
+            return str(value)
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value
@@ -0,0 +1,175 @@
+import gzip
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core import cache as catalog_cache
+from core import exports
+
+
+class GetOrComputeTest(SimpleTestCase):
+    """
+    Test case for stampede protection in core.cache.get_or_compute().
+
+    The concurrency tests start many threads on the same key at once and
+    count how often the (slow) computation actually runs.
+    """
+    workers = 16
+
+    def setUp(self):
+        self.cache = catalog_cache.get_cache()
+        self.cache.clear()
+        self.key = 'catalog:test:hot'
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+    def slow_compute(self):
+        with self.calls_lock:
+            self.calls += 1
+        time.sleep(0.2)
+        return 'fresh'
+
+    def run_concurrently(self):
+        """
+        Call get_or_compute() from `workers` threads released together and
+        return the values they got.
+        """
+        barrier = threading.Barrier(self.workers)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(catalog_cache.get_or_compute(self.key, self.slow_compute, timeout=60)[0])
+
+        threads = [threading.Thread(target=worker) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_one_recompute_per_expiry(self):
+        """
+        When an entry expires only one caller recomputes it and all the
+        others are served the stale value meanwhile.
+        """
+        self.cache.set(self.key, ('stale', 0.01, time.time() - 1), 60)
+        results = self.run_concurrently()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results.count('fresh'), 1)
+        self.assertEqual(results.count('stale'), self.workers - 1)
+        self.assertEqual(catalog_cache.get_or_compute(self.key, self.slow_compute)[0], 'fresh')
+        self.assertEqual(self.calls, 1)
+
+    def test_one_compute_for_cold_key(self):
+        """
+        On a missing entry one caller computes it and the others wait for it.
+        """
+        results = self.run_concurrently()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['fresh'] * self.workers)
+
+    def test_fresh_entry_is_served(self):
+        """
+        A fresh entry is returned without computing.
+        """
+        self.cache.set(self.key, ('cached', 0.01, time.time() + 60), 120)
+        self.assertEqual(catalog_cache.get_or_compute(self.key, self.slow_compute), ('cached', True))
+        self.assertEqual(self.calls, 0)
+
+    def test_uncacheable_result(self):
+        """
+        A None result is returned but not stored.
+        """
+        value, cached = catalog_cache.get_or_compute(self.key, lambda: None)
+        self.assertEqual((value, cached), (None, False))
+        self.assertIsNone(self.cache.get(self.key))
+        self.assertIsNone(self.cache.get(f'{self.key}:lock'))
+
+    def test_lock_released_on_error(self):
+        """
+        A failing computation does not leave the key locked.
+        """
+        def fail():
+            raise RuntimeError('database down')
+
+        with self.assertRaises(RuntimeError):
+            catalog_cache.get_or_compute(self.key, fail)
+        self.assertIsNone(self.cache.get(f'{self.key}:lock'))
+
+
+class ShouldRefreshTest(SimpleTestCase):
+    """
+    Test case for the XFetch early expiration test.
+    """
+
+    def test_expired(self):
+        with mock.patch('core.cache.random.random', return_value=0.0):
+            self.assertTrue(catalog_cache.should_refresh(delta=0.1, expiry=99, now=100))
+
+    def test_early_refresh_depends_on_draw_and_cost(self):
+        """
+        Close to expiry a high draw triggers a refresh, a low one does not,
+        and a cheap entry is refreshed later than an expensive one.
+        """
+        with mock.patch('core.cache.random.random', return_value=0.9):
+            self.assertTrue(catalog_cache.should_refresh(delta=1.0, expiry=102, now=100))
+            self.assertFalse(catalog_cache.should_refresh(delta=0.1, expiry=102, now=100))
+        with mock.patch('core.cache.random.random', return_value=0.1):
+            self.assertFalse(catalog_cache.should_refresh(delta=1.0, expiry=102, now=100))
+
+
+class ExportStreamTest(SimpleTestCase):
+    """
+    Test case for the encoders of core.exports.
+    """
+    fields = ('id', 'amount', 'timestamp', 'note')
+    rows = [
+        (1, Decimal('10.50'), datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc), 'plain'),
+        (2, Decimal('0.00'), None, 'with, comma'),
+    ]
+
+    def read(self, fmt, compress=False):
+        return b''.join(exports.stream(self.fields, iter(self.rows), fmt, compress=compress))
+
+    def test_csv(self):
+        self.assertEqual(self.read('csv').decode('utf-8').splitlines(), [
+            'id,amount,timestamp,note',
+            '1,10.50,2024-01-02T03:04:05+00:00,plain',
+            '2,0.00,,"with, comma"',
+        ])
+
+    def test_ndjson(self):
+        lines = self.read('ndjson').decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [
+            {'id': 1, 'amount': '10.50', 'timestamp': '2024-01-02T03:04:05Z', 'note': 'plain'},
+            {'id': 2, 'amount': '0.00', 'timestamp': None, 'note': 'with, comma'},
+        ])
+
+    def test_gzip(self):
+        self.assertEqual(gzip.decompress(self.read('csv', compress=True)), self.read('csv'))
+
+    def test_output_is_chunked_lazily(self):
+        """
+        Lines are grouped into chunks of about FLUSH_SIZE bytes, and rows
+        are only pulled from the source as chunks are consumed.
+        """
+        pulled = []
+
+        def source():
+            for i in range(10000):
+                pulled.append(i)
+                yield (i, 'x' * 100)
+
+        chunks = exports.stream(('id', 'text'), source(), 'csv')
+        first = next(chunks)
+        self.assertGreaterEqual(len(first), exports.FLUSH_SIZE)
+        self.assertLess(len(first), exports.FLUSH_SIZE + 200)
+        self.assertLess(len(pulled), 1000)
+        rest = b''.join(chunks)
+        self.assertEqual((first + rest).count(b'\n'), 10001)
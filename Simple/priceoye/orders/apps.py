@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class OrdersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "orders"
+
+    def ready(self):
+        from django.contrib.auth.signals import user_logged_in
+        from core import exports
+        from .models import Order, OrderDetail
+        from .signals import merge_cart_on_login
+
+        exports.register('orders', Order, ['id', 'user_id', 'order_date', 'total_amount'])
+        exports.register('order-details', OrderDetail, ['id', 'order_id', 'product_id', 'quantity', 'subtotal'])
+        user_logged_in.connect(merge_cart_on_login, dispatch_uid='orders-merge-cart-on-login')
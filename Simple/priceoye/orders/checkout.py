@@ -0,0 +1,97 @@
+"""
+Turning a user's cart into an order.
+
+checkout() runs in one transaction and issues the same number of queries
+whatever the cart size:
+
+1. read and lock the cart rows, after flushing the user's cached cart,
+   see orders.cart_store;
+2. lock the cart's products and read them, so the prices and stock the
+   order is built from cannot change until it commits;
+3. consume the units the user already reserved for these products, see
+   orders.reservations;
+4. decrement the stock of the remaining units in a single conditional
+   UPDATE, which only touches rows that still have enough stock;
+5. insert the order, then all of its details with bulk_create();
+6. delete the cart rows.
+
+If the UPDATE matched fewer products than the cart needs, someone else
+bought the last units in between: the transaction is rolled back and the
+short products are reported.
+"""
+from django.db import transaction
+from rest_framework import exceptions
+
+from orders import cart_store, reservations
+from orders.models import Cart, Order, OrderDetail, StockReservation
+from orders.signals import order_placed
+
+
+class EmptyCart(exceptions.ValidationError):
+    default_detail = 'The cart is empty.'
+    default_code = 'empty_cart'
+
+
+def get_cart(user):
+    """
+    Return the user's cart as quantities keyed by product id, its rows
+    locked until the end of the transaction.
+    """
+    return dict(Cart.objects.select_for_update().filter(user=user).order_by('product_id')
+                .values_list('product_id', 'quantity'))
+
+
+def checkout(user):
+    """
+    Place an order for the content of `user`'s cart.
+
+    Returns `(order, details)`. Raises EmptyCart or OutOfStock, in which
+    case nothing is written.
+    """
+    cart_store.flush(user.pk)
+    with transaction.atomic():
+        quantities = get_cart(user)
+        products = reservations.lock_products(list(quantities), fetch=True)
+        # A product deleted since the cart was read has taken its cart row
+        # with it.
+        quantities = {product_id: quantity for product_id, quantity in quantities.items()
+                      if product_id in products}
+        if not quantities:
+            raise EmptyCart()
+
+        covered = reservations.consume(user, quantities)
+        missing = {product_id: quantity - covered.get(product_id, 0)
+                   for product_id, quantity in quantities.items()
+                   if quantity > covered.get(product_id, 0)}
+        if missing:
+            reservations.take_stock(missing, lock=False)
+
+        subtotals = {product_id: products[product_id].price * quantity
+                     for product_id, quantity in quantities.items()}
+        order = Order.objects.create(user=user, total_amount=sum(subtotals.values()))
+        details = OrderDetail.objects.bulk_create([
+            OrderDetail(order=order, product=products[product_id], quantity=quantity,
+                        subtotal=subtotals[product_id])
+            for product_id, quantity in quantities.items()
+        ])
+        order_placed.send(sender=Order, order=order, details=details)
+        Cart.objects.filter(user=user).delete()
+        transaction.on_commit(lambda: cart_store.invalidate(user.pk))
+    return order, details
+
+
+def reserve_cart(user, ttl=None):
+    """
+    Hold the content of `user`'s cart for `ttl`, replacing whatever the
+    user held before. Returns the reservations. Raises EmptyCart or
+    OutOfStock, in which case the previous reservations are kept.
+    """
+    cart_store.flush(user.pk)
+    with transaction.atomic():
+        quantities = get_cart(user)
+        if not quantities:
+            raise EmptyCart()
+        held = StockReservation.objects.filter(user=user).values_list('product_id', flat=True)
+        reservations.lock_products(sorted(set(quantities) | set(held)))
+        reservations.release(user, lock=False)
+        return reservations.reserve(user, quantities, ttl=ttl, lock=False)
@@ -0,0 +1,131 @@
+import multiprocessing
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.db.models import Sum
+
+from accounts.models import CustomUser
+from orders.checkout import checkout, reserve_cart
+from orders.models import Cart, OrderDetail, StockReservation
+from orders.reservations import OutOfStock
+from shop.models import Product
+
+# Transient errors (SQLite "database is locked", PostgreSQL deadlocks or
+# serialization failures) are retried this many times per checkout.
+MAX_RETRIES = 50
+
+
+def run_worker(user_id, product_id, attempts, reserve_first):
+    """
+    Try `attempts` checkouts of one unit of the product as one user.
+    Runs in a child process and returns its counters.
+    """
+    user = CustomUser.objects.get(id=user_id)
+    stats = {'sold': 0, 'rejected': 0, 'retries': 0, 'failed': 0}
+
+    def attempt():
+        with transaction.atomic():
+            Cart.objects.create(user=user, product_id=product_id, quantity=1)
+            if reserve_first:
+                reserve_cart(user)
+            checkout(user)
+
+    for _ in range(attempts):
+        for retry in range(MAX_RETRIES + 1):
+            try:
+                attempt()
+            except OutOfStock:
+                stats['rejected'] += 1
+            except OperationalError:
+                if retry == MAX_RETRIES:
+                    stats['failed'] += 1
+                    break
+                stats['retries'] += 1
+                time.sleep(random.uniform(0.001, 0.01))
+                continue
+            else:
+                stats['sold'] += 1
+            break
+    connections.close_all()
+    return stats
+
+
+class Command(BaseCommand):
+    """
+    Race concurrent checkouts on a single product and check that it is
+    never oversold.
+
+    A throwaway product with `--stock` units is created along with one
+    user per worker process. Every worker then tries `--attempts`
+    checkouts of one unit, retrying transient lock errors. At the end the
+    units sold, the stock left and the units still reserved must add up
+    to the initial stock, with exactly min(stock, attempts) checkouts
+    accepted; the command fails otherwise. The throughput is reported.
+    The test data is deleted unless `--keep` is given.
+
+    Run it against a disposable database, e.g.:
+        python manage.py benchmark_checkout --workers 16 --stock 500 --attempts 50
+    """
+    help = 'Benchmark concurrent checkouts of one product and verify there is no oversell.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent processes.')
+        parser.add_argument('--stock', type=int, default=200, help='Initial stock of the product.')
+        parser.add_argument('--attempts', type=int, default=50, help='Checkouts tried by each worker.')
+        parser.add_argument('--reserve', action='store_true',
+                            help='Reserve the cart before each checkout instead of buying directly.')
+        parser.add_argument('--keep', action='store_true', help='Keep the test product, users and orders.')
+
+    def handle(self, *args, **options):
+        workers, stock, attempts = options['workers'], options['stock'], options['attempts']
+        if min(workers, attempts) < 1 or stock < 0:
+            raise CommandError('--workers and --attempts must be positive, --stock not negative.')
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError('This benchmark needs the fork start method.')
+
+        tag = uuid.uuid4().hex[:8]
+        product = Product.objects.create(name=f'Benchmark {tag}', description='', price=1, stock_quantity=stock)
+        users = [CustomUser.objects.create_user(f'bench-{tag}-{i}', f'bench-{tag}-{i}@example.com')
+                 for i in range(workers)]
+
+        # Children must open their own connections.
+        connections.close_all()
+        started = time.monotonic()
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            results = pool.starmap(run_worker, [(user.id, product.id, attempts, options['reserve'])
+                                                for user in users])
+        elapsed = time.monotonic() - started
+
+        totals = {key: sum(result[key] for result in results) for key in results[0]}
+        product.refresh_from_db()
+        sold = OrderDetail.objects.filter(product=product).aggregate(total=Sum('quantity'))['total'] or 0
+        held = StockReservation.objects.filter(product=product).aggregate(total=Sum('quantity'))['total'] or 0
+        expected = min(stock, workers * attempts - totals['failed'])
+
+        self.stdout.write(
+            f"{workers} workers, {workers * attempts} attempts on {stock} units in {elapsed:.2f}s: "
+            f"{totals['sold']} sold, {totals['rejected']} rejected as sold out, "
+            f"{totals['retries']} retries, {totals['failed']} gave up"
+        )
+        self.stdout.write(
+            f"{totals['sold'] / elapsed:.1f} checkouts/s, "
+            f"{(totals['sold'] + totals['rejected']) / elapsed:.1f} attempts/s"
+        )
+
+        problems = []
+        if product.stock_quantity < 0 or sold > stock:
+            problems.append(f'oversold: {sold} units sold out of {stock}')
+        if sold + product.stock_quantity + held != stock:
+            problems.append(f'stock mismatch: {sold} sold + {product.stock_quantity} left + {held} held != {stock}')
+        if sold != totals['sold'] or (not totals['failed'] and sold != expected):
+            problems.append(f'{sold} units in orders, {totals["sold"]} checkouts accepted, {expected} expected')
+
+        if not options['keep']:
+            product.delete()
+            CustomUser.objects.filter(id__in=[user.id for user in users]).delete()
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS(f'No oversell: {sold} sold, {product.stock_quantity} left'))
@@ -0,0 +1,73 @@
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import CustomUser
+from orders.models import Order
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    """
+    Measure the "my orders" query as the orders table grows.
+
+    One user gets `--orders-per-user` orders; the table is then filled
+    with orders of other users up to each of the `--sizes` in turn, and
+    the first page of the user's orders, newest first, is timed at every
+    size. With the (user, -order_date, -id) index the latency should not
+    depend on the table size. The query plan is printed at the end.
+    The test data is deleted afterwards.
+
+    Run it against a disposable database, e.g.:
+        python manage.py benchmark_my_orders --sizes 10000,100000,1000000
+    """
+    help = 'Time the per-user order listing at growing table sizes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000', help='Comma-separated total order counts.')
+        parser.add_argument('--orders-per-user', type=int, default=50)
+        parser.add_argument('--users', type=int, default=1000, help='Other users owning the filler orders.')
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=200, help='Timed runs per size.')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(size) for size in options['sizes'].split(','))
+        except ValueError:
+            raise CommandError('--sizes must be a comma-separated list of integers.')
+        if min(options['users'], options['repeat'], options['page_size']) < 1:
+            raise CommandError('--users, --repeat and --page-size must be positive.')
+
+        tag = uuid.uuid4().hex[:8]
+        target = CustomUser.objects.create_user(f'bench-{tag}', f'bench-{tag}@example.com')
+        others = CustomUser.objects.bulk_create([
+            CustomUser(username=f'bench-{tag}-{i}', email=f'bench-{tag}-{i}@example.com')
+            for i in range(options['users'])
+        ])
+        try:
+            Order.objects.bulk_create([Order(user=target, total_amount=1)
+                                       for _ in range(options['orders_per_user'])])
+            queryset = Order.objects.filter(user=target).order_by('-order_date', '-id')[:options['page_size']]
+            filled = 0
+            for size in sizes:
+                while filled < size:
+                    count = min(BATCH_SIZE, size - filled)
+                    Order.objects.bulk_create([Order(user=others[(filled + i) % len(others)], total_amount=1)
+                                               for i in range(count)])
+                    filled += count
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    list(queryset.all())
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                self.stdout.write(
+                    f'{size:>10} orders: median {statistics.median(timings):.3f} ms, '
+                    f'p95 {timings[int(len(timings) * 0.95) - 1]:.3f} ms'
+                )
+            self.stdout.write(queryset.explain())
+        finally:
+            CustomUser.objects.filter(id__in=[target.id, *(user.id for user in others)]).delete()
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_stockreservation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='orderdetail',
+            name='order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_details', to='orders.order'),
+        ),
+    ]
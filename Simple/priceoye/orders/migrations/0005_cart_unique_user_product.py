@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:54
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    """
+    Fold duplicate (user, product) cart rows into the oldest one, summing
+    their quantities, so that the unique constraint can be added.
+    """
+    Cart = apps.get_model('orders', 'Cart')
+    duplicates = (Cart.objects.values('user_id', 'product_id')
+                  .annotate(rows=Count('id'), keep=Min('id'), total=Sum('quantity'))
+                  .filter(rows__gt=1))
+    for duplicate in list(duplicates):
+        lines = Cart.objects.filter(user_id=duplicate['user_id'], product_id=duplicate['product_id'])
+        lines.exclude(id=duplicate['keep']).delete()
+        lines.filter(id=duplicate['keep']).update(quantity=duplicate['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_owner_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='cart',
+            name='orders_cart_user_product_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='orders_cart_user_product_uniq'),
+        ),
+    ]
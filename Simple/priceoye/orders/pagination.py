@@ -0,0 +1,18 @@
+from core.pagination import KeysetPagination
+
+
+class OrderPagination(KeysetPagination):
+    """
+    Keyset pagination for orders, newest first.
+
+    The default ordering matches the (user, -order_date, -id) index, so a
+    user's page of orders is read straight off the index. `?ordering=`
+    accepts `order_date`, `-order_date`, `id` and `-id`.
+    """
+    ordering = ('-order_date', '-id')
+    ordering_choices = {
+        '-order_date': ('-order_date', '-id'),
+        'order_date': ('order_date', 'id'),
+        'id': ('id',),
+        '-id': ('-id',),
+    }
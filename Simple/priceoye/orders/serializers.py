@@ -1,8 +1,11 @@
 from rest_framework import serializers
-from orders.models import OrderDetail, Order, Cart
+from accounts.serializers import UserSummarySerializer
+from core.serializers import ExpandableFieldsMixin, SparseFieldsMixin
+from orders.models import OrderDetail, Order, Cart, StockReservation
+from shop.serializers import ProductSerializer, ProductSummarySerializer
 
 
-class OrderDetailSerializer(serializers.ModelSerializer):
+class OrderDetailSerializer(ExpandableFieldsMixin, SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer class for the OrderDetail model.
 
@@ -15,13 +18,31 @@ class OrderDetailSerializer(serializers.ModelSerializer):
         model: The model class that this serializer should use to create 
                instances.
         fields: The fields that should be included in the serialized output.
+        expandable_fields: Relations that `?expand=` can inline (product).
     """
+    expandable_fields = {
+        'product': ProductSerializer,
+    }
+
     class Meta:
         model = OrderDetail
         fields = '__all__'
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderLineSerializer(serializers.ModelSerializer):
+    """
+    Read-only view of an OrderDetail nested in its order, with a summary
+    of the product.
+    """
+    product = ProductSummarySerializer(read_only=True)
+
+    class Meta:
+        model = OrderDetail
+        fields = ['id', 'product', 'quantity', 'subtotal']
+        read_only_fields = fields
+
+
+class OrderSerializer(ExpandableFieldsMixin, SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer class for the Order model.
 
@@ -34,15 +55,21 @@ class OrderSerializer(serializers.ModelSerializer):
         model: The model class that this serializer should use to create 
                instances.
         fields: The fields that should be included in the serialized output.
+        expandable_fields: Relations that `?expand=` can inline (user).
+        order_details: The lines of the order, read-only. Views should
+                       prefetch them, see OrderViewSet.
     """
-    order_details = OrderDetailSerializer(many=True, read_only=True)
+    expandable_fields = {
+        'user': UserSummarySerializer,
+    }
+    order_details = OrderLineSerializer(many=True, read_only=True)
 
     class Meta:
         model = Order
         fields = '__all__'
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer class for the Cart model.
 
@@ -59,3 +86,14 @@ class CartSerializer(serializers.ModelSerializer):
     class Meta:
         model = Cart
         fields = '__all__'
+
+
+class StockReservationSerializer(serializers.ModelSerializer):
+    """
+    Read-only serializer for the StockReservation model.
+    """
+
+    class Meta:
+        model = StockReservation
+        fields = ['id', 'product', 'quantity', 'created_at', 'expires_at']
+        read_only_fields = fields
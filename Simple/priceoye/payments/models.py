@@ -17,6 +17,12 @@ class Payment(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     success = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # A user's payments, newest first, as an index range scan.
+            models.Index(fields=['user', '-timestamp', '-id'], name='payments_pay_user_ts_idx'),
+        ]
+
 
 class Invoice(models.Model):
     """
@@ -0,0 +1,18 @@
+from core.pagination import KeysetPagination
+
+
+class PaymentPagination(KeysetPagination):
+    """
+    Keyset pagination for payments, newest first.
+
+    The default ordering matches the (user, -timestamp, -id) index, so a
+    user's page of payments is read straight off the index. `?ordering=`
+    accepts `timestamp`, `-timestamp`, `id` and `-id`.
+    """
+    ordering = ('-timestamp', '-id')
+    ordering_choices = {
+        '-timestamp': ('-timestamp', '-id'),
+        'timestamp': ('timestamp', 'id'),
+        'id': ('id',),
+        '-id': ('-id',),
+    }
@@ -142,7 +142,7 @@ class InvoiceTest(APITestCase):
         self.client.post(url, data, response = "json")
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     #TEST GET REQUEST by ID
     def test_get_invoice(self):
@@ -195,4 +195,35 @@ class InvoiceTest(APITestCase):
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         with self.assertRaises(Invoice.DoesNotExist):
-            Invoice.objects.get(id = invoice_id)
\ No newline at end of file
+            Invoice.objects.get(id = invoice_id)
+
+class PaymentScopeTest(APITestCase):
+    """
+    Test case for per-user scoping of payments.
+    """
+
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user('alice', 'alice@example.com', 'password')
+        self.bob = CustomUser.objects.create_user('bob', 'bob@example.com', 'password')
+        self.older = Payment.objects.create(user=self.alice, amount=10, success=True)
+        self.newer = Payment.objects.create(user=self.alice, amount=20, success=True)
+        Payment.objects.create(user=self.bob, amount=30, success=True)
+
+    def test_users_see_their_own_payments_newest_first(self):
+        self.client.force_authenticate(self.alice)
+        response = self.client.get(reverse('Payments-list'))
+        self.assertEqual([row['id'] for row in response.data['results']], [self.newer.id, self.older.id])
+
+    def test_staff_see_everything(self):
+        staff = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'adminpassword')
+        self.client.force_authenticate(staff)
+        self.assertEqual(len(self.client.get(reverse('Payments-list')).data['results']), 3)
+
+    def test_idempotent_create(self):
+        self.client.force_authenticate(self.alice)
+        data = {'user': self.alice.id, 'amount': '15.00', 'success': True}
+        first = self.client.post(reverse('Payments-list'), data, format='json', HTTP_IDEMPOTENCY_KEY='pay-1')
+        retry = self.client.post(reverse('Payments-list'), data, format='json', HTTP_IDEMPOTENCY_KEY='pay-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(Payment.objects.filter(user=self.alice).count(), 3)
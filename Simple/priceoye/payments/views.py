@@ -1,11 +1,18 @@
 from rest_framework import viewsets
+from rest_framework.permissions import IsAuthenticated
+from core.views import ExportViewSetMixin, OwnerScopedViewSetMixin, SparseFieldsViewSetMixin
+from orders.idempotency import IdempotentCreateViewSetMixin
 from payments.models import Payment, Invoice
+from payments.pagination import PaymentPagination
 from payments.serializers import PaymentSerializer, InvoiceSerializer
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(IdempotentCreateViewSetMixin, OwnerScopedViewSetMixin, ExportViewSetMixin, SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = PaymentPagination
+    export_dataset = 'payments'
 
-class InvoiceViewSet(viewsets.ModelViewSet):
+class InvoiceViewSet(IdempotentCreateViewSetMixin, SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     queryset = Invoice.objects.all()
     serializer_class = InvoiceSerializer    
\ No newline at end of file
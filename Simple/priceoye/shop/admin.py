@@ -8,9 +8,18 @@
 
 from django.contrib import admin
 from .models import Product
+from .search import search_products
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ['name', 'category', 'price']
     list_filter = ['category', 'price']  # Add filters for category and price
-    search_fields = ['name']
\ No newline at end of file
+    search_fields = ['name']
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Use the full-text index instead of an ILIKE scan over name.
+        """
+        if not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+        return search_products(queryset, search_term), False
\ No newline at end of file
@@ -0,0 +1,250 @@
+"""
+Streaming bulk import of supplier product catalogs.
+
+Rows are read lazily from a CSV or NDJSON file and processed in batches,
+so memory stays flat whatever the file size. For every batch, brand and
+category names are resolved to ids with one query each (creating the
+missing ones), and the products are upserted on their `sku` in a single
+transaction:
+
+- PostgreSQL: COPY into a temporary staging table, then one
+  INSERT ... SELECT ... ON CONFLICT (sku) DO UPDATE.
+- Other backends: bulk_create(update_conflicts=True).
+
+Bulk writes do not send model signals, so the catalog cache is
+invalidated explicitly once the import is done.
+"""
+import csv
+import io
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import connection, transaction
+
+from brands.models import Brand
+from categories.models import Category
+from core import cache as catalog_cache
+from shop.models import Product
+
+COLUMNS = ('sku', 'name', 'description', 'price', 'stock_quantity', 'brand', 'category')
+
+UPSERT_FIELDS = ['name', 'description', 'price', 'stock_quantity', 'brand', 'category', 'updated_at']
+
+STAGING_TABLE = 'shop_product_import'
+
+
+class RowError(ValueError):
+    """
+    Raised for a row that cannot be imported. The import carries on.
+    """
+
+
+def detect_format(path):
+    """
+    Guess the file format from its extension: 'csv' or 'ndjson'.
+    """
+    lowered = str(path).lower()
+    if lowered.endswith('.csv'):
+        return 'csv'
+    if lowered.endswith(('.ndjson', '.jsonl', '.json')):
+        return 'ndjson'
+    raise ValueError(f'Cannot tell the format of {path}, pass it explicitly.')
+
+
+def read_rows(stream, fmt):
+    """
+    Yield `(line_number, row_dict)` pairs from an open text stream.
+
+    Malformed NDJSON lines are yielded as `(line_number, RowError)` so the
+    caller can report them without stopping.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError('expected an object')
+        except ValueError as exc:
+            yield line_number, RowError(f'invalid JSON: {exc}')
+            continue
+        yield line_number, row
+
+
+def _text(row, name, max_length=None, required=True):
+    value = row.get(name)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f'{name} is required')
+    if max_length is not None and len(value) > max_length:
+        raise RowError(f'{name} is longer than {max_length} characters')
+    return value
+
+
+def clean_row(row):
+    """
+    Validate one raw row and return it with typed values.
+    """
+    cleaned = {
+        'sku': _text(row, 'sku', Product._meta.get_field('sku').max_length),
+        'name': _text(row, 'name', Product._meta.get_field('name').max_length),
+        'description': _text(row, 'description', required=False),
+        'brand': _text(row, 'brand', Brand._meta.get_field('name').max_length, required=False) or None,
+        'category': _text(row, 'category', Category._meta.get_field('name').max_length, required=False) or None,
+    }
+    try:
+        price = Decimal(str(row.get('price', '')).strip())
+    except InvalidOperation:
+        raise RowError('price is not a number')
+    if not price.is_finite() or price < 0 or price >= Decimal('1e8'):
+        raise RowError('price is out of range')
+    cleaned['price'] = price.quantize(Decimal('0.01'))
+    try:
+        stock = int(str(row.get('stock_quantity', '')).strip())
+    except ValueError:
+        raise RowError('stock_quantity is not an integer')
+    if stock < 0:
+        raise RowError('stock_quantity cannot be negative')
+    cleaned['stock_quantity'] = stock
+    return cleaned
+
+
+class ProductImporter:
+    """
+    Upserts cleaned product rows batch by batch.
+
+    Attributes:
+        batch_size: Number of rows written per transaction.
+        stats: Running counters: rows read, rows upserted, errors, and the
+               list of `(line_number, message)` for the rejected rows (the
+               first `max_reported_errors` only).
+    """
+    max_reported_errors = 100
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.brand_ids = {}
+        self.category_ids = {}
+        self.stats = {'read': 0, 'upserted': 0, 'errors': 0, 'error_lines': []}
+        self.started = None
+
+    def run(self, rows, on_batch=None):
+        """
+        Import every `(line_number, row)` pair from `rows`.
+
+        `on_batch`, if given, is called with the stats after each batch.
+        """
+        self.started = time.monotonic()
+        rows = iter(rows)
+        try:
+            while True:
+                chunk = list(islice(rows, self.batch_size))
+                if not chunk:
+                    break
+                self.import_batch(chunk)
+                if on_batch is not None:
+                    on_batch(self.stats)
+        finally:
+            if self.stats['upserted']:
+                catalog_cache.invalidate(Product, Brand, Category)
+        return self.stats
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started if self.started is not None else 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.stats['upserted'] / self.elapsed if self.elapsed else 0.0
+
+    def reject(self, line_number, message):
+        self.stats['errors'] += 1
+        if len(self.stats['error_lines']) < self.max_reported_errors:
+            self.stats['error_lines'].append((line_number, message))
+
+    def import_batch(self, chunk):
+        cleaned = {}
+        for line_number, row in chunk:
+            self.stats['read'] += 1
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                row = clean_row(row)
+            except RowError as exc:
+                self.reject(line_number, str(exc))
+                continue
+            # The last occurrence of a sku in a batch wins; a single
+            # INSERT ... ON CONFLICT cannot touch the same row twice.
+            cleaned[row['sku']] = row
+        if not cleaned:
+            return
+
+        rows = list(cleaned.values())
+        with transaction.atomic():
+            self.resolve(Brand, self.brand_ids, {row['brand'] for row in rows})
+            self.resolve(Category, self.category_ids, {row['category'] for row in rows})
+            for row in rows:
+                row['brand_id'] = self.brand_ids.get(row.pop('brand'))
+                row['category_id'] = self.category_ids.get(row.pop('category'))
+            if connection.vendor == 'postgresql':
+                self.upsert_copy(rows)
+            else:
+                self.upsert_bulk(rows)
+        self.stats['upserted'] += len(rows)
+
+    def resolve(self, model, ids, names):
+        """
+        Map names to ids for `model`, creating the missing rows, with at
+        most three queries for the whole batch.
+        """
+        missing = {name for name in names if name is not None and name not in ids}
+        if not missing:
+            return
+        ids.update(model.objects.filter(name__in=missing).values_list('name', 'id'))
+        to_create = missing - ids.keys()
+        if to_create:
+            model.objects.bulk_create([model(name=name) for name in to_create], ignore_conflicts=True)
+            ids.update(model.objects.filter(name__in=to_create).values_list('name', 'id'))
+
+    def upsert_bulk(self, rows):
+        Product.objects.bulk_create(
+            [Product(**row) for row in rows],
+            update_conflicts=True,
+            unique_fields=['sku'],
+            update_fields=UPSERT_FIELDS,
+        )
+
+    def upsert_copy(self, rows):
+        columns = ['sku', 'name', 'description', 'price', 'stock_quantity', 'brand_id', 'category_id']
+        buffer = io.StringIO()
+        # Non-numeric values are quoted, so '' stays an empty string and
+        # only None (written unquoted and empty) is read back as NULL.
+        writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+        for row in rows:
+            writer.writerow([row[column] for column in columns])
+        buffer.seek(0)
+
+        column_list = ', '.join(columns)
+        updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in columns[1:])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} ('
+                'sku varchar(64), name varchar(100), description text, price numeric(10, 2), '
+                'stock_quantity integer, brand_id bigint, category_id bigint'
+                ') ON COMMIT DELETE ROWS'
+            )
+            cursor.cursor.copy_expert(
+                f'COPY {STAGING_TABLE} ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer
+            )
+            cursor.execute(
+                f'INSERT INTO {Product._meta.db_table} ({column_list}, updated_at) '
+                f'SELECT {column_list}, now() FROM {STAGING_TABLE} '
+                f'ON CONFLICT (sku) DO UPDATE SET {updates}, updated_at = EXCLUDED.updated_at'
+            )
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent by ProductViewSet.retrieve() with `product_id` for every product
+# page served, from the cache or not.
+product_viewed = Signal()
@@ -1,7 +1,22 @@
+import json
+import os
+import tempfile
+from base64 import urlsafe_b64encode
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from shop.models import Product
+from shop.pagination import ProductPagination
+from shop.search import search_products
+from core.cache import get_cache, get_stats, reset_stats
 from brands.models import Brand
 from categories.models import Category
 from accounts.models import CustomUser
@@ -84,7 +99,7 @@ class ProductTest(APITestCase):
         response = self.client.post(url, data, format='json') #Adding 1 product
         response = self.client.get(url) #POSTING REQUEST
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1) #GETTING 1 PRODUCT
+        self.assertEqual(len(response.data['results']), 1) #GETTING 1 PRODUCT
 
     # TESTING GET by ID
     def test_get_product(self):
@@ -165,4 +180,748 @@ class ProductTest(APITestCase):
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)   
         with self.assertRaises(Product.DoesNotExist): #Trying to retrieve the brand with specific ID will raise exception DoesNotExist.
-            Product.objects.get(id=product_id)
\ No newline at end of file
+            Product.objects.get(id=product_id)
+
+class ProductPaginationTest(APITestCase):
+    """
+    Test case for keyset pagination on the product list.
+
+    Checks that walking the cursor links visits every product exactly once
+    in the requested order, that the page size is capped and that each
+    page costs the same number of queries regardless of its depth.
+    """
+
+    def setUp(self):
+        """
+        Create a superuser, log them in and add products with repeated prices.
+        """
+        self.superuser = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'adminpassword')
+        self.assertTrue(self.client.login(email='admin@example.com', password='adminpassword'))
+        Product.objects.bulk_create([
+            Product(name=f'Phone {i}', description='NEW', price=100 + (i % 4) * 10, stock_quantity=i)
+            for i in range(23)
+        ])
+        self.url = reverse("products-list")
+
+    def walk(self, url):
+        """
+        Follow the `next` links from `url` and return the ids seen in order.
+        """
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_walk_by_id(self):
+        """
+        Walking the default ordering returns every product once, by id.
+        """
+        ids = self.walk(f'{self.url}?page_size=5')
+        self.assertEqual(ids, list(Product.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_walk_by_price(self):
+        """
+        Price ordering breaks ties on id and never skips or repeats a row.
+        """
+        ids = self.walk(f'{self.url}?page_size=4&ordering=-price')
+        expected = Product.objects.order_by('-price', '-id').values_list('id', flat=True)
+        self.assertEqual(ids, list(expected))
+
+    def test_previous_link(self):
+        """
+        The previous link of the second page returns the first page.
+        """
+        first = self.client.get(f'{self.url}?page_size=5&ordering=price')
+        second = self.client.get(first.data['next'])
+        self.assertIsNone(first.data['previous'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+
+    def test_page_size_is_capped(self):
+        """
+        A page size above the maximum falls back to the cap.
+        """
+        with mock.patch.object(ProductPagination, 'max_page_size', 7):
+            response = self.client.get(f'{self.url}?page_size=1000')
+        self.assertEqual(len(response.data['results']), 7)
+
+    def test_deep_page_query_count(self):
+        """
+        The last page costs the same number of queries as the first one.
+        """
+        response = self.client.get(f'{self.url}?page_size=2')
+        url = response.data['next']
+        while True:
+            page = self.client.get(url)
+            if page.data['next'] is None:
+                break
+            url = page.data['next']
+        get_cache().clear()
+        with self.assertNumQueries(4):  # session + user + ETag probe + page
+            self.client.get(f'{self.url}?page_size=2')
+        with self.assertNumQueries(4):
+            self.client.get(url)
+
+    def test_invalid_cursor(self):
+        """
+        A malformed cursor returns 404 instead of a server error.
+        """
+        response = self.client.get(f'{self.url}?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        for payload in (b'{"r":0,"v":[[1]]}', b'[{"a":1}]', b'{"r":0,"v":[{"a":1}]}',
+                        b'{"r":0,"v":[99999999999999999999999]}'):
+            cursor = urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+            response = self.client.get(f'{self.url}?cursor={cursor}')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ProductSearchTest(APITestCase):
+    """
+    Test case for full-text product search with `?q=`.
+    """
+
+    def setUp(self):
+        """
+        Create a superuser, log them in and add a few products to search.
+        """
+        self.superuser = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'adminpassword')
+        self.assertTrue(self.client.login(email='admin@example.com', password='adminpassword'))
+        self.iphone = Product.objects.create(name='iPhone 14', description='Apple smartphone', price=10, stock_quantity=1)
+        self.galaxy = Product.objects.create(name='Galaxy S23', description='Android phone with an iPhone-like camera', price=20, stock_quantity=1)
+        self.charger = Product.objects.create(name='Charger', description='Fast USB-C charger', price=5, stock_quantity=1)
+        self.url = reverse("products-list")
+
+    def search(self, text, **params):
+        response = self.client.get(self.url, {'q': text, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data['results']]
+
+    def test_matches_name_and_description(self):
+        """
+        Matches in the name rank above matches in the description.
+        """
+        self.assertEqual(self.search('iphone'), [self.iphone.id, self.galaxy.id])
+        self.assertEqual(self.search('usb'), [self.charger.id])
+
+    def test_prefix_match(self):
+        """
+        The last word is matched as a prefix.
+        """
+        self.assertEqual(self.search('charg'), [self.charger.id])
+
+    def test_index_follows_writes(self):
+        """
+        Updates and deletes are reflected in the index immediately.
+        """
+        self.charger.name = 'Wireless pad'
+        self.charger.save()
+        self.assertEqual(self.search('wireless'), [self.charger.id])
+        self.charger.delete()
+        self.assertEqual(self.search('wireless'), [])
+
+    def test_query_syntax_is_escaped(self):
+        """
+        Search operators in user input do not cause errors.
+        """
+        self.assertEqual(self.search('"iphone ('), [self.iphone.id, self.galaxy.id])
+        self.assertEqual(self.search('*'), [])
+
+    def test_explicit_ordering(self):
+        """
+        An explicit ordering overrides relevance order.
+        """
+        self.assertEqual(self.search('iphone', ordering='-price'), [self.galaxy.id, self.iphone.id])
+
+    def test_with_sparse_fields(self):
+        """
+        Ranked results can be combined with `?fields=` and `?omit=`.
+        """
+        for params in ({'fields': 'id'}, {'fields': 'id,name'}, {'omit': 'description'}):
+            self.assertEqual(self.search('iphone', **params), [self.iphone.id, self.galaxy.id])
+
+    def test_paginates_by_rank(self):
+        """
+        Ranked results can be walked with the cursor links.
+        """
+        response = self.client.get(self.url, {'q': 'iphone', 'page_size': 1})
+        self.assertEqual(response.data['results'][0]['id'], self.iphone.id)
+        response = self.client.get(response.data['next'])
+        self.assertEqual([item['id'] for item in response.data['results']], [self.galaxy.id])
+        self.assertIsNone(response.data['next'])
+
+
+class ProductFacetTest(APITestCase):
+    """
+    Test case for the faceted product listing at /Products/facets/.
+    """
+
+    def setUp(self):
+        """
+        Create a superuser, log them in and add products across two brands
+        and two categories.
+        """
+        self.superuser = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'adminpassword')
+        self.assertTrue(self.client.login(email='admin@example.com', password='adminpassword'))
+        self.apple = Brand.objects.create(name='Apple')
+        self.samsung = Brand.objects.create(name='Samsung')
+        self.mobiles = Category.objects.create(name='Mobiles')
+        self.tablets = Category.objects.create(name='Tablets')
+        Product.objects.create(name='iPhone', description='', price=150000, stock_quantity=1, brand=self.apple, category=self.mobiles)
+        Product.objects.create(name='iPad', description='', price=90000, stock_quantity=1, brand=self.apple, category=self.tablets)
+        Product.objects.create(name='Galaxy', description='', price=60000, stock_quantity=1, brand=self.samsung, category=self.mobiles)
+        Product.objects.create(name='Galaxy A', description='', price=20000, stock_quantity=1, brand=self.samsung, category=self.mobiles)
+        self.url = reverse("products-facets")
+
+    def counts(self, facet, response):
+        return {bucket['id']: bucket['count'] for bucket in response.data['facets'][facet]}
+
+    def test_unfiltered(self):
+        """
+        Without filters every product is listed and counted.
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertEqual(self.counts('brand', response), {self.apple.id: 2, self.samsung.id: 2})
+        self.assertEqual(self.counts('category', response), {self.mobiles.id: 3, self.tablets.id: 1})
+        prices = {bucket['min']: bucket['count'] for bucket in response.data['facets']['price']}
+        self.assertEqual(prices, {10000: 1, 50000: 2, 100000: 1})
+
+    def test_facets_ignore_their_own_filter(self):
+        """
+        Filtering by brand narrows the products and the other facets, but
+        the brand facet still counts every brand.
+        """
+        response = self.client.get(self.url, {'brand': self.apple.id, 'category': self.mobiles.id})
+        self.assertEqual([item['name'] for item in response.data['results']], ['iPhone'])
+        self.assertEqual(self.counts('brand', response), {self.apple.id: 1, self.samsung.id: 2})
+        self.assertEqual(self.counts('category', response), {self.mobiles.id: 1, self.tablets.id: 1})
+
+    def test_price_range(self):
+        """
+        price_min and price_max bound the listed products.
+        """
+        response = self.client.get(self.url, {'price_min': 50000, 'price_max': 100000})
+        self.assertEqual(sorted(item['name'] for item in response.data['results']), ['Galaxy', 'iPad'])
+        self.assertEqual(self.counts('brand', response), {self.apple.id: 1, self.samsung.id: 1})
+
+    def test_single_facet_query(self):
+        """
+        All facet counts come from one query: session, user, page, facets.
+        """
+        with self.assertNumQueries(4):
+            self.client.get(self.url, {'brand': f'{self.apple.id},{self.samsung.id}', 'price_min': 1})
+
+    def test_invalid_filter(self):
+        """
+        Malformed filter values are rejected with 400.
+        """
+        for brand in ('apple', '0', '99999999999999999999999'):
+            response = self.client.get(self.url, {'brand': brand})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        for price in ('cheap', 'NaN', 'Infinity', '-inf'):
+            response = self.client.get(self.url, {'price_min': price})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_with_search(self):
+        """
+        Facets are computed over the search results when `q` is given.
+        """
+        response = self.client.get(self.url, {'q': 'galaxy'})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(self.counts('brand', response), {self.samsung.id: 2})
+
+
+class ProductExpandTest(APITestCase):
+    """
+    Test case for inlining brand and category with `?expand=`.
+    """
+
+    def setUp(self):
+        """
+        Create a superuser, log them in and add products with a brand and
+        a category each.
+        """
+        self.superuser = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'adminpassword')
+        self.assertTrue(self.client.login(email='admin@example.com', password='adminpassword'))
+        for i in range(5):
+            brand = Brand.objects.create(name=f'Brand {i}')
+            category = Category.objects.create(name=f'Category {i}')
+            Product.objects.create(name=f'Phone {i}', description='NEW', price=10, stock_quantity=1, brand=brand, category=category)
+        Product.objects.create(name='Unbranded', description='NEW', price=10, stock_quantity=1)
+        self.url = reverse("products-list")
+
+    def test_ids_by_default(self):
+        """
+        Without `expand` the relations are plain ids.
+        """
+        response = self.client.get(self.url)
+        product = response.data['results'][0]
+        self.assertIsInstance(product['brand'], int)
+        self.assertIsInstance(product['category'], int)
+
+    def test_expand(self):
+        """
+        Expanded relations are inlined, and missing ones stay null.
+        """
+        response = self.client.get(self.url, {'expand': 'brand,category'})
+        product = response.data['results'][0]
+        self.assertEqual(product['brand']['name'], 'Brand 0')
+        self.assertEqual(product['category']['name'], 'Category 0')
+        self.assertIsNone(response.data['results'][-1]['brand'])
+
+    def test_expand_query_count(self):
+        """
+        Expanding does not add a query per product: session, user, ETag
+        probe, page.
+        """
+        with self.assertNumQueries(4):
+            self.client.get(self.url, {'expand': 'brand,category'})
+
+    def test_expand_detail(self):
+        """
+        Expansion also applies to the detail view.
+        """
+        product = Product.objects.get(name='Phone 3')
+        response = self.client.get(reverse("products-detail", args=[product.id]), {'expand': 'brand'})
+        self.assertEqual(response.data['brand']['name'], 'Brand 3')
+        self.assertEqual(response.data['category'], product.category_id)
+
+    def test_write_accepts_ids(self):
+        """
+        Writes with `expand` still take ids and answer with the expanded form.
+        """
+        brand = Brand.objects.get(name='Brand 1')
+        response = self.client.post(f'{self.url}?expand=brand', {
+            'name': 'New', 'description': 'NEW', 'price': '5', 'stock_quantity': 1, 'brand': brand.id,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['brand']['id'], brand.id)
+
+
+class ProductSparseFieldsTest(APITestCase):
+    """
+    Test case for sparse fieldsets with `?fields=` and `?omit=`.
+    """
+
+    def setUp(self):
+        """
+        Create a superuser, log them in and add a branded product.
+        """
+        self.superuser = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'adminpassword')
+        self.assertTrue(self.client.login(email='admin@example.com', password='adminpassword'))
+        self.brand = Brand.objects.create(name='Apple')
+        self.product = Product.objects.create(name='iPhone', description='A very long description', price=10, stock_quantity=1, brand=self.brand)
+        self.url = reverse("products-list")
+
+    def test_fields(self):
+        """
+        Only the requested fields are returned and description is not read.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'fields': 'id,name,price'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name', 'price'})
+        product_query = queries.captured_queries[-1]['sql']
+        self.assertIn('"shop_product"."name"', product_query)
+        self.assertNotIn('description', product_query)
+
+    def test_omit(self):
+        """
+        Omitted fields are dropped from the output and the query.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("products-detail", args=[self.product.id]), {'omit': 'description'})
+        self.assertNotIn('description', response.data)
+        self.assertEqual(response.data['name'], 'iPhone')
+        self.assertNotIn('description', queries.captured_queries[-1]['sql'])
+
+    def test_fields_with_expand(self):
+        """
+        Sparse fields combine with expand, and trimmed relations are not joined.
+        """
+        response = self.client.get(self.url, {'fields': 'name,brand', 'expand': 'brand,category'})
+        product = response.data['results'][0]
+        self.assertEqual(set(product), {'name', 'brand'})
+        self.assertEqual(product['brand']['name'], 'Apple')
+
+    def test_writes_ignore_fields(self):
+        """
+        `fields` does not drop required fields from validation on writes.
+        """
+        response = self.client.post(f'{self.url}?fields=id', {
+            'name': 'Pixel', 'description': 'NEW', 'price': '5', 'stock_quantity': 1,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['name'], 'Pixel')
+
+
+class ProductConditionalGetTest(APITestCase):
+    """
+    Test case for ETag / Last-Modified validators on products.
+    """
+
+    def setUp(self):
+        """
+        Create a superuser, log them in and add a branded product.
+        """
+        self.superuser = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'adminpassword')
+        self.assertTrue(self.client.login(email='admin@example.com', password='adminpassword'))
+        self.brand = Brand.objects.create(name='Apple')
+        self.product = Product.objects.create(name='iPhone', description='NEW', price=10, stock_quantity=1, brand=self.brand)
+        self.url = reverse("products-list")
+        self.detail_url = reverse("products-detail", args=[self.product.id])
+
+    def test_list_not_modified(self):
+        """
+        A matching If-None-Match gets a 304 after only the probe query, or
+        with no query at all once the response is cached.
+        """
+        response = self.client.get(self.url)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        get_cache().clear()
+        with self.assertNumQueries(3):  # session + user + probe
+            cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.client.get(self.url)
+        with self.assertNumQueries(2):  # session + user
+            cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_changes(self):
+        """
+        Creating, updating and deleting products all change the ETag.
+        """
+        other = Product.objects.create(name='Pixel', description='NEW', price=5, stock_quantity=1)
+        etags = {self.client.get(self.url)['ETag']}
+        other.price = 6
+        other.save()
+        etags.add(self.client.get(self.url)['ETag'])
+        Product.objects.create(name='Galaxy', description='NEW', price=7, stock_quantity=1)
+        etags.add(self.client.get(self.url)['ETag'])
+        other.delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=', '.join(etags))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etags.add(response['ETag'])
+        self.assertEqual(len(etags), 4)
+
+    def test_etag_depends_on_query(self):
+        """
+        Different representations of the same rows get different ETags.
+        """
+        plain = self.client.get(self.url)['ETag']
+        sparse = self.client.get(self.url, {'fields': 'id'})['ETag']
+        self.assertNotEqual(plain, sparse)
+
+    def test_expanded_relation_changes(self):
+        """
+        Updating an expanded brand changes the ETag of the product list.
+        """
+        before = self.client.get(self.url, {'expand': 'brand'})['ETag']
+        self.brand.name = 'Apple Inc'
+        self.brand.save()
+        after = self.client.get(self.url, {'expand': 'brand'}, HTTP_IF_NONE_MATCH=before)
+        self.assertEqual(after.status_code, status.HTTP_200_OK)
+
+    def test_detail(self):
+        """
+        Details honour If-None-Match and If-Modified-Since.
+        """
+        response = self.client.get(self.detail_url)
+        cached = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        cached = self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_missing(self):
+        """
+        Unknown ids still return 404.
+        """
+        response = self.client.get(reverse("products-detail", args=[self.product.id + 100]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ProductCacheTest(APITestCase):
+    """
+    Test case for the read-through catalog cache on products.
+    """
+
+    def setUp(self):
+        """
+        Create a superuser, log them in, add a product and start from an
+        empty cache.
+        """
+        self.superuser = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'adminpassword')
+        self.assertTrue(self.client.login(email='admin@example.com', password='adminpassword'))
+        self.brand = Brand.objects.create(name='Apple')
+        self.product = Product.objects.create(name='iPhone', description='NEW', price=10, stock_quantity=1, brand=self.brand)
+        self.url = reverse("products-list")
+        self.detail_url = reverse("products-detail", args=[self.product.id])
+        get_cache().clear()
+
+    def test_hit_skips_database(self):
+        """
+        The second identical request is a hit that runs no catalog query.
+        """
+        self.assertEqual(self.client.get(self.detail_url)['X-Cache'], 'MISS')
+        with self.assertNumQueries(2):  # session + user
+            response = self.client.get(self.detail_url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['name'], 'iPhone')
+        self.assertIn('ETag', response)
+
+    def test_save_invalidates(self):
+        """
+        Saving a product drops cached lists and details.
+        """
+        self.client.get(self.url)
+        self.client.get(self.detail_url)
+        self.product.name = 'iPhone 15'
+        self.product.save()
+        list_response = self.client.get(self.url)
+        detail_response = self.client.get(self.detail_url)
+        self.assertEqual(list_response['X-Cache'], 'MISS')
+        self.assertEqual(list_response.data['results'][0]['name'], 'iPhone 15')
+        self.assertEqual(detail_response.data['name'], 'iPhone 15')
+
+    def test_api_write_invalidates(self):
+        """
+        Writes through the API invalidate too.
+        """
+        self.client.get(self.detail_url)
+        self.client.patch(self.detail_url, {'price': '12.00'}, format='json')
+        self.assertEqual(self.client.get(self.detail_url).data['price'], '12.00')
+
+    def test_brand_delete_invalidates(self):
+        """
+        Deleting a brand drops cached products that referenced it.
+        """
+        self.client.get(self.detail_url)
+        self.brand.delete()
+        self.assertIsNone(self.client.get(self.detail_url).data['brand'])
+
+    def test_stats(self):
+        """
+        The stats endpoint reports hits, misses and the hit ratio.
+        """
+        reset_stats()
+        for _ in range(4):
+            self.client.get(self.detail_url)
+        stats = self.client.get(reverse('catalog-cache-stats')).data
+        self.assertEqual((stats['hits'], stats['misses']), (3, 1))
+        self.assertEqual(stats['hit_ratio'], 0.75)
+        self.assertEqual(stats, get_stats())
+
+
+class ImportProductsTest(TestCase):
+    """
+    Test case for the import_products management command.
+    """
+
+    def write(self, suffix, content):
+        """
+        Write `content` to a temporary file and return its path.
+        """
+        handle = tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False, encoding='utf-8')
+        with handle:
+            handle.write(content)
+        self.addCleanup(os.remove, handle.name)
+        return handle.name
+
+    def run_import(self, path, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_products', path, *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_csv_creates_products_brands_and_categories(self):
+        """
+        A CSV import creates the products and the brands and categories
+        they name, reusing existing ones.
+        """
+        Brand.objects.create(name='Apple')
+        path = self.write('.csv', (
+            'sku,name,description,price,stock_quantity,brand,category\n'
+            'A1,iPhone 15,Flagship,250000,5,Apple,Mobiles\n'
+            'S1,Galaxy S24,,230000,3,Samsung,Mobiles\n'
+            'C1,Cable,USB-C,999.5,100,,\n'
+        ))
+        output, _ = self.run_import(path)
+        self.assertIn('Imported 3 products (0 rejected)', output)
+        self.assertIn('rows/s', output)
+        self.assertEqual(Brand.objects.count(), 2)
+        self.assertEqual(Category.objects.count(), 1)
+        iphone = Product.objects.get(sku='A1')
+        self.assertEqual(iphone.brand.name, 'Apple')
+        self.assertEqual(iphone.category.name, 'Mobiles')
+        self.assertEqual(Product.objects.get(sku='C1').price, Decimal('999.50'))
+        self.assertIsNone(Product.objects.get(sku='C1').brand)
+        self.assertEqual(Product.objects.get(sku='S1').description, '')
+
+    def test_ndjson_upserts_on_sku(self):
+        """
+        Re-importing a sku updates the product instead of duplicating it,
+        and the last row for a sku within a file wins.
+        """
+        Product.objects.create(sku='A1', name='Old', description='', price=1, stock_quantity=1)
+        path = self.write('.ndjson', '\n'.join([
+            json.dumps({'sku': 'A1', 'name': 'iPhone', 'price': '10', 'stock_quantity': 2}),
+            json.dumps({'sku': 'A1', 'name': 'iPhone 15', 'price': '12', 'stock_quantity': 3}),
+            '',
+            json.dumps({'sku': 'B1', 'name': 'Pixel', 'price': 9, 'stock_quantity': 1, 'brand': 'Google'}),
+        ]))
+        self.run_import(path)
+        self.assertEqual(Product.objects.count(), 2)
+        product = Product.objects.get(sku='A1')
+        self.assertEqual((product.name, product.price, product.stock_quantity), ('iPhone 15', 12, 3))
+
+    def test_rejected_rows_are_reported(self):
+        """
+        Invalid rows are skipped and reported by line, the rest is imported.
+        """
+        path = self.write('.csv', (
+            'sku,name,price,stock_quantity\n'
+            'A1,Good,10,1\n'
+            ',No sku,10,1\n'
+            'A2,Bad price,ten,1\n'
+            'A3,Bad stock,10,-1\n'
+        ))
+        output, errors = self.run_import(path)
+        self.assertIn('Imported 1 products (3 rejected)', output)
+        self.assertIn('line 3: sku is required', errors)
+        self.assertIn('line 4: price is not a number', errors)
+        self.assertIn('line 5: stock_quantity cannot be negative', errors)
+
+    def test_queries_per_batch_are_constant(self):
+        """
+        The number of queries depends on the number of batches, not rows.
+        """
+        def catalog(rows):
+            lines = ['sku,name,price,stock_quantity,brand,category']
+            lines += [f'S{i},Phone {i},10,1,Brand {i % 3},Category {i % 2}' for i in range(rows)]
+            return self.write('.csv', '\n'.join(lines) + '\n')
+
+        small, large = catalog(10), catalog(100)
+        with CaptureQueriesContext(connection) as first:
+            self.run_import(small, '--batch-size', '1000')
+        Product.objects.all().delete()
+        Brand.objects.all().delete()
+        Category.objects.all().delete()
+        with CaptureQueriesContext(connection) as second:
+            self.run_import(large, '--batch-size', '1000')
+        self.assertEqual(len(first), len(second))
+        self.assertEqual(Product.objects.count(), 100)
+
+    def test_search_index_follows_import(self):
+        """
+        Imported products are immediately searchable.
+        """
+        path = self.write('.csv', 'sku,name,price,stock_quantity\nZ1,Zenfone,10,1\n')
+        self.run_import(path)
+        self.assertEqual(list(search_products(Product.objects.all(), 'zenfone').values_list('sku', flat=True)), ['Z1'])
+
+    def test_unknown_format(self):
+        """
+        A file whose format cannot be guessed is refused.
+        """
+        with self.assertRaises(CommandError):
+            self.run_import(self.write('.txt', ''))
+
+
+class ProductBulkUpdateTest(APITestCase):
+    """
+    Test case for `PATCH /Products/bulk/`.
+    """
+
+    def setUp(self):
+        """
+        Create a superuser, log them in and add a few products.
+        """
+        self.superuser = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'adminpassword')
+        self.assertTrue(self.client.login(email='admin@example.com', password='adminpassword'))
+        self.products = [Product.objects.create(name=f'Phone {i}', description='', price=100, stock_quantity=10)
+                         for i in range(3)]
+        self.url = reverse('products-bulk')
+
+    def patch(self, data):
+        return self.client.patch(self.url, data, format='json')
+
+    def test_partial_fields(self):
+        """
+        Each item only changes the fields it names, and updated_at moves.
+        """
+        first, second, third = self.products
+        before = third.updated_at
+        response = self.patch([
+            {'id': first.id, 'price': '90.50'},
+            {'id': second.id, 'stock_quantity': 3},
+            {'id': third.id, 'price': 80, 'stock_quantity': 0},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 3)
+        self.assertEqual(response.data['errors'], [])
+        self.assertIn('rows_per_second', response.data)
+        values = dict((p.id, (p.price, p.stock_quantity)) for p in Product.objects.all())
+        self.assertEqual(values[first.id], (Decimal('90.50'), 10))
+        self.assertEqual(values[second.id], (Decimal('100.00'), 3))
+        self.assertEqual(values[third.id], (Decimal('80.00'), 0))
+        self.assertGreater(Product.objects.get(id=third.id).updated_at, before)
+
+    def test_per_row_errors(self):
+        """
+        Invalid items are reported by position and the valid ones applied.
+        """
+        first = self.products[0]
+        response = self.patch([
+            {'id': first.id, 'price': '1.00'},
+            {'id': first.id, 'price': '2.00'},
+            {'id': 999999, 'price': '1.00'},
+            {'id': self.products[1].id, 'price': 'cheap'},
+            {'id': self.products[1].id, 'stock_quantity': -1},
+            {'id': self.products[2].id, 'name': 'Renamed'},
+            {'id': self.products[2].id},
+            {'price': '1.00'},
+            'not an object',
+            {'id': 2 ** 63, 'price': '1.00'},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 1)
+        errors = {error['index']: error['errors'] for error in response.data['errors']}
+        self.assertEqual(sorted(errors), [1, 2, 3, 4, 5, 6, 7, 8, 9])
+        self.assertIn('id', errors[1])
+        self.assertEqual(errors[2], {'id': ['Product not found.']})
+        self.assertIn('price', errors[3])
+        self.assertIn('stock_quantity', errors[4])
+        self.assertEqual(errors[9], {'id': ['A valid integer is required.']})
+        self.assertEqual(Product.objects.get(id=first.id).price, Decimal('1.00'))
+        self.assertEqual(Product.objects.get(id=self.products[2].id).name, 'Phone 2')
+
+    def test_body_must_be_a_list(self):
+        response = self.patch({'id': self.products[0].id, 'price': 1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_constant_query_count(self):
+        """
+        The number of queries does not depend on the number of items.
+        """
+        products = Product.objects.bulk_create(
+            [Product(name=f'Bulk {i}', description='', price=1, stock_quantity=1) for i in range(50)]
+        )
+        with CaptureQueriesContext(connection) as few:
+            self.patch([{'id': product.id, 'price': 2} for product in products[:5]])
+        with CaptureQueriesContext(connection) as many:
+            self.patch([{'id': product.id, 'price': 3} for product in products])
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(Product.objects.filter(price=3).count(), 50)
+
+    def test_invalidates_cache(self):
+        product = self.products[0]
+        detail_url = reverse('products-detail', args=[product.id])
+        get_cache().clear()
+        self.client.get(detail_url)
+        self.patch([{'id': product.id, 'price': '55.00'}])
+        response = self.client.get(detail_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['price'], '55.00')